@@ -0,0 +1,144 @@
+"""
+Nearest-neighbour search over L2-normalised embeddings (inner product = cosine).
+
+    flat   exact search with one matrix product; used for small vocabularies
+    ivf    inverted file in NumPy: k-means cells, search only the `nprobe`
+           cells whose centroids are closest to the query
+    hnsw   HNSW graph from the optional `hnswlib` package
+
+`build_ann_index(matrix)` picks flat below IVF_MIN_SIZE rows, otherwise hnsw
+if hnswlib is installed and ivf if not (V2S_ANN_BACKEND overrides the choice).
+Every index returns, per query, the row numbers and scores of its top-k rows
+in descending order of score.
+"""
+import os
+import numpy as np
+
+ANN_BACKENDS = ("auto", "flat", "ivf", "hnsw")
+ANN_BACKEND  = os.environ.get("V2S_ANN_BACKEND", "auto")
+IVF_MIN_SIZE = 4096   # below this, exact search is already well under a millisecond
+IVF_NPROBE   = 8
+IVF_ITERATIONS = 10
+IVF_TRAIN_PER_CELL = 64   # k-means trains on a sample of this many rows per cell
+HNSW_M, HNSW_EF_CONSTRUCTION, HNSW_EF = 16, 200, 64
+
+
+def _top_k(rows, scores, k):
+    if len(scores) > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        rows, scores = rows[keep], scores[keep]
+    order = np.argsort(-scores, kind="stable")
+    return rows[order], scores[order]
+
+
+def _normalize(x):
+    return x / np.maximum(np.linalg.norm(x, axis=1, keepdims=True), 1e-12)
+
+
+class FlatIndex:
+    """Exact search."""
+
+    name = "flat"
+
+    def __init__(self, matrix):
+        self.data = np.ascontiguousarray(matrix, dtype=np.float32)
+
+    def search(self, queries, k):
+        scores = np.atleast_2d(queries).astype(np.float32) @ self.data.T
+        rows = np.arange(len(self.data))
+        return [_top_k(rows, s, k) for s in scores]
+
+
+class IVFIndex:
+    """
+    Inverted-file index: rows are clustered with spherical k-means into about
+    sqrt(n) cells and stored grouped by cell, so a query scores the centroids
+    and then only the rows of its `nprobe` best cells.
+    """
+
+    name = "ivf"
+
+    def __init__(self, matrix, nlist=None, nprobe=IVF_NPROBE, iterations=IVF_ITERATIONS, seed=0):
+        data = np.ascontiguousarray(matrix, dtype=np.float32)
+        n = len(data)
+        nlist = min(n, nlist or max(1, int(np.sqrt(n))))
+        rng = np.random.default_rng(seed)
+        sample = data[rng.choice(n, min(n, IVF_TRAIN_PER_CELL * nlist), replace=False)]
+        centroids = sample[:nlist].copy()
+        for _ in range(iterations):
+            centroids = self._update(sample, self._assign(sample, centroids), centroids)
+        assign = self._assign(data, centroids)
+
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        self.centroids = centroids
+        self.nprobe    = min(nprobe, nlist)
+        self.rows      = order            # position in `data` -> original row
+        self.data      = data[order]      # rows grouped by cell
+        self.offsets   = np.concatenate(([0], np.cumsum(counts)))
+
+    @staticmethod
+    def _assign(data, centroids, chunk=8192):
+        return np.concatenate([np.argmax(data[i:i + chunk] @ centroids.T, axis=1)
+                               for i in range(0, len(data), chunk)])
+
+    @staticmethod
+    def _update(data, assign, centroids):
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=len(centroids))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        centroids = centroids.copy()   # empty cells keep their old centroid
+        centroids[filled] = _normalize(np.add.reduceat(data[order], starts[filled], axis=0))
+        return centroids
+
+    def search(self, queries, k):
+        queries = np.atleast_2d(queries).astype(np.float32)
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(-coarse, self.nprobe - 1, axis=1)[:, :self.nprobe]
+        results = []
+        for query, cells in zip(queries, probes):
+            # Cells are contiguous slices of `data`, so each is scored without a copy
+            spans = [(self.offsets[c], self.offsets[c + 1]) for c in cells]
+            scores = np.concatenate([self.data[a:b] @ query for a, b in spans])
+            rows = np.concatenate([self.rows[a:b] for a, b in spans])
+            results.append(_top_k(rows, scores, k))
+        return results
+
+
+class HnswIndex:
+    """HNSW graph from hnswlib (optional dependency)."""
+
+    name = "hnsw"
+
+    def __init__(self, matrix, m=HNSW_M, ef_construction=HNSW_EF_CONSTRUCTION, ef=HNSW_EF):
+        import hnswlib
+
+        data = np.ascontiguousarray(matrix, dtype=np.float32)
+        self.ef = ef
+        self.size = len(data)
+        self.index = hnswlib.Index(space="ip", dim=data.shape[1])
+        self.index.init_index(max_elements=len(data), ef_construction=ef_construction, M=m)
+        self.index.add_items(data, np.arange(len(data)))
+
+    def search(self, queries, k):
+        k = min(k, self.size)
+        self.index.set_ef(max(self.ef, k))
+        labels, distances = self.index.knn_query(np.atleast_2d(queries).astype(np.float32), k=k)
+        # hnswlib's "ip" distance is 1 - inner product
+        return [(rows.astype(np.int64), (1.0 - d).astype(np.float32)) for rows, d in zip(labels, distances)]
+
+
+def build_ann_index(matrix, backend=ANN_BACKEND):
+    if backend not in ANN_BACKENDS:
+        raise ValueError(f"Unknown ANN backend {backend!r}; choose one of {', '.join(ANN_BACKENDS)}")
+    if backend == "auto":
+        if len(matrix) < IVF_MIN_SIZE:
+            backend = "flat"
+        else:
+            try:
+                import hnswlib  # noqa: F401
+                backend = "hnsw"
+            except ImportError:
+                backend = "ivf"
+    return {"flat": FlatIndex, "ivf": IVFIndex, "hnsw": HnswIndex}[backend](matrix)
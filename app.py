@@ -1,79 +1,495 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
 import os
-from flask import Flask, render_template, request, flash, send_from_directory
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords, wordnet
-import numpy as np
-from sentence_transformers import SentenceTransformer, util
-
-# One‑time NLTK downloads
-nltk.download("punkt")
-nltk.download("stopwords")
-nltk.download("wordnet")
+import json
+import zlib
+import logging
+import inspect
+import threading
+from functools import lru_cache
+from flask import (Flask, Response, abort, redirect, render_template, request, flash, jsonify,
+                   send_file, stream_with_context, url_for)
+from werkzeug.security import safe_join
+from werkzeug.wsgi import wrap_file
+
+import resources
+from encoders import encoder_id, load_encoder, ENCODER_BACKEND
+from gloss_index import GlossIndex, INDEX_DIR, gloss_text
+from vocabulary import Vocabulary
+from synonyms import SynonymTable, SYNONYM_TABLE
+from encoder_scheduler import BatchingEncoder, MAX_BATCH_SIZE, MAX_WAIT_MS
+from result_cache import ResultCache, CACHE_SIZE, CACHE_TTL, normalize_query, shared_backend
+from sentence_video import SentenceVideoCache, SENTENCE_CACHE_DIR, SENTENCE_CACHE_BYTES, MAX_SENTENCE_CLIPS
+from video_transcode import content_etag, delivery_path, DELIVERY_DIR
+from metrics import Metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from keypoint_store import GROUP_NAMES, ARCHIVE_DIR, num_landmarks, open_archive
+from keypoint_stream import STREAM_GROUPS, encode_header, gloss_record
+from transcripts import SessionStore
+from model_server import ModelClient, ModelServerUnavailable
 
 # Configuration
 KEYPOINT_DIR    = "data/key"
 HUMAN_VIDEO_DIR = "data/video"
-STOPWORDS       = set(stopwords.words("english")) - {"who", "what", "where", "when", "why", "how"}
+# Transcoded copies of the clips (`python video_transcode.py`), served instead of them when present
+DELIVERY_VIDEO_DIR = DELIVERY_DIR
+# Set V2S_WORDNET=0 to rely on the precomputed synonym table and never load WordNet
+USE_WORDNET     = os.environ.get("V2S_WORDNET", "1") != "0"
+# Load NLTK data and the encoder in a background thread at import (V2S_WARMUP=0: on first use)
+WARM_UP         = os.environ.get("V2S_WARMUP", "1") != "0"
+KEEP_WORDS      = {"who", "what", "where", "when", "why", "how"}
+ENCODE_BATCH_SIZE = 64  # sentences per encoder forward pass
+# Cross-request micro-batching of encoder calls (V2S_BATCH_WAIT_MS=0 disables it)
+BATCH_WAIT_MS   = float(os.environ.get("V2S_BATCH_WAIT_MS", MAX_WAIT_MS))
+# Match results cached per normalized input (V2S_CACHE_SIZE=0 disables the cache);
+# V2S_CACHE_URL=redis://... shares entries between workers ("local": in-memory stand-in)
+CACHE_SIZE      = int(os.environ.get("V2S_CACHE_SIZE", CACHE_SIZE))
+CACHE_TTL       = float(os.environ.get("V2S_CACHE_TTL", CACHE_TTL))
+CACHE_URL       = os.environ.get("V2S_CACHE_URL")
+# V2S_SENTENCE_VIDEO=1: play one server-assembled video per sentence instead of one clip per sign
+SENTENCE_VIDEO  = os.environ.get("V2S_SENTENCE_VIDEO", "0") == "1"
+SENTENCE_CACHE_BYTES = int(os.environ.get("V2S_SENTENCE_CACHE_MB", SENTENCE_CACHE_BYTES // 2**20)) * 2**20
+MAX_SENTENCE_CLIPS   = int(os.environ.get("V2S_SENTENCE_MAX_CLIPS", MAX_SENTENCE_CLIPS))
+# Browser cache lifetime for clips; URLs carrying the content hash (?v=...) never change
+VIDEO_MAX_AGE     = 24 * 3600
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Semantic fallback: input spans with no lexical match also take their nearest glosses
+# from the whole vocabulary (V2S_SEMANTIC_TOP_K=0 disables it)
+SEMANTIC_TOP_K     = int(os.environ.get("V2S_SEMANTIC_TOP_K", "0"))
+SEMANTIC_THRESHOLD = float(os.environ.get("V2S_SEMANTIC_THRESHOLD", "0.6"))
+# Fraction of requests whose stages are timed for /metrics (V2S_METRICS_SAMPLE=0 disables timing)
+METRICS_SAMPLE  = float(os.environ.get("V2S_METRICS_SAMPLE", "0.1"))
+# Encode through the shared model server on this socket (see model_server.py); unset, or
+# while the server is unreachable, the encoder is loaded in this process
+MODEL_SOCKET    = os.environ.get("V2S_MODEL_SOCKET")
+# How long to wait for the model server to publish a gloss matrix covering the vocabulary
+MODEL_INDEX_WAIT = float(os.environ.get("V2S_MODEL_INDEX_WAIT", "10"))
 
-# Load the BERT model
-bert_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+# NLTK data and the model come from the local bundle when present (see resources.py);
+# nothing is downloaded at import time
+resources.configure()
 
-def preprocess_text(text):
-    return [w for w in word_tokenize(text.lower()) if w not in STOPWORDS]
+# Per-stage latency histograms, served at /metrics
+metrics = Metrics(METRICS_SAMPLE)
+
+@lru_cache(maxsize=None)
+def get_tokenizer():
+    resources.ensure_nltk("punkt")
+    resources.ensure_nltk("punkt_tab", required=False)
+    from nltk.tokenize import word_tokenize
+    return word_tokenize
+
+@lru_cache(maxsize=None)
+def get_stopwords():
+    resources.ensure_nltk("stopwords")
+    from nltk.corpus import stopwords
+    return set(stopwords.words("english")) - KEEP_WORDS
+
+# Load the BERT model on first use, on the backend chosen by V2S_ENCODER_BACKEND
+# (torch, onnx or onnx-int8; see encoders.py)
+_encoder = None
+_encoder_lock = threading.Lock()
+
+def get_encoder():
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                _encoder = load_encoder(ENCODER_BACKEND)
+    return _encoder
+
+model_client = ModelClient(MODEL_SOCKET) if MODEL_SOCKET else None
+
+def _encode_with_model(texts, batch_size=ENCODE_BATCH_SIZE):
+    if model_client is not None:
+        try:
+            return model_client.encode(texts, batch_size)
+        except ModelServerUnavailable:
+            pass
+    return get_encoder().encode(texts, batch_size)
+
+# Request threads share forward passes through one batching worker
+# (the model server batches across workers itself)
+batching_encoder = (BatchingEncoder(_encode_with_model, MAX_BATCH_SIZE, BATCH_WAIT_MS)
+                    if BATCH_WAIT_MS > 0 and model_client is None else None)
+
+def encode_texts(texts, batch_size=ENCODE_BATCH_SIZE):
+    """Encode a list of strings into L2-normalised float32 embeddings (one row per text)."""
+    # Small requests are merged with other threads' requests; big ones are a batch already
+    with metrics.span("encode"):
+        if batching_encoder is not None and len(texts) < batch_size:
+            return batching_encoder.encode(texts)
+        return _encode_with_model(texts, batch_size)
+
+# Gloss -> keypoint/video mappings, scanned once and kept current by a watcher thread
+vocabulary = Vocabulary(KEYPOINT_DIR, HUMAN_VIDEO_DIR)
+
+# Gloss embeddings are encoded once, persisted under INDEX_DIR and memory-mapped
+gloss_index = GlossIndex(encode_texts, INDEX_DIR, encoder=encoder_id(ENCODER_BACKEND))
+gloss_index.load()
+
+def sync_gloss_index(vocab):
+    """
+    Map the model server's gloss matrix once it covers the vocabulary, otherwise sync our own
+    index. With a model server only the server saves the index; workers that give up waiting
+    for it keep theirs in memory.
+    """
+    if model_client is None:
+        gloss_index.sync(vocab.keypoints)
+        return
+    wanted = sorted(vocab.keypoints)
+    deadline = time.monotonic() + MODEL_INDEX_WAIT
+    while True:
+        try:
+            shared = model_client.gloss_matrix()
+        except ModelServerUnavailable:
+            break
+        if shared is not None and shared[0] == wanted:
+            gloss_index.attach(*shared)
+            return
+        # The server may not have published this vocabulary yet
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(0.25)
+    gloss_index.sync(wanted, save=False)
+
+vocabulary.on_change(sync_gloss_index)
+vocabulary.start_watching()
+
+# WordNet expansion is a dict lookup into the table built by `python synonyms.py`
+synonym_table = SynonymTable(SYNONYM_TABLE, use_wordnet=USE_WORDNET)
+synonym_table.load()
+
+# Keys include the vocabulary fingerprint, so a changed gloss or video set never
+# serves stale results; local entries for the old vocabulary are dropped outright
+result_cache = ResultCache(CACHE_SIZE, CACHE_TTL, shared_backend(CACHE_URL)) if CACHE_SIZE > 0 else None
+if result_cache is not None:
+    vocabulary.on_change(lambda vocab: result_cache.clear())
+
+# Assembled sentence videos, cached on disk by clip sequence
+sentence_videos = SentenceVideoCache(HUMAN_VIDEO_DIR, SENTENCE_CACHE_DIR, SENTENCE_CACHE_BYTES,
+                                     delivery_dir=DELIVERY_VIDEO_DIR)
+
+# Keypoints packed by `python keypoint_store.py pack` are served from the memory-mapped archive
+_keypoint_archive = {"mtime": None, "archive": None}
+
+def get_keypoint_archive():
+    """The packed keypoint archive (None if there is none), re-opened whenever it is re-packed."""
+    try:
+        mtime = os.stat(os.path.join(ARCHIVE_DIR, "index.json")).st_mtime_ns
+    except OSError:
+        return None
+    if mtime != _keypoint_archive["mtime"]:
+        _keypoint_archive.update(mtime=mtime, archive=open_archive(ARCHIVE_DIR))
+    return _keypoint_archive["archive"]
 
-def expand_query_with_synonyms(word):
-    syns = set()
-    for s in wordnet.synsets(word):
-        for lem in s.lemmas():
-            syns.add(lem.name())
-    return syns
+# Startup state reported by /ready ("ready" once the gloss index has been synced)
+readiness = {"ready": False, "error": None, "import_seconds": None, "warmup_seconds": None}
+_warm_up_lock = threading.Lock()
+_gloss_index_lock = threading.Lock()
+
+def ensure_gloss_index():
+    """Sync the gloss index with the vocabulary (and build its ANN index) once, by whoever needs it first."""
+    if readiness["ready"]:
+        return
+    with _gloss_index_lock:
+        if readiness["ready"]:
+            return
+        sync_gloss_index(vocabulary)
+        if SEMANTIC_TOP_K > 0:
+            gloss_index.ann()
+        readiness["ready"] = True
+        readiness["error"] = None
+
+def _ensure_gloss_index_in_background():
+    try:
+        ensure_gloss_index()
+    except Exception as e:
+        readiness["error"] = str(e)
+        logging.exception("Gloss index sync failed")
+
+def warm_up():
+    """Load tokenizer data, WordNet, the encoder and the gloss index. Safe to call repeatedly."""
+    with _warm_up_lock:
+        if readiness["warmup_seconds"] is not None:
+            return
+        started = time.perf_counter()
+        try:
+            get_tokenizer()
+            get_stopwords()
+            synonym_table.wordnet_available()
+            if model_client is None or not model_client.available():
+                get_encoder()
+            ensure_gloss_index()
+        except Exception as e:
+            readiness["error"] = str(e)
+            logging.exception("Warm-up failed")
+            return
+        readiness["warmup_seconds"] = round(time.perf_counter() - started, 3)
+        logging.info(f"Warm-up finished in {readiness['warmup_seconds']}s")
+
+def tokenize(text):
+    with metrics.span("tokenize"):
+        return get_tokenizer()(text.lower())
+
+def preprocess_text(text):
+    stopwords = get_stopwords()
+    return [w for w in tokenize(text) if w not in stopwords]
 
 def calculate_similarity(user_input, candidate):
     """
     Compute the cosine similarity between the user's input and the candidate keypoint phrase.
     The candidate phrase is assumed to be a string (with underscores removed for readability).
     """
-    # Normalize candidate phrase: replace underscores with spaces
-    candidate_text = candidate.replace("_", " ")
-    user_embedding = bert_model.encode(user_input, convert_to_tensor=True)
-    candidate_embedding = bert_model.encode(candidate_text, convert_to_tensor=True)
-    similarity = util.cos_sim(user_embedding, candidate_embedding)  # returns a tensor
-    return float(similarity.cpu().numpy())
+    # Candidate embeddings come from the gloss index (encoded on the fly if not indexed)
+    ensure_gloss_index()
+    user_embedding = encode_texts([user_input])[0]
+    with metrics.span("score"):
+        return float(gloss_index.scores(user_embedding, [candidate])[0])
 
-def find_matching_keypoints(user_input):
-    # Map keypoint base names to file paths
-    files = {
-        fname[:-5]: os.path.join(KEYPOINT_DIR, fname)
-        for fname in os.listdir(KEYPOINT_DIR) if fname.endswith(".json")
-    }
-    candidates = set()
+def iter_candidates(user_input, vocab, unmatched=None):
+    """
+    Yield glosses of the vocabulary snapshot `vocab` that the input matches
+    lexically, in sentence order (may repeat). Words with no match are
+    appended to `unmatched`.
+    """
+    files = vocab.keypoints
     # 1) full‑phrase match (replace spaces with underscores)
     phrase = user_input.replace(" ", "_")
     if phrase in files:
-        candidates.add(phrase)
-    # 2) word‑by‑word matching and synonym expansion
-    for w in preprocess_text(user_input):
-        if w in files:
-            candidates.add(w)
-        else:
-            for syn in expand_query_with_synonyms(w):
-                if syn in files:
-                    candidates.add(syn)
-                    break
+        yield phrase
+    # 2) longest multi-word glosses in the raw token stream (stopwords included,
+    #    e.g. how_are_you), in one pass over the vocabulary's phrase trie
+    tokens = tokenize(user_input)
+    with metrics.span("segment"):
+        spans = vocab.phrases.segment(tokens)
+    yield from iter_span_candidates(tokens, spans, files, unmatched)
+
+def iter_span_candidates(tokens, spans, files, unmatched=None):
+    """Glosses for segmented tokens: phrase glosses as is, other tokens word by word."""
+    stopwords = get_stopwords()
+    for start, end, gloss in spans:
+        if gloss is not None and gloss in files:
+            yield gloss
+            continue
+        # 3) word‑by‑word matching and synonym expansion for the rest
+        for w in tokens[start:end]:
+            if w in stopwords:
+                continue
+            if w in files:
+                yield w
+            else:
+                with metrics.span("synonyms"):
+                    syn = synonym_table.lookup(w, files)
+                if syn:
+                    yield syn
+                elif unmatched is not None:
+                    unmatched.append(w)
+
+def match_candidates(user_input, vocab, unmatched=None):
+    """Glosses of `vocab` that the input matches lexically (phrase, word or synonym)."""
+    return sorted(set(iter_candidates(user_input, vocab, unmatched)))
+
+def semantic_spans(user_input, found, unmatched):
+    """Spans searched by the semantic fallback: unmatched words, plus the whole input if nothing matched."""
+    if SEMANTIC_TOP_K <= 0:
+        return []
+    spans = list(dict.fromkeys(unmatched))
+    if not found and user_input not in spans:
+        spans.append(user_input)
+    return spans
+
+def semantic_matches(span_embeddings, files):
+    """Glosses in `files` near any of the span embeddings (top-k above the threshold), best first."""
+    if len(span_embeddings) == 0:
+        return []
+    with metrics.span("semantic_search"):
+        hits = gloss_index.nearest(span_embeddings, SEMANTIC_TOP_K, SEMANTIC_THRESHOLD)
+    best = {}
+    for gloss, score in (h for span_hits in hits for h in span_hits):
+        if gloss in files and score > best.get(gloss, -1.0):
+            best[gloss] = score
+    return sorted(best, key=best.get, reverse=True)
+
+def match_transcript(session, tokens, final, seq=None):
+    """
+    Update a live transcript session with the latest (interim or final)
+    transcript tokens and push events for what changed: "retract" for
+    matches whose words were revised, "match" for each newly settled gloss
+    and, on the final transcript, "done" with the whole utterance. Returns
+    the new matches, or None if transcript `seq` arrived after a newer one.
+    """
+    ensure_gloss_index()
+    vocab = vocabulary.snapshot
+    files = vocab.keypoints
+    with session.lock:
+        if not session.accept(seq):
+            return None
+        retracted = session.settle(tokens, final)
+        if retracted:
+            session.push("retract", {"keypoints": [m["keypoint"] for m in retracted]})
+
+        pending, offset = session.pending()
+        with metrics.span("segment"):
+            spans = vocab.phrases.segment(pending, final)
+        consumed = spans[-1][1] if spans else 0
+        new = []
+        if consumed:
+            chunk = " ".join(pending[:consumed])
+            unmatched = []
+            found = []
+            for start, end, gloss in spans:
+                for candidate in iter_span_candidates(pending, [(start, end, gloss)], files, unmatched):
+                    if candidate not in found and all(m["keypoint"] != candidate for m in session.matches):
+                        found.append(candidate)
+                        new.append((offset + start, offset + end, candidate))
+            extra = semantic_spans(chunk, found, unmatched)
+            if found or extra:
+                # Only the newly settled chunk is encoded
+                embeddings = encode_texts([chunk] + extra)
+                for candidate in semantic_matches(embeddings[1:], files):
+                    if candidate not in found and all(m["keypoint"] != candidate for m in session.matches):
+                        found.append(candidate)
+                        new.append((offset, offset + consumed, candidate))
+                with metrics.span("score"):
+                    scores = gloss_index.scores(embeddings[0], found) if found else []
+                new = [{"start": start, "end": end, **match_payload(kp, float(score))}
+                       for (start, end, kp), score in zip(new, scores)]
+        session.advance(consumed, new)
+        for match in new:
+            session.push("match", match)
+
+        if final:
+            matches = [{k: v for k, v in m.items() if k not in ("start", "end")} for m in session.matches]
+            session.push("done", {"input": " ".join(session.tokens), "matches": matches})
+            session.reset()
+        return new
+
+def find_matching_keypoints(user_input):
+    return find_matching_keypoints_batch([user_input])[0]
+
+def iter_matching_keypoints(user_input):
+    """
+    Yield (keypoint, score) pairs in sentence order as each candidate is
+    resolved, so callers can act on the first gloss before the rest are scored.
+    """
+    ensure_gloss_index()
+    vocab = vocabulary.snapshot
+    files = vocab.keypoints
+    user_embedding = None
+    seen = set()
+    unmatched = []
+    for candidate in iter_candidates(user_input, vocab, unmatched):
+        if candidate in seen:
+            continue
+        seen.add(candidate)
+        if user_embedding is None:
+            user_embedding = encode_texts([user_input])[0]
+        with metrics.span("score"):
+            score = float(gloss_index.scores(user_embedding, [candidate])[0])
+        yield candidate, score
+
+    # Semantic fallback for the spans nothing matched, after the lexical matches
+    spans = semantic_spans(user_input, seen, unmatched)
+    if spans:
+        embeddings = encode_texts(spans + ([] if user_embedding is not None else [user_input]))
+        if user_embedding is None:
+            user_embedding = embeddings[-1]
+        for candidate in semantic_matches(embeddings[:len(spans)], files):
+            if candidate not in seen:
+                seen.add(candidate)
+                with metrics.span("score"):
+                    score = float(gloss_index.scores(user_embedding, [candidate])[0])
+                yield candidate, score
+
+def find_matching_keypoints_batch(user_inputs, batch_size=ENCODE_BATCH_SIZE, use_cache=True):
+    """
+    Match several inputs at once. Returns one list of (keypoint, score) per
+    input, each sorted by score in descending order.
+
+    Inputs already in the result cache are answered from it. Every other
+    input that has candidates, plus any candidate gloss not yet in the gloss
+    index, is encoded in a single batched encoder call.
+    """
+    user_inputs = [normalize_query(u) for u in user_inputs]
+    # One snapshot per call, so results are always cached under the vocabulary they came from
+    vocab = vocabulary.snapshot
+    if result_cache is None or not use_cache:
+        return _match_batch(user_inputs, vocab, batch_size)
+
+    fingerprint = vocab.fingerprint
+    with metrics.span("result_cache"):
+        results = [result_cache.get(f"{fingerprint}:{u}") for u in user_inputs]
+    todo = sorted({u for u, cached in zip(user_inputs, results) if cached is None})
+    computed = dict(zip(todo, _match_batch(todo, vocab, batch_size))) if todo else {}
+    for u, matches in computed.items():
+        result_cache.set(f"{fingerprint}:{u}", matches)
+    return [[tuple(m) for m in cached] if cached is not None else computed[u]
+            for u, cached in zip(user_inputs, results)]
+
+def _match_batch(user_inputs, vocab, batch_size):
+    ensure_gloss_index()
+    files = vocab.keypoints
+    # Lexical candidate search (its tokenize and synonyms stages are also reported on their own)
+    unmatched = [[] for _ in user_inputs]
+    with metrics.span("vocabulary_lookup"):
+        candidates = [match_candidates(user_input, vocab, misses)
+                      for user_input, misses in zip(user_inputs, unmatched)]
+    spans = [semantic_spans(user_input, found, misses)
+             for user_input, found, misses in zip(user_inputs, candidates, unmatched)]
+
+    if any(spans):
+        # The fallback spans of every input are encoded in one call
+        flat_spans = [span for input_spans in spans for span in input_spans]
+        embeddings = encode_texts(flat_spans, batch_size)
+        offset = 0
+        for i, input_spans in enumerate(spans):
+            extra = semantic_matches(embeddings[offset:offset + len(input_spans)], files)
+            offset += len(input_spans)
+            candidates[i] = candidates[i] + [g for g in extra if g not in candidates[i]]
+
+    queries = [user_input for user_input, found in zip(user_inputs, candidates) if found]
+    if not queries:
+        return [[] for _ in user_inputs]
+
+    missing = gloss_index.missing(g for found in candidates for g in found)
+    embeddings = encode_texts(queries + [gloss_text(g) for g in missing], batch_size)
+    encoded = dict(zip(missing, embeddings[len(queries):]))
 
-    # For each candidate, calculate the similarity score with the full user_input
     results = []
-    for candidate in candidates:
-        score = calculate_similarity(user_input, candidate)
-        results.append((candidate, score))
-    # Sort results by score in descending order (more similar first)
-    results.sort(key=lambda x: x[1], reverse=True)
+    query_embeddings = iter(embeddings[:len(queries)])
+    with metrics.span("score"):
+        for found in candidates:
+            if not found:
+                results.append([])
+                continue
+            # Score every candidate of this input with one dot product
+            scores = gloss_index.vectors(found, encoded) @ next(query_embeddings)
+            matches = list(zip(found, scores.tolist()))
+            # Sort results by score in descending order (more similar first)
+            matches.sort(key=lambda x: x[1], reverse=True)
+            results.append(matches)
     return results
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
+# Sample each request once for the latency histograms
+@app.before_request
+def start_timing():
+    request.metrics_started = metrics.start_request()
+
+@app.after_request
+def stop_timing(response):
+    endpoint = request.endpoint or "unknown"
+    started = getattr(request, "metrics_started", None)
+    if inspect.isgenerator(response.response):
+        # Generated bodies run after this hook: keep them sampled like their request and time it to the end
+        response.response = metrics.stream(response.response, endpoint, started)
+        started = None
+    metrics.end_request(endpoint, started)
+    return response
+
 # Home route: initial landing page
 @app.route('/')
 def home():
@@ -103,26 +519,241 @@ def converter():
                 flash("No matching keypoints found.")
             else:
                 # Build list of existing video files for keypoints
-                for kp, score in keyword_results:
-                    fname = f"{kp}.mp4"
-                    path  = os.path.join(HUMAN_VIDEO_DIR, fname)
-                    if os.path.exists(path):
-                        video_files.append(fname)
-                    else:
-                        flash(f"Video not found for keypoint: {kp}")
-
-    return render_template(
-        "index.html",
-        input_type=input_type,
-        user_input=user_input,
-        keyword_results=keyword_results,  # Pass list of (keypoint, score) tuples to the template
-        video_files=video_files
+                with metrics.span("video_lookup"):
+                    for kp, score in keyword_results:
+                        fname = vocabulary.video_file(kp)
+                        if fname:
+                            video_files.append(fname)
+                        else:
+                            flash(f"Video not found for keypoint: {kp}")
+
+    # Assembled videos for the sentence when enabled, MAX_SENTENCE_CLIPS clips each
+    sentence_urls = []
+    if SENTENCE_VIDEO and len(video_files) > 1:
+        glosses = [kp for kp, _ in keyword_results if vocabulary.video_file(kp)]
+        sentence_urls = [url_for("sentence_video", g=glosses[i:i + MAX_SENTENCE_CLIPS])
+                         for i in range(0, len(glosses), MAX_SENTENCE_CLIPS)]
+
+    with metrics.span("render"):
+        return render_template(
+            "index.html",
+            input_type=input_type,
+            user_input=user_input,
+            keyword_results=keyword_results,  # Pass list of (keypoint, score) tuples to the template
+            video_files=video_files,
+            sentence_video=SENTENCE_VIDEO,
+            sentence_urls=sentence_urls,
+            sentence_max_clips=MAX_SENTENCE_CLIPS
+        )
+
+def read_json_input():
+    """User input from a JSON body ({"input": ...}), form field or query string."""
+    data = request.get_json(silent=True)
+    data = {} if data is None else data
+    text = data.get("input") if isinstance(data, dict) else None
+    # A body such as {"input": 5} or ["x"] is a client error, not a server one
+    if not isinstance(data, dict) or not isinstance(text, (str, type(None))):
+        error = jsonify({"error": 'Expected a JSON object like {"input": "some text"}.', "matches": []})
+        error.status_code = 400
+        abort(error)
+    text = text or request.values.get("input", "")
+    return text.strip().lower()
+
+def video_url(fname):
+    """URL of a clip, versioned by its content hash so browsers can cache it for good."""
+    try:
+        return url_for("serve_video", filename=fname,
+                       v=content_etag(delivery_path(fname, HUMAN_VIDEO_DIR, DELIVERY_VIDEO_DIR)))
+    except OSError:
+        return url_for("serve_video", filename=fname)
+
+def match_payload(keypoint, score):
+    with metrics.span("video_lookup"):
+        fname = vocabulary.video_file(keypoint)
+    return {
+        "keypoint": keypoint,
+        "score": score,
+        "video": video_url(fname) if fname else None,
+    }
+
+# JSON translation endpoint: ranked glosses with their video URLs
+@app.route("/find-keypoint", methods=["POST"])
+def find_keypoint():
+    user_input = read_json_input()
+    if not user_input:
+        return jsonify({"error": "Please enter some text or use the mic.", "matches": []}), 400
+    matches = [match_payload(kp, score) for kp, score in find_matching_keypoints(user_input)]
+    return jsonify({"input": user_input, "matches": matches})
+
+# Streaming variant (Server-Sent Events): one "match" event per gloss in sentence
+# order as soon as it is resolved, then a "done" event with the ranked list
+@app.route("/find-keypoint/stream", methods=["GET", "POST"])
+def find_keypoint_stream():
+    user_input = read_json_input()
+
+    def events():
+        matches = []
+        for kp, score in iter_matching_keypoints(user_input) if user_input else ():
+            match = match_payload(kp, score)
+            matches.append(match)
+            yield f"event: match\ndata: {json.dumps(match)}\n\n"
+        matches.sort(key=lambda m: m["score"], reverse=True)
+        yield f"event: done\ndata: {json.dumps({'input': user_input, 'matches': matches})}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
-# Route to serve video files
+# Result cache size and hit/miss counters
+@app.route("/cache/stats")
+def cache_stats():
+    return jsonify(result_cache.stats() if result_cache is not None else {"enabled": False})
+
+# The clips of a gloss sequence joined into one MP4 (?g=hello&g=thank_you, at most
+# MAX_SENTENCE_CLIPS), assembled on first request and then served from the sentence cache
+@app.route("/sentence-video")
+def sentence_video():
+    glosses = request.args.getlist("g")
+    if len(glosses) > MAX_SENTENCE_CLIPS:
+        return jsonify({"error": f"at most {MAX_SENTENCE_CLIPS} glosses per sentence video"}), 400
+    video_files = [vocabulary.video_file(g) for g in glosses]
+    video_files = [f for f in video_files if f]
+    if not video_files:
+        abort(404)
+    if len(video_files) == 1:
+        return redirect(video_url(video_files[0]))
+    try:
+        fname, f = sentence_videos.open(video_files)
+    except Exception as e:
+        logging.exception(f"Sentence video assembly failed: {e}")
+        abort(500)
+    # Streamed from the handle opened by the cache, so eviction cannot remove it mid-response.
+    # Cache entries are named by their content, so they never change
+    size = os.fstat(f.fileno()).st_size
+    response = Response(wrap_file(request.environ, f), mimetype="video/mp4", direct_passthrough=True)
+    response.content_length = size
+    response.set_etag(os.path.splitext(fname)[0])
+    response.cache_control.public = True
+    response.cache_control.max_age = IMMUTABLE_MAX_AGE
+    return response.make_conditional(request, accept_ranges=True, complete_length=size)
+
+# Keypoint sequences of a sentence in the compact V2SK format (see keypoint_stream.py) for
+# client-side avatars: ?input=... (matched glosses in sentence order) or ?g=hello&g=thank_you,
+# plus optional &groups=pose,left_hand,right_hand and &landmarks=0,1,2 (indices in that layout)
+@app.route("/keypoints/stream", methods=["GET", "POST"])
+def keypoint_stream():
+    files = vocabulary.keypoints
+    glosses = request.values.getlist("g")
+    if not glosses:
+        user_input = read_json_input()
+        glosses = [kp for kp, _ in iter_matching_keypoints(user_input)] if user_input else []
+    glosses = [g for g in glosses if g in files]
+
+    groups = tuple(request.values.get("groups", ",".join(STREAM_GROUPS)).split(","))
+    if not groups or any(g not in GROUP_NAMES for g in groups) or len(set(groups)) != len(groups):
+        return jsonify({"error": f"groups must be a comma-separated subset of {', '.join(GROUP_NAMES)}"}), 400
+    landmarks = None
+    if request.values.get("landmarks"):
+        try:
+            landmarks = tuple(int(i) for i in request.values["landmarks"].split(","))
+        except ValueError:
+            landmarks = ()
+        if not landmarks or not all(0 <= i < num_landmarks(groups) for i in landmarks):
+            return jsonify({"error": f"landmarks must be indices below {num_landmarks(groups)}"}), 400
+
+    use_gzip = "gzip" in request.headers.get("Accept-Encoding", "")
+
+    def chunks():
+        # Each gloss is flushed as soon as it is encoded, so playback can start early
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if use_gzip else None
+
+        def emit(piece):
+            return compressor.compress(piece) + compressor.flush(zlib.Z_SYNC_FLUSH) if compressor else piece
+
+        archive = get_keypoint_archive()
+        yield emit(encode_header(len(glosses), groups, landmarks))
+        for gloss in glosses:
+            with metrics.span("keypoint_encode"):
+                record = gloss_record(gloss, files[gloss], groups, landmarks, archive)
+            yield emit(record)
+        if compressor:
+            yield compressor.flush()
+
+    headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding", "X-V2S-Glosses": json.dumps(glosses)}
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+    return Response(chunks(), mimetype="application/octet-stream", headers=headers)
+
+# Prometheus scrape target: per-stage and per-endpoint latency histograms plus cache counters
+@app.route("/metrics")
+def metrics_endpoint():
+    counters = []
+    if result_cache is not None:
+        stats = result_cache.stats()
+        counters += [(f"v2s_result_cache_{k}_total", f"Result cache {k.replace('_', ' ')}.", stats[k])
+                     for k in ("hits", "shared_hits", "misses", "evictions")]
+    if batching_encoder is not None:
+        counters += [("v2s_encoder_batches_total", "Batched encoder calls.", batching_encoder.batches),
+                     ("v2s_encoder_texts_total", "Texts encoded through the batcher.", batching_encoder.texts)]
+    return Response(metrics.render(counters), content_type=METRICS_CONTENT_TYPE)
+
+# Live voice transcripts (Server-Sent Events plus POST): the page opens
+# /transcript/<id>/events and POSTs each interim transcript as {"text": ..., "final": bool,
+# "seq": n} (n increasing per update; older ones are ignored); glosses are pushed as soon
+# as their words settle
+transcript_sessions = SessionStore()
+
+@app.route("/transcript/<session_id>", methods=["POST"])
+def post_transcript(session_id):
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        return jsonify({"error": 'Expected a JSON object like {"text": "...", "final": false}.'}), 400
+    seq = data.get("seq")
+    if seq is not None and (not isinstance(seq, int) or isinstance(seq, bool)):
+        return jsonify({"error": "seq must be an integer that increases with every update."}), 400
+    text = str(data.get("text", "")).strip().lower()
+    final = bool(data.get("final"))
+    session = transcript_sessions.get(session_id)
+    new = match_transcript(session, tokenize(text) if text else [], final, seq)
+    if new is None:
+        # Overtaken by a newer transcript: nothing to do
+        return jsonify({"session": session_id, "matches": [], "final": final, "stale": True})
+    return jsonify({"session": session_id, "matches": new, "final": final})
+
+@app.route("/transcript/<session_id>/events")
+def transcript_events(session_id):
+    session = transcript_sessions.get(session_id)
+    return Response(
+        session.stream(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Readiness probe: 200 once the gloss index is synced. Until then each probe starts the
+# sync in the background (unless it is already running), so V2S_WARMUP=0 still gets ready
+@app.route("/ready")
+def ready():
+    if not readiness["ready"] and not _gloss_index_lock.locked():
+        threading.Thread(target=_ensure_gloss_index_in_background, name="gloss-index", daemon=True).start()
+    return jsonify(readiness), 200 if readiness["ready"] else 503
+
+# Route to serve video files: strong content ETags, conditional requests and byte ranges
+# (the copies transcoded for progressive playback by `python video_transcode.py` when present)
 @app.route("/video/<filename>")
 def serve_video(filename):
-    return send_from_directory(HUMAN_VIDEO_DIR, filename)
+    path = safe_join(HUMAN_VIDEO_DIR, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    path = delivery_path(filename, HUMAN_VIDEO_DIR, DELIVERY_VIDEO_DIR)
+    etag = content_etag(path)
+    immutable = request.args.get("v") == etag
+    response = send_file(os.path.abspath(path), mimetype="video/mp4", etag=etag, conditional=True,
+                         max_age=IMMUTABLE_MAX_AGE if immutable else VIDEO_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = immutable
+    return response
 
 # About page route
 @app.route('/about')
@@ -134,5 +765,11 @@ def about():
 def contact():
     return render_template('contact.html')
 
+if WARM_UP:
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+
+readiness["import_seconds"] = round(time.perf_counter() - _IMPORT_STARTED, 3)
+logging.info(f"app imported in {readiness['import_seconds']}s")
+
 if __name__ == "__main__":
     app.run(debug=True, port=5001)
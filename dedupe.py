@@ -0,0 +1,313 @@
+"""
+Near-duplicate detection across the keypoint library.
+
+Clips pulled from several sources often end up stored twice under different
+glosses. Every gloss is reduced to a fixed-length feature sequence:
+
+    pose   nose, shoulders, elbows and wrists, centred on the mid-shoulder
+           point and scaled by the shoulder width (medians over the clip)
+    hands  21 points per hand relative to the wrist, scaled by the palm
+           length (wrist to middle-finger knuckle), so hand shape does not
+           depend on where the hand is (the pose wrists carry that)
+
+x/y only, resampled to SEQUENCE_LENGTH frames, so signing speed does not
+matter. All pairs are compared with dynamic time warping under a
+Sakoe-Chiba band. Distances are RMS per frame, in those normalised units.
+
+Exact DTW is only computed for pairs that survive a cascade of lower
+bounds against the duplicate threshold. The first is LB_Keogh on
+piecewise-aggregated envelopes, then the full LB_Keogh in both
+directions. All three are vectorized over every remaining pair of a
+row, and the DTW is batched over pairs along anti-diagonals. Rows are
+spread over a process pool.
+
+Outputs (in DEDUPE_DIR):
+
+    duplicates.json   clusters of glosses linked by distance <= threshold
+    similarity.npz    names, distance, similarity = 1 / (1 + distance / threshold)
+                      and exact; where exact is False the distance is a lower
+                      bound (always above the threshold), so that similarity
+                      is an upper bound below 0.5
+"""
+import os
+import sys
+import json
+import argparse
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from keypoint_store import ARCHIVE_DIR, KEYPOINT_DIR, group_slices, open_archive, read_keypoints, select_groups
+
+DEDUPE_DIR      = "data/dedupe"
+FEATURE_GROUPS  = ("pose", "left_hand", "right_hand")
+POSE_POINTS     = [0, 11, 12, 13, 14, 15, 16]   # nose, shoulders, elbows, wrists
+SEQUENCE_LENGTH = 32     # frames after resampling (a multiple of PAA_SEGMENTS)
+PAA_SEGMENTS    = 4      # segments of the coarse first lower bound
+WINDOW          = 0.1    # Sakoe-Chiba band as a fraction of SEQUENCE_LENGTH
+THRESHOLD       = 0.15   # RMS per-frame distance at or below which two glosses are duplicates
+DTW_BATCH       = 256    # pairs per vectorized DTW call
+
+
+def sequence_features(keypoints, mask, groups, length=SEQUENCE_LENGTH):
+    """(length, features) normalised pose/hand sequence for one gloss; None if it has no frames."""
+    if not len(keypoints):
+        return None
+    keypoints, mask = select_groups(keypoints, mask, groups, FEATURE_GROUPS)
+    slices = group_slices(FEATURE_GROUPS)
+    xy = np.asarray(keypoints[..., :2], dtype=np.float32)
+
+    pose, present = xy[:, slices["pose"]], mask[:, 0]
+    center, scale = np.zeros(2, dtype=np.float32), 1.0
+    if present.any():
+        shoulders = pose[present][:, [11, 12]]
+        center = np.median(shoulders.mean(axis=1), axis=0)
+        scale = float(np.median(np.linalg.norm(shoulders[:, 0] - shoulders[:, 1], axis=1)))
+    parts = [np.where(present[:, None, None], (pose[:, POSE_POINTS] - center) / max(scale, 1e-6), 0)]
+
+    for g, name in enumerate(FEATURE_GROUPS[1:], start=1):
+        hand, present = xy[:, slices[name]], mask[:, g]
+        relative = hand - hand[:, :1]
+        palm = float(np.median(np.linalg.norm(relative[present, 9], axis=1))) if present.any() else 1.0
+        parts.append(np.where(present[:, None, None], relative / max(palm, 1e-6), 0))
+
+    features = np.concatenate(parts, axis=1).reshape(len(xy), -1)
+    return resample(features, length)
+
+
+def resample(sequence, length):
+    """Linearly interpolate a (frames, features) sequence to `length` frames."""
+    positions = np.linspace(0, len(sequence) - 1, length)
+    lo = np.floor(positions).astype(int)
+    hi = np.minimum(lo + 1, len(sequence) - 1)
+    w = (positions - lo)[:, None]
+    return ((1 - w) * sequence[lo] + w * sequence[hi]).astype(np.float32)
+
+
+def envelopes(sequences, radius):
+    """Running max/min of each sequence over +-radius frames: (upper, lower), both (n, length, features)."""
+    padded = np.pad(sequences, ((0, 0), (radius, radius), (0, 0)), mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * radius + 1, axis=1)
+    return windows.max(axis=-1), windows.min(axis=-1)
+
+
+def paa(sequences, segments=PAA_SEGMENTS, reduce=np.mean):
+    n, length, dim = sequences.shape
+    return reduce(sequences.reshape(n, segments, length // segments, dim), axis=2)
+
+
+def lb_keogh(query, upper, lower, weight=1.0):
+    """
+    LB_Keogh of one query against many envelopes: squared distance of the
+    query to each envelope, a lower bound of the banded DTW cost. With PAA
+    inputs (segment means against segment max/min) `weight` is the segment
+    length; the bound stays valid because the squared distance is convex.
+    """
+    above = np.maximum(query - upper, 0)
+    below = np.maximum(lower - query, 0)
+    return weight * (above * above + below * below).sum(axis=(-2, -1))
+
+
+def dtw(x, y, radius):
+    """
+    Banded DTW cost (sum of squared frame distances) for P pairs of
+    equal-length sequences, x and y (P, length, features). Cells on one
+    anti-diagonal do not depend on each other, so each is one vector step.
+    """
+    pairs, length, _ = x.shape
+    cost = (np.einsum("pif,pif->pi", x, x)[:, :, None] + np.einsum("pjf,pjf->pj", y, y)[:, None, :]
+            - 2 * np.einsum("pif,pjf->pij", x, y))
+    np.maximum(cost, 0, out=cost)
+    i, j = np.indices((length, length))
+    cost[:, np.abs(i - j) > radius] = np.inf
+
+    acc = np.full((pairs, length + 1, length + 1), np.inf, dtype=np.float64)
+    acc[:, 0, 0] = 0
+    for k in range(2, 2 * length + 1):
+        rows = np.arange(max(1, k - length), min(length, k - 1) + 1)
+        cols = k - rows
+        best = np.minimum(np.minimum(acc[:, rows - 1, cols - 1], acc[:, rows - 1, cols]), acc[:, rows, cols - 1])
+        acc[:, rows, cols] = cost[:, rows - 1, cols - 1] + best
+    return acc[:, length, length]
+
+
+# Per-process state for the pair search (set once per worker by _init_pairs)
+_state = {}
+
+def _init_pairs(features, radius, limit):
+    upper, lower = envelopes(features, radius)
+    _state.update(
+        features=features, upper=upper, lower=lower, radius=radius, limit=limit,
+        paa_features=paa(features), paa_upper=paa(upper, reduce=np.max), paa_lower=paa(lower, reduce=np.min),
+    )
+
+def _compare_rows(rows):
+    """
+    Compare each row's gloss with every later gloss. Returns, per row, the
+    best known DTW cost to each later gloss (exact, or a lower bound for
+    pruned pairs), which of them are exact, and pruning counts.
+    """
+    s = _state
+    n, length = s["features"].shape[:2]
+    limit, segment = s["limit"], length // PAA_SEGMENTS
+    out = []
+    for i in rows:
+        others = np.arange(i + 1, n)
+        cost = lb_keogh(s["paa_features"][i], s["paa_upper"][others], s["paa_lower"][others], segment)
+        exact = np.zeros(len(others), dtype=bool)
+        survivors = np.flatnonzero(cost <= limit)
+        counts = {"paa": len(others) - len(survivors)}
+
+        # Full LB_Keogh, query against candidate envelopes and the reverse
+        js = others[survivors]
+        bound = np.maximum(lb_keogh(s["features"][i], s["upper"][js], s["lower"][js]),
+                           lb_keogh(s["features"][js], s["upper"][i], s["lower"][i]))
+        cost[survivors] = np.maximum(cost[survivors], bound)
+        counts["keogh"] = int((bound > limit).sum())
+        survivors = survivors[bound <= limit]
+
+        for start in range(0, len(survivors), DTW_BATCH):
+            batch = survivors[start:start + DTW_BATCH]
+            x = np.broadcast_to(s["features"][i], (len(batch),) + s["features"].shape[1:])
+            cost[batch] = dtw(x, s["features"][others[batch]], s["radius"])
+            exact[batch] = True
+        counts["dtw"] = len(survivors)
+        out.append((i, cost.astype(np.float32), exact, counts))
+    return out
+
+
+@lru_cache(maxsize=None)
+def _archive(archive_dir):
+    return open_archive(archive_dir) if archive_dir else None
+
+
+def _load_features(gloss, path, archive_dir=ARCHIVE_DIR):
+    # Packed glosses are read from the memory-mapped archive (one per process)
+    keypoints, mask, groups = read_keypoints(gloss, path, _archive(archive_dir))
+    return sequence_features(keypoints, mask, groups)
+
+
+def find_duplicates(sources, threshold=THRESHOLD, window=WINDOW, workers=1, archive_dir=ARCHIVE_DIR):
+    """
+    Compare every pair of glosses in {gloss: keypoint file}. Returns
+    (names, distance matrix, exact mask, stats); see the module notes.
+    Glosses packed in the archive at `archive_dir` are read from it.
+    """
+    names = sorted(sources)
+    paths = [sources[g] for g in names]
+    archive_dirs = [archive_dir] * len(names)
+    if workers <= 1:
+        loaded = list(map(_load_features, names, paths, archive_dirs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            loaded = list(pool.map(_load_features, names, paths, archive_dirs, chunksize=16))
+    kept = [(g, f) for g, f in zip(names, loaded) if f is not None]
+    names = [g for g, _ in kept]
+    n = len(names)
+    stats = {"glosses": n, "skipped": len(sources) - n, "pairs": n * (n - 1) // 2,
+             "pruned_paa": 0, "pruned_keogh": 0, "dtw": 0}
+    distance = np.zeros((n, n), dtype=np.float32)
+    exact = np.ones((n, n), dtype=bool)
+    if n < 2:
+        return names, distance, exact, stats
+
+    features = np.stack([f for _, f in kept])
+    radius = max(1, int(np.ceil(window * SEQUENCE_LENGTH)))
+    limit = threshold * threshold * SEQUENCE_LENGTH
+    # Early rows have the most partners; interleave them so every task costs about the same
+    tasks = max(1, workers) * 8
+    chunks = [list(range(k, n - 1, tasks)) for k in range(min(tasks, n - 1))]
+
+    def collect(results):
+        for chunk in results:
+            for i, cost, row_exact, counts in chunk:
+                row = np.sqrt(cost / SEQUENCE_LENGTH)
+                distance[i, i + 1:] = distance[i + 1:, i] = row
+                exact[i, i + 1:] = exact[i + 1:, i] = row_exact
+                stats["pruned_paa"] += counts["paa"]
+                stats["pruned_keogh"] += counts["keogh"]
+                stats["dtw"] += counts["dtw"]
+
+    if workers <= 1:
+        _init_pairs(features, radius, limit)
+        collect(map(_compare_rows, chunks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_pairs,
+                                 initargs=(features, radius, limit)) as pool:
+            collect(pool.map(_compare_rows, chunks))
+    return names, distance, exact, stats
+
+
+def duplicate_clusters(names, distance, exact, threshold=THRESHOLD):
+    """Connected components of the exact pairs within `threshold`, largest first."""
+    parent = list(range(len(names)))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = parent[parent[a]]
+            a = parent[a]
+        return a
+
+    pairs = []
+    for i, j in zip(*np.nonzero(np.triu(exact & (distance <= threshold), k=1))):
+        parent[find(i)] = find(j)
+        pairs.append((int(i), int(j)))
+    members = {}
+    for i in range(len(names)):
+        members.setdefault(find(i), []).append(i)
+    clusters = []
+    for group in members.values():
+        if len(group) < 2:
+            continue
+        inside = set(group)
+        clusters.append({
+            "glosses": [names[i] for i in group],
+            "pairs": [[names[i], names[j], round(float(distance[i, j]), 4)]
+                      for i, j in pairs if i in inside],
+        })
+    clusters.sort(key=lambda c: (-len(c["glosses"]), c["glosses"]))
+    return clusters
+
+
+def save_results(output_dir, names, distance, exact, clusters, stats, threshold=THRESHOLD):
+    os.makedirs(output_dir, exist_ok=True)
+    matrix_path = os.path.join(output_dir, "similarity.npz")
+    with open(matrix_path + ".tmp", "wb") as f:
+        np.savez(f, names=np.array(names), distance=distance, exact=exact,
+                 similarity=(1.0 / (1.0 + distance / threshold)).astype(np.float32))
+    os.replace(matrix_path + ".tmp", matrix_path)
+    clusters_path = os.path.join(output_dir, "duplicates.json")
+    with open(clusters_path + ".tmp", "w") as f:
+        json.dump({"threshold": threshold, "stats": stats, "clusters": clusters}, f, indent=2)
+    os.replace(clusters_path + ".tmp", clusters_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Find near-duplicate signs in the keypoint library with DTW.")
+    parser.add_argument("--keypoint-dir", default=KEYPOINT_DIR)
+    parser.add_argument("--output-dir", default=DEDUPE_DIR)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="packed keypoint archive to read from")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="RMS per-frame distance (normalised units) for a duplicate")
+    parser.add_argument("--window", type=float, default=WINDOW, help="DTW band as a fraction of the sequence")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="number of processes")
+    args = parser.parse_args()
+
+    from vocabulary import scan_dir, KEYPOINT_EXTENSIONS
+    files = scan_dir(args.keypoint_dir, KEYPOINT_EXTENSIONS)
+    sources = {gloss: os.path.join(args.keypoint_dir, fname) for gloss, fname in files.items()}
+    if not sources:
+        sys.exit(f"No keypoint files in {args.keypoint_dir}")
+
+    names, distance, exact, stats = find_duplicates(sources, args.threshold, args.window, args.workers,
+                                                    args.archive_dir)
+    clusters = duplicate_clusters(names, distance, exact, args.threshold)
+    save_results(args.output_dir, names, distance, exact, clusters, stats, args.threshold)
+
+    pairs = max(stats["pairs"], 1)
+    print(f"Compared {stats['glosses']} glosses ({stats['pairs']} pairs, {stats['skipped']} empty skipped): "
+          f"{stats['pruned_paa'] / pairs:.1%} pruned by PAA bound, {stats['pruned_keogh'] / pairs:.1%} "
+          f"by LB_Keogh, {stats['dtw']} DTW computed")
+    for cluster in clusters:
+        print("  " + ", ".join(cluster["glosses"]))
+    print(f"{len(clusters)} duplicate clusters written to {args.output_dir}")
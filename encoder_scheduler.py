@@ -0,0 +1,107 @@
+import time
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future
+import numpy as np
+
+# Defaults: flush a batch after this many texts or this many milliseconds
+MAX_BATCH_SIZE = 64
+MAX_WAIT_MS    = 5
+
+
+class BatchingEncoder:
+    """
+    Cross-request micro-batching in front of a sentence encoder.
+
+    Callers submit texts and get a Future back; a single worker thread
+    collects submissions for up to `max_wait_ms` (or until `max_batch_size`
+    texts are waiting), runs one batched `encode` call, and resolves each
+    Future with its own rows. Concurrent requests therefore share forward
+    passes instead of contending for the model one sentence at a time.
+
+    `encode` is any callable taking a list of strings and returning an
+    (n, dim) array. Use `encode` from sync code (Flask views) and `aencode`
+    from async servers.
+    """
+
+    def __init__(self, encode, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self._encode        = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait       = max_wait_ms / 1000.0
+        self._queue  = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="encoder-batcher", daemon=True)
+        self._worker.start()
+        self.batches = 0   # encode calls made
+        self.texts   = 0   # texts encoded
+
+    def submit(self, texts):
+        """Queue texts for encoding; the Future resolves to their (n, dim) embeddings."""
+        future = Future()
+        texts = list(texts)
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype=np.float32))
+        else:
+            self._queue.put((texts, future))
+        return future
+
+    def encode(self, texts):
+        """Blocking encode through the shared batch."""
+        return self.submit(texts).result()
+
+    async def aencode(self, texts):
+        """Awaitable encode through the shared batch."""
+        return await asyncio.wrap_future(self.submit(texts))
+
+    def __call__(self, texts):
+        return self.encode(texts)
+
+    def close(self):
+        self._queue.put(None)
+        self._worker.join()
+
+    def _collect(self, first):
+        """Gather submissions until the batch is full or the wait window closes."""
+        pending = [first]
+        size = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)   # let the main loop see the shutdown
+                break
+            pending.append(item)
+            size += len(item[0])
+        return pending
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            pending = self._collect(first)
+            # Skip requests whose caller already gave up
+            pending = [(texts, future) for texts, future in pending if future.set_running_or_notify_cancel()]
+            if not pending:
+                continue
+            texts = [t for batch, _ in pending for t in batch]
+            try:
+                embeddings = self._encode(texts)
+            except Exception as e:
+                logging.exception("Batched encode failed")
+                for _, future in pending:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            start = 0
+            for batch, future in pending:
+                future.set_result(embeddings[start:start + len(batch)])
+                start += len(batch)
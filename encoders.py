@@ -0,0 +1,181 @@
+"""
+Sentence encoder backends.
+
+Every backend exposes `encode(texts, batch_size)` returning L2-normalised
+float32 embeddings, one row per text:
+
+    torch      SentenceTransformer on PyTorch (the baseline)
+    onnx       the same transformer exported to ONNX Runtime, float32
+    onnx-int8  the ONNX model with dynamically int8-quantized weights
+
+Export the ONNX models once with `python encoders.py export`, then select a
+backend with V2S_ENCODER_BACKEND. `python encoders.py parity <gestures.csv>`
+reports how closely a backend's rankings agree with the PyTorch baseline.
+"""
+import os
+import sys
+import argparse
+import numpy as np
+
+import resources
+
+BACKENDS        = ("torch", "onnx", "onnx-int8")
+ENCODER_BACKEND = os.environ.get("V2S_ENCODER_BACKEND", "torch")
+ONNX_DIR        = os.path.join(resources.RESOURCE_DIR, "onnx", "all-MiniLM-L6-v2")
+ONNX_FILES      = {"onnx": "model.onnx", "onnx-int8": "model-int8.onnx"}
+MAX_SEQ_LENGTH  = 256   # all-MiniLM-L6-v2's max_seq_length
+
+
+def normalize(embeddings):
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    return (embeddings / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+class TorchEncoder:
+    """SentenceTransformer on PyTorch."""
+
+    name = "torch"
+
+    def __init__(self):
+        self.model = resources.load_model()
+
+    def encode(self, texts, batch_size=64):
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                                 normalize_embeddings=True).astype(np.float32)
+
+
+class OnnxEncoder:
+    """The exported transformer on ONNX Runtime, with MiniLM's mean pooling and normalisation."""
+
+    def __init__(self, backend="onnx", onnx_dir=ONNX_DIR, threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = os.path.join(onnx_dir, ONNX_FILES[backend])
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found; run `python encoders.py export` first")
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.name = backend
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(onnx_dir)
+
+    def encode(self, texts, batch_size=64):
+        out = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(texts[start:start + batch_size], padding=True, truncation=True,
+                                    max_length=MAX_SEQ_LENGTH, return_tensors="np")
+            feeds = {k: v.astype(np.int64) for k, v in tokens.items() if k in self.inputs}
+            hidden = self.session.run(None, feeds)[0]
+            mask = tokens["attention_mask"][..., None].astype(np.float32)
+            pooled = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            out.append(normalize(pooled))
+        return np.concatenate(out) if out else np.zeros((0, 0), dtype=np.float32)
+
+
+def encoder_id(backend=ENCODER_BACKEND):
+    """What a backend's embeddings depend on: the model and the backend (which implies its quantization)."""
+    return {"model": resources.MODEL_NAME, "backend": backend}
+
+
+def load_encoder(backend=ENCODER_BACKEND):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend {backend!r}; choose one of {', '.join(BACKENDS)}")
+    if backend == "torch":
+        return TorchEncoder()
+    resources.configure()
+    return OnnxEncoder(backend)
+
+
+def export_onnx(onnx_dir=ONNX_DIR, quantize=True):
+    """Export the encoder's transformer to ONNX (plus an int8 copy) with its tokenizer."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    resources.configure()
+    source = resources.model_source()
+    tokenizer = AutoTokenizer.from_pretrained(source)
+    model = AutoModel.from_pretrained(source).eval()
+    os.makedirs(onnx_dir, exist_ok=True)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = list(sample.keys())
+    axes = {name: {0: "batch", 1: "sequence"} for name in names}
+    axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    path = os.path.join(onnx_dir, ONNX_FILES["onnx"])
+    with torch.no_grad():
+        torch.onnx.export(model, tuple(sample[n] for n in names), path, input_names=names,
+                          output_names=["last_hidden_state"], dynamic_axes=axes, opset_version=14)
+    tokenizer.save_pretrained(onnx_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(path, os.path.join(onnx_dir, ONNX_FILES["onnx-int8"]), weight_type=QuantType.QInt8)
+
+
+def parity(queries, glosses, baseline, candidate, k=5):
+    """
+    Compare two encoders on ranking `glosses` for each query.
+
+    Returns top-1 agreement, mean top-k overlap, Spearman correlation of the
+    full rankings and the largest absolute score difference.
+    """
+    from gloss_index import gloss_text
+
+    k = min(k, len(glosses))
+    texts = [gloss_text(g) for g in glosses]
+    scores = []
+    for encoder in (baseline, candidate):
+        q = encoder.encode(list(queries))
+        g = encoder.encode(texts)
+        scores.append(q @ g.T)
+    base, cand = scores
+
+    base_order = np.argsort(-base, axis=1)
+    cand_order = np.argsort(-cand, axis=1)
+    top1 = np.mean(base_order[:, 0] == cand_order[:, 0])
+    overlap = np.mean([len(set(b[:k]) & set(c[:k])) / k for b, c in zip(base_order, cand_order)])
+    # Spearman: Pearson correlation of the per-query rank vectors
+    base_rank = np.argsort(base_order, axis=1).astype(np.float64)
+    cand_rank = np.argsort(cand_order, axis=1).astype(np.float64)
+    base_rank -= base_rank.mean(axis=1, keepdims=True)
+    cand_rank -= cand_rank.mean(axis=1, keepdims=True)
+    denom = np.sqrt((base_rank ** 2).sum(axis=1) * (cand_rank ** 2).sum(axis=1))
+    spearman = np.mean((base_rank * cand_rank).sum(axis=1) / np.maximum(denom, 1e-12))
+    return {
+        "queries": len(queries),
+        "glosses": len(glosses),
+        "top1_agreement": round(float(top1), 4),
+        f"top{k}_overlap": round(float(overlap), 4),
+        "spearman": round(float(spearman), 4),
+        "max_abs_score_diff": round(float(np.abs(base - cand).max()), 5),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export ONNX encoders or check their parity with PyTorch.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help=f"export ONNX models into {ONNX_DIR}")
+    export.add_argument("--no-quantize", action="store_true")
+    check = sub.add_parser("parity", help="compare a backend's rankings with the torch baseline")
+    check.add_argument("gestures_csv", help="test set with a 'name' column (as used by test.py)")
+    check.add_argument("--backend", default="onnx-int8", choices=BACKENDS[1:])
+    check.add_argument("--keypoint-dir", default="data/key")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        export_onnx(quantize=not args.no_quantize)
+        print(f"Exported ONNX encoder to {ONNX_DIR}")
+        sys.exit(0)
+
+    import json
+    import pandas as pd
+    from vocabulary import scan_dir, KEYPOINT_EXTENSIONS
+
+    names = [str(n).strip() for n in pd.read_csv(args.gestures_csv)["name"]]
+    queries = [n.replace("_", " ").lower() for n in names]
+    glosses = sorted(scan_dir(args.keypoint_dir, KEYPOINT_EXTENSIONS)) or sorted({n.lower() for n in names})
+    report = parity(queries, glosses, load_encoder("torch"), load_encoder(args.backend))
+    print(json.dumps({"backend": args.backend, **report}, indent=4))
@@ -4,65 +4,12 @@ import time
 import psutil
 from collections import defaultdict
 import numpy as np
-import nltk
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords, wordnet
-from sentence_transformers import SentenceTransformer, util
 
-# One-time NLTK downloads
-nltk.download("punkt")
-nltk.download("stopwords")
-nltk.download("wordnet")
+# Matching pipeline shared with the Flask app (vocabulary, gloss index, synonyms)
+from app import find_matching_keypoints_batch
 
-# Configuration (same as your Flask app)
-KEYPOINT_DIR = "data/key"
-HUMAN_VIDEO_DIR = "data/video"
-STOPWORDS = set(stopwords.words("english")) - {"who", "what", "where", "when", "why", "how"}
-
-# Load BERT model
-bert_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-
-# Reuse your preprocessing functions
-def preprocess_text(text):
-    return [w for w in word_tokenize(text.lower()) if w not in STOPWORDS]
-
-def expand_query_with_synonyms(word):
-    syns = set()
-    for s in wordnet.synsets(word):
-        for lem in s.lemmas():
-            syns.add(lem.name())
-    return syns
-
-def calculate_similarity(user_input, candidate):
-    candidate_text = candidate.replace("_", " ")
-    user_embedding = bert_model.encode(user_input, convert_to_tensor=True)
-    candidate_embedding = bert_model.encode(candidate_text, convert_to_tensor=True)
-    similarity = util.cos_sim(user_embedding, candidate_embedding)
-    return float(similarity.cpu().numpy())
-
-def find_matching_keypoints(user_input):
-    files = {
-        fname[:-5]: os.path.join(KEYPOINT_DIR, fname)
-        for fname in os.listdir(KEYPOINT_DIR) if fname.endswith(".json")
-    }
-    candidates = set()
-    phrase = user_input.replace(" ", "_")
-    if phrase in files:
-        candidates.add(phrase)
-    for w in preprocess_text(user_input):
-        if w in files:
-            candidates.add(w)
-        else:
-            for syn in expand_query_with_synonyms(w):
-                if syn in files:
-                    candidates.add(syn)
-                    break
-    results = []
-    for candidate in candidates:
-        score = calculate_similarity(user_input, candidate)
-        results.append((candidate, score))
-    results.sort(key=lambda x: x[1], reverse=True)
-    return results
+# Queries matched per find_matching_keypoints_batch call
+BATCH_SIZE = 32
 
 # Mock test dataset (replace with your actual dataset)
 TEST_DATASET = [
@@ -78,7 +25,40 @@ TEST_DATASET = [
 MOCK_KEYPOINTS = {"hello", "world", "good_morning", "thank_you", "how_are_you", "sign_language"}
 MOCK_VIDEOS = {"hello.mp4", "world.mp4", "thank_you.mp4", "sign_language.mp4"}
 
-def evaluate_metrics():
+def timed_match(batch):
+    """(results, wall-clock seconds) for one find_matching_keypoints_batch call."""
+    start_time = time.time()
+    # Bypass the result cache so repeated test inputs are timed like first requests
+    results = find_matching_keypoints_batch(batch, use_cache=False)
+    return results, time.time() - start_time
+
+def match_in_batches(user_inputs, batch_size=BATCH_SIZE):
+    """
+    Match inputs in batches. Returns ([(results or None on error, seconds)] per
+    input, [wall-clock seconds] per successful batch). A query is charged its
+    share of its batch's time; if a batch fails, its inputs are retried one at
+    a time so only the failing ones are lost.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
+    outcomes, batch_times = [], []
+    for start in range(0, len(user_inputs), batch_size):
+        batch = user_inputs[start:start + batch_size]
+        try:
+            results, elapsed = timed_match(batch)
+        except Exception:
+            for user_input in batch:
+                try:
+                    (result,), elapsed = timed_match([user_input])
+                    outcomes.append((result, elapsed))
+                except Exception:
+                    outcomes.append((None, 0.0))
+            continue
+        batch_times.append(elapsed)
+        outcomes.extend((r, elapsed / len(batch)) for r in results)
+    return outcomes, batch_times
+
+def evaluate_metrics(batch_size=BATCH_SIZE):
     metrics = {}
     process = psutil.Process(os.getpid())
     
@@ -94,22 +74,23 @@ def evaluate_metrics():
     input_handling_total = 0
     response_times = []
     
+    # Process valid inputs in batches up front
+    outcomes, batch_times = match_in_batches([u for u, _ in TEST_DATASET if u.strip()], batch_size)
+    outcomes = iter(outcomes)
+
     # Test each input
     for user_input, expected_keypoints in TEST_DATASET:
         input_handling_total += 1
-        start_time = time.time()
         
         # Handle empty/invalid input
         if not user_input.strip():
             input_handling_correct += 1  # Correctly flagged empty input
             continue
         
-        # Process valid input
-        try:
-            keyword_results = find_matching_keypoints(user_input)
-            input_handling_correct += 1
-        except Exception:
+        keyword_results, elapsed = next(outcomes)
+        if keyword_results is None:
             continue
+        input_handling_correct += 1
         
         # Evaluate keypoint matching
         retrieved_keypoints = {kp for kp, _ in keyword_results}
@@ -135,7 +116,7 @@ def evaluate_metrics():
                 video_retrieval_success += 1
         
         # Measure response time
-        response_times.append(time.time() - start_time)
+        response_times.append(elapsed)
     
     # Compute metrics
     precision = true_positives / (true_positives + false_positives) if (true_positives + false_positives) > 0 else 0
@@ -147,6 +128,7 @@ def evaluate_metrics():
     video_retrieval_rate = video_retrieval_success / video_retrieval_total if video_retrieval_total > 0 else 0
     input_handling_accuracy = input_handling_correct / input_handling_total if input_handling_total > 0 else 0
     avg_response_time = np.mean(response_times) if response_times else 0
+    avg_batch_time = np.mean(batch_times) if batch_times else 0
     memory_usage_mb = process.memory_info().rss / (1024 * 1024)  # Convert bytes to MB
     
     # Store metrics
@@ -157,7 +139,9 @@ def evaluate_metrics():
     metrics["avg_similarity_incorrect"] = round(avg_similarity_incorrect, 3)
     metrics["video_retrieval_rate"] = round(video_retrieval_rate, 3)
     metrics["input_handling_accuracy"] = round(input_handling_accuracy, 3)
-    metrics["avg_response_time_seconds"] = round(avg_response_time, 3)
+    metrics["avg_response_time_seconds"] = round(avg_response_time, 3)  # per query (share of its batch)
+    metrics["avg_batch_time_seconds"] = round(avg_batch_time, 3)        # wall-clock per batch call
+    metrics["batch_size"] = batch_size
     metrics["memory_usage_mb"] = round(memory_usage_mb, 2)
     
     # Save to JSON
@@ -2,77 +2,317 @@ import cv2
 import mediapipe as mp
 import os
 import json
+import hashlib
 import logging
+import argparse
+from itertools import chain
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 from tqdm import tqdm
+import numpy as np
+
+from keypoint_store import (GROUP_NAMES, LANDMARK_GROUPS, array_to_frames, group_slices,
+                            num_landmarks, save_keypoints)
 
 # Initialize logging
 logging.basicConfig(filename="keypoint_extraction.log", level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
 # Initialize Mediapipe holistic model
-mp_holistic = mp.solutions.holistic  
+mp_holistic = mp.solutions.holistic
 mp_drawing = mp.solutions.drawing_utils
 
 # Paths
-VIDEO_DIR = "data/video"  
-KEYPOINT_DIR = "data/key"  
+VIDEO_DIR = "data/video"
+KEYPOINT_DIR = "data/key"
 os.makedirs(KEYPOINT_DIR, exist_ok=True)
 
+# Journal of extracted videos (mtime/size/hash); kept outside KEYPOINT_DIR so it is not a gloss
+MANIFEST_PATH = "data/keypoint_manifest.jsonl"
+
+# Output format: "json" (nested lists, legacy) or "npz" (float32 array + presence mask)
+OUTPUT_FORMAT = "json"
+
+# Landmark groups to keep, e.g. ("pose", "left_hand", "right_hand") to drop the 468-point face mesh
+KEYPOINT_GROUPS = GROUP_NAMES
+
+# Holistic result attribute for each landmark group
+RESULT_FIELDS = {
+    "pose": "pose_landmarks",
+    "left_hand": "left_hand_landmarks",
+    "right_hand": "right_hand_landmarks",
+    "face": "face_landmarks",
+}
+
 # Frame processing interval (every Nth frame)
-FRAME_SKIP = 2  
+FRAME_SKIP = 2
 
-def extract_keypoints(video_path):
-    """Extracts keypoints (pose, hands, face) from a video."""
+# Optional decode targets: sample frames at this rate instead of every FRAME_SKIP-th
+# frame, and downscale frames taller than MAX_HEIGHT before colour conversion
+TARGET_FPS = None
+MAX_HEIGHT = None
+
+def new_holistic():
+    return mp_holistic.Holistic(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+
+def extract_keypoints(video_path, holistic=None, groups=KEYPOINT_GROUPS,
+                      target_fps=TARGET_FPS, max_height=MAX_HEIGHT):
+    """
+    Extracts keypoints (pose, hands, face) from a video.
+
+    Returns (keypoints, mask): a float32 (frames, landmarks, 3) array holding
+    only the requested landmark groups and a (frames, groups) presence mask,
+    laid out as in keypoint_store.py. Frames are sampled every FRAME_SKIP-th
+    frame, or at `target_fps` if given; frames taller than `max_height` are
+    downscaled first. Landmarks are normalised, so scaling does not change them.
+    """
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         logging.error(f"Could not open video: {video_path}")
         return None
 
-    keypoints_list = []
+    if holistic is None:
+        with new_holistic() as holistic:
+            keypoints = _extract_frames(cap, holistic, groups, target_fps, max_height)
+    else:
+        keypoints = _extract_frames(cap, holistic, groups, target_fps, max_height)
+
+    cap.release()
+    return keypoints
+
+class FrameBuffer:
+    """Preallocated (frames, landmarks, 3) buffer that doubles its capacity when full."""
+
+    def __init__(self, groups, capacity=64):
+        self.groups = tuple(groups)
+        self.slices = [(RESULT_FIELDS[name], s) for name, s in group_slices(self.groups).items()]
+        self.counts = [LANDMARK_GROUPS[name] for name in self.groups]
+        self.keypoints = np.zeros((max(capacity, 1), num_landmarks(self.groups), 3), dtype=np.float32)
+        self.mask = np.zeros((max(capacity, 1), len(self.groups)), dtype=bool)
+        self.size = 0
+
+    def append(self, results):
+        """Copy the selected landmark groups of one Holistic result into the next row."""
+        if self.size == len(self.keypoints):
+            self._grow()
+        row = self.keypoints[self.size]
+        for g, (field, landmarks_slice) in enumerate(self.slices):
+            landmarks = getattr(results, field)
+            if landmarks is None:
+                continue
+            count = self.counts[g]
+            coords = chain.from_iterable((lm.x, lm.y, lm.z) for lm in landmarks.landmark)
+            row[landmarks_slice] = np.fromiter(coords, dtype=np.float32, count=count * 3).reshape(count, 3)
+            self.mask[self.size, g] = True
+        self.size += 1
+
+    def arrays(self):
+        return self.keypoints[:self.size], self.mask[:self.size]
+
+    def _grow(self):
+        capacity = len(self.keypoints) * 2
+        keypoints = np.zeros((capacity,) + self.keypoints.shape[1:], dtype=np.float32)
+        mask = np.zeros((capacity, self.mask.shape[1]), dtype=bool)
+        keypoints[:self.size] = self.keypoints
+        mask[:self.size] = self.mask
+        self.keypoints, self.mask = keypoints, mask
+
+def frame_step(cap, target_fps=None):
+    """Source frames per processed frame: FRAME_SKIP, or source fps / target fps."""
+    source_fps = cap.get(cv2.CAP_PROP_FPS) or 0
+    if target_fps and source_fps > 0:
+        return max(source_fps / target_fps, 1.0)
+    return float(FRAME_SKIP)
+
+def _extract_frames(cap, holistic, groups=KEYPOINT_GROUPS, target_fps=None, max_height=None):
+    step = frame_step(cap, target_fps)
+    # Size the buffer from the container's frame count so it rarely has to grow
+    expected = int(int(cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0) / step) + 1
+    buffer = FrameBuffer(groups, capacity=expected)
     frame_count = 0
+    next_frame = step
 
-    with mp_holistic.Holistic(min_detection_confidence=0.5, min_tracking_confidence=0.5) as holistic:
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break  
+    while cap.isOpened():
+        # grab() only demuxes; frames that are skipped are never decoded/converted
+        if not cap.grab():
+            break
+        frame_count += 1
+        if frame_count < next_frame:
+            continue
+        next_frame += step
 
-            # Process every Nth frame
-            frame_count += 1
-            if frame_count % FRAME_SKIP != 0:
-                continue  
+        ret, frame = cap.retrieve()
+        if not ret:
+            break
 
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            results = holistic.process(frame_rgb)  
+        height, width = frame.shape[:2]
+        if max_height and height > max_height:
+            size = (max(1, round(width * max_height / height)), max_height)
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
 
-            keypoints = {
-                "pose": [[lm.x, lm.y, lm.z] for lm in results.pose_landmarks.landmark] if results.pose_landmarks else [],
-                "left_hand": [[lm.x, lm.y, lm.z] for lm in results.left_hand_landmarks.landmark] if results.left_hand_landmarks else [],
-                "right_hand": [[lm.x, lm.y, lm.z] for lm in results.right_hand_landmarks.landmark] if results.right_hand_landmarks else [],
-                "face": [[lm.x, lm.y, lm.z] for lm in results.face_landmarks.landmark] if results.face_landmarks else []
-            }
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        results = holistic.process(frame_rgb)
+        buffer.append(results)
 
-            keypoints_list.append(keypoints)
+    return buffer.arrays()
 
-    cap.release()
-    return keypoints_list
-
-def process_all_videos():
-    """Processes all videos and extracts keypoints as JSON."""
-    for video_file in tqdm(os.listdir(VIDEO_DIR), desc="Processing Videos"):
-        if video_file.endswith(".mp4"):
-            video_path = os.path.join(VIDEO_DIR, video_file)
-            gesture_name = os.path.splitext(video_file)[0]  
-
-            keypoints = extract_keypoints(video_path)
-            if keypoints:
-                json_path = os.path.join(KEYPOINT_DIR, f"{gesture_name}.json")
-                with open(json_path, "w") as f:
-                    json.dump(keypoints, f, indent=4)
-                logging.info(f"Saved keypoints: {json_path}")
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-1 of a file's contents."""
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def video_signature(video_path):
+    st = os.stat(video_path)
+    return {"mtime": st.st_mtime_ns, "size": st.st_size}
+
+def load_manifest(path=MANIFEST_PATH):
+    """Read the extraction journal; later lines win and a torn last line (from a crash) is ignored."""
+    manifest = {}
+    if not os.path.exists(path):
+        return manifest
+    with open(path) as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            manifest[entry["video"]] = entry
+    return manifest
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    """Rewrite the journal with one line per video."""
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        for entry in manifest.values():
+            f.write(json.dumps(entry) + "\n")
+    os.replace(tmp, path)
+
+def keypoint_path(gesture_name, fmt=OUTPUT_FORMAT):
+    return os.path.join(KEYPOINT_DIR, f"{gesture_name}.{fmt}")
+
+def save_output(path, keypoints, mask, groups=KEYPOINT_GROUPS, fmt=OUTPUT_FORMAT):
+    """Atomically write one video's keypoints in the chosen format."""
+    if fmt == "npz":
+        save_keypoints(path, keypoints, mask, groups)
+        return
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(array_to_frames(keypoints, mask, groups), f, indent=4)
+    os.replace(tmp_path, path)
+
+def extraction_params(fmt=OUTPUT_FORMAT, groups=KEYPOINT_GROUPS, target_fps=TARGET_FPS, max_height=MAX_HEIGHT):
+    """Settings the keypoints depend on; recorded per manifest entry so changing any of them re-extracts."""
+    return {"format": fmt, "groups": list(groups), "target_fps": target_fps, "max_height": max_height,
+            "frame_skip": FRAME_SKIP, "mediapipe": getattr(mp, "__version__", None)}
+
+def is_current(entry, video_path, output_path, params=None):
+    """True if the keypoints in `output_path` were extracted from this exact video with `params`."""
+    if entry is None or not os.path.exists(output_path):
+        return False
+    if entry.get("params") != (params or extraction_params()):
+        return False
+    return video_signature(video_path) == {"mtime": entry["mtime"], "size": entry["size"]}
+
+def _process_video(video_file, known_hash=None, fmt=OUTPUT_FORMAT, **options):
+    """Extracts and saves one video's keypoints; returns its manifest entry (or None if skipped)."""
+    video_path = os.path.join(VIDEO_DIR, video_file)
+    gesture_name = os.path.splitext(video_file)[0]
+    output_path = keypoint_path(gesture_name, fmt)
+    entry = {"video": video_file, **video_signature(video_path), "sha1": file_digest(video_path),
+             "params": extraction_params(fmt, **options)}
+
+    # Touched but unchanged content (same settings): keep the existing keypoints
+    if known_hash == entry["sha1"] and os.path.exists(output_path):
+        return entry
+
+    groups = options.get("groups", KEYPOINT_GROUPS)
+    # A fresh Holistic per video: its tracking state must not carry over from the previous clip
+    extracted = extract_keypoints(video_path, **options)
+    if extracted is None or not len(extracted[0]):
+        logging.warning(f"Skipped: {video_file}")
+        return None
+
+    save_output(output_path, *extracted, groups=groups, fmt=fmt)
+    logging.info(f"Saved keypoints: {output_path}")
+    return entry
+
+def process_all_videos(workers=1, force=False, fmt=OUTPUT_FORMAT, **options):
+    """
+    Processes all videos and extracts keypoints as JSON (or .npz, see keypoint_store.py).
+
+    Videos whose keypoints are current according to the manifest are skipped,
+    and each finished clip is appended to the manifest straight away, so an
+    interrupted run resumes where it stopped. With `workers` > 1 the clips are
+    spread over a process pool, with a new Holistic instance per video. `options`
+    (groups, target_fps, max_height) are passed on to extract_keypoints.
+    """
+    manifest = {} if force else load_manifest()
+    params = extraction_params(fmt, **options)
+    pending = []
+    videos = [f for f in sorted(os.listdir(VIDEO_DIR)) if f.endswith(".mp4")]
+    for video_file in videos:
+        output_path = keypoint_path(os.path.splitext(video_file)[0], fmt)
+        entry = manifest.get(video_file)
+        if not is_current(entry, os.path.join(VIDEO_DIR, video_file), output_path, params):
+            same_params = entry is not None and entry.get("params") == params
+            pending.append((video_file, entry["sha1"] if same_params else None))
+
+    logging.info(f"{len(pending)} videos to process, {len(videos) - len(pending)} already current")
+
+    os.makedirs(os.path.dirname(MANIFEST_PATH) or ".", exist_ok=True)
+    save_manifest(manifest)
+    failed = 0
+    with open(MANIFEST_PATH, "a") as journal, tqdm(total=len(pending), desc="Processing Videos") as progress:
+        def record(video_file, future):
+            nonlocal failed
+            try:
+                entry = future.result()
+            except Exception as e:
+                logging.error(f"Failed: {video_file}: {e}")
+                entry = None
+            if entry is None:
+                failed += 1
             else:
-                logging.warning(f"Skipped: {video_file}")
+                manifest[video_file] = entry
+                journal.write(json.dumps(entry) + "\n")
+                journal.flush()
+            progress.update(1)
+            progress.set_postfix(failed=failed)
+
+        if workers <= 1:
+            for video_file, known_hash in pending:
+                future = Future()
+                try:
+                    future.set_result(_process_video(video_file, known_hash, fmt, **options))
+                except Exception as e:
+                    future.set_exception(e)
+                record(video_file, future)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(_process_video, f, h, fmt, **options): f for f, h in pending}
+                for future in as_completed(futures):
+                    record(futures[future], future)
 
+    # Compact the journal to one line per video
+    save_manifest(manifest)
     logging.info("Keypoint extraction completed!")
 
 if __name__ == "__main__":
-    process_all_videos()
+    parser = argparse.ArgumentParser(description="Extract MediaPipe keypoints from every video in VIDEO_DIR.")
+    parser.add_argument("--workers", type=int, default=1, help="number of extraction processes")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and re-extract everything")
+    parser.add_argument("--format", choices=["json", "npz"], default=OUTPUT_FORMAT, help="keypoint file format")
+    parser.add_argument("--groups", default=",".join(KEYPOINT_GROUPS),
+                        help="comma-separated landmark groups to keep (pose,left_hand,right_hand,face)")
+    parser.add_argument("--target-fps", type=float, default=TARGET_FPS,
+                        help="sample frames at this rate instead of every FRAME_SKIP-th frame")
+    parser.add_argument("--max-height", type=int, default=MAX_HEIGHT,
+                        help="downscale taller frames to this height before inference")
+    args = parser.parse_args()
+    groups = tuple(g.strip() for g in args.groups.split(",") if g.strip())
+    unknown = [g for g in groups if g not in LANDMARK_GROUPS]
+    if unknown:
+        parser.error(f"unknown landmark groups: {', '.join(unknown)}")
+    process_all_videos(workers=args.workers, force=args.force, fmt=args.format, groups=groups,
+                       target_fps=args.target_fps, max_height=args.max_height)
@@ -0,0 +1,33 @@
+import os
+import json
+import subprocess
+from functools import lru_cache
+
+# Stream parameters reported by `probe`: enough to tell whether two files can be
+# stream-copied into one, and to size decoded frames
+PROBE_FIELDS = "codec_type,codec_name,profile,width,height,pix_fmt,sample_rate,channels,time_base,r_frame_rate"
+
+
+def probe(path):
+    """Codec parameters of every stream in `path`, as a hashable tuple (memoized per file version)."""
+    st = os.stat(path)
+    return _probe(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=4096)
+def _probe(path, mtime_ns, size):
+    out = subprocess.run(
+        ["ffprobe", "-v", "error", "-show_entries", f"stream={PROBE_FIELDS}", "-of", "json", path],
+        check=True, capture_output=True, text=True,
+    ).stdout
+    streams = json.loads(out).get("streams", [])
+    return tuple(tuple(sorted(s.items())) for s in streams)
+
+
+def video_stream(params):
+    """Fields of the first video stream in `probe` output."""
+    for stream in params:
+        fields = dict(stream)
+        if fields.get("codec_type") == "video":
+            return fields
+    raise ValueError("no video stream")
@@ -0,0 +1,217 @@
+import os
+import json
+import tempfile
+import threading
+import numpy as np
+
+from ann_index import FlatIndex, build_ann_index, ANN_BACKEND
+
+# Where the precomputed gloss embeddings live
+INDEX_DIR    = "data/index"
+MATRIX_FILE  = "gloss_embeddings.npy"
+NAMES_FILE   = "gloss_names.json"
+
+
+def gloss_text(name):
+    """Readable text for a gloss name (underscores become spaces)."""
+    return name.replace("_", " ")
+
+
+class GlossIndex:
+    """
+    Embedding index over the gloss vocabulary.
+
+    Every gloss name is encoded once and stored as a float32 matrix (one
+    L2-normalised row per gloss) next to a JSON file of names. The matrix
+    is memory-mapped on load, so scoring a query against any set of glosses
+    is a single dot product instead of one encoder call per candidate.
+
+    `nearest` searches the whole vocabulary through a nearest-neighbour
+    index (see ann_index.py) that is rebuilt lazily whenever the rows change.
+    The rebuild runs outside the lock; until it is done, searches fall back
+    to exact search over the current rows.
+
+    `encode` is any callable taking a list of strings and returning an
+    (n, dim) array of normalised embeddings. `encoder` identifies what
+    produced them (see encoders.encoder_id); it is saved with the names,
+    and a saved index from a different encoder is ignored so that it gets
+    rebuilt.
+    """
+
+    def __init__(self, encode, index_dir=INDEX_DIR, ann_backend=ANN_BACKEND, encoder=None):
+        self.encode      = encode
+        self.encoder     = encoder
+        self.index_dir   = index_dir
+        self.matrix_path = os.path.join(index_dir, MATRIX_FILE)
+        self.names_path  = os.path.join(index_dir, NAMES_FILE)
+        self.names  = []
+        self.rows   = {}
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        self.ann_backend = ann_backend
+        self._ann   = None
+        self._building = False
+        self._lock  = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.rows
+
+    def load(self):
+        """
+        Load a previously saved index. Returns False if none exists, or if it
+        is broken or stale (saved for another encoder).
+        """
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.names_path)):
+            return False
+        with open(self.names_path) as f:
+            saved = json.load(f)
+        # Indexes saved before the encoder was recorded hold a bare list of names
+        if not isinstance(saved, dict) or saved.get("encoder") != self.encoder:
+            return False
+        names = saved["names"]
+        matrix = np.load(self.matrix_path, mmap_mode="r")
+        if matrix.ndim != 2 or matrix.shape[0] != len(names):
+            return False
+        self._set(names, matrix)
+        return True
+
+    def attach(self, names, matrix):
+        """Use an index built elsewhere (the model server's shared matrix) without saving it."""
+        with self._lock:
+            self._set(names, matrix)
+
+    def save(self):
+        """Write the matrix and name list atomically, then re-open the matrix memory-mapped."""
+        os.makedirs(self.index_dir, exist_ok=True)
+        # Unique temporary names, so processes saving into the same directory never collide
+        tmp_matrix = self._temp_file(self.matrix_path)
+        tmp_names  = self._temp_file(self.names_path)
+        try:
+            with open(tmp_matrix, "wb") as f:
+                np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32))
+            with open(tmp_names, "w") as f:
+                json.dump({"encoder": self.encoder, "names": self.names}, f)
+            os.replace(tmp_matrix, self.matrix_path)
+            os.replace(tmp_names, self.names_path)
+        finally:
+            for path in (tmp_matrix, tmp_names):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.matrix = np.load(self.matrix_path, mmap_mode="r")
+
+    def _temp_file(self, path):
+        fd, tmp_path = tempfile.mkstemp(dir=self.index_dir, prefix=os.path.basename(path) + ".", suffix=".tmp")
+        os.close(fd)
+        return tmp_path
+
+    def sync(self, glosses, save=True):
+        """
+        Bring the index in line with the given gloss names.
+
+        Only glosses that are not indexed yet are encoded; rows for removed
+        glosses are dropped. Returns True if the index changed (and was saved,
+        unless `save` is False).
+        """
+        with self._lock:
+            return self._sync(sorted(set(glosses)), save)
+
+    def _sync(self, wanted, save):
+        if wanted == self.names:
+            return False
+
+        new = [g for g in wanted if g not in self.rows]
+        new_vectors = self._encode(new)
+        dim = self.matrix.shape[1] if len(self.names) else new_vectors.shape[1]
+
+        matrix = np.empty((len(wanted), dim), dtype=np.float32)
+        new_rows = {g: i for i, g in enumerate(new)}
+        for i, g in enumerate(wanted):
+            if g in new_rows:
+                matrix[i] = new_vectors[new_rows[g]]
+            else:
+                matrix[i] = self.matrix[self.rows[g]]
+
+        self._set(wanted, matrix)
+        if save:
+            self.save()
+        return True
+
+    def missing(self, glosses):
+        """The given glosses that are not in the index (in order, without duplicates)."""
+        rows = self.rows
+        return [g for g in dict.fromkeys(glosses) if g not in rows]
+
+    def vectors(self, glosses, encoded=None):
+        """
+        Embeddings for the given glosses. Names missing from the index are taken
+        from `encoded` (gloss -> vector) if given, otherwise encoded on the fly.
+        """
+        with self._lock:
+            rows, matrix = self.rows, self.matrix
+        extra = dict(encoded or {})
+        missing = [g for g in dict.fromkeys(glosses) if g not in rows and g not in extra]
+        extra.update(zip(missing, self._encode(missing)))
+        if not extra:
+            return np.asarray(matrix[[rows[g] for g in glosses]])
+        return np.stack([extra[g] if g in extra else matrix[rows[g]] for g in glosses])
+
+    def scores(self, query_embedding, glosses):
+        """Cosine similarity of one normalised query embedding against each gloss."""
+        if not glosses:
+            return np.zeros(0, dtype=np.float32)
+        return self.vectors(glosses) @ np.asarray(query_embedding, dtype=np.float32)
+
+    def ann(self):
+        """
+        (names, index) for the current rows, or None if the index is empty.
+        The first caller after a change builds the nearest-neighbour index
+        from a snapshot of the rows; callers arriving meanwhile get a flat
+        index over the rows instead of waiting.
+        """
+        with self._lock:
+            if self._ann is not None or not self.names:
+                return self._ann
+            names, matrix = self.names, self.matrix
+            building, self._building = self._building, True
+        if building:
+            return names, FlatIndex(matrix)
+        try:
+            index = build_ann_index(matrix, self.ann_backend)
+        except BaseException:
+            with self._lock:
+                self._building = False
+            raise
+        with self._lock:
+            self._building = False
+            # Only install it if the rows did not change while it was built
+            if self.names is names:
+                self._ann = (names, index)
+        return names, index
+
+    def nearest(self, query_embeddings, k=5, threshold=0.0):
+        """
+        For each normalised query embedding, up to `k` (gloss, score) pairs
+        from the whole index with score >= `threshold`, best first.
+        """
+        ann = self.ann()
+        if ann is None or k <= 0:
+            return [[] for _ in query_embeddings]
+        names, index = ann
+        results = []
+        for rows, scores in index.search(np.asarray(query_embeddings, dtype=np.float32), k):
+            results.append([(names[r], float(s)) for r, s in zip(rows, scores) if r >= 0 and s >= threshold])
+        return results
+
+    def _encode(self, names):
+        if not names:
+            return np.zeros((0, self.matrix.shape[1]), dtype=np.float32)
+        vectors = self.encode([gloss_text(n) for n in names])
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _set(self, names, matrix):
+        self.names  = list(names)
+        self.rows   = {n: i for i, n in enumerate(self.names)}
+        self.matrix = matrix
+        self._ann   = None
@@ -1,61 +1,107 @@
+import sys
+import json
 import matplotlib.pyplot as plt
 import numpy as np
 
-# Evaluation metrics
-metrics = {
-    "precision": 0.444,
-    "recall": 0.667,
-    "f1_score": 0.533,
-    "input_handling_accuracy": 1.0,
-    "avg_similarity_correct": 0.938,
-    "avg_similarity_incorrect": 0.479,
-    "video_retrieval_rate": 0.222,
-    "avg_response_time_seconds": 0.109,
-    "memory_usage_mb": 376.2
-}
+# Metrics written by eval.py (default) or loadtest.py; each plot is drawn when its metrics are present
+METRICS_FILE = sys.argv[1] if len(sys.argv) > 1 else "evaluation_metrics.json"
+with open(METRICS_FILE) as f:
+    metrics = json.load(f)
+saved = []
+
+def has(*keys):
+    return all(k in metrics for k in keys)
+
+# Load-test efficiency numbers get their own file, so they never replace eval.py's
+EFFICIENCY_PNG = "load_efficiency_metrics.png" if has("p50_response_time_seconds") else "efficiency_metrics.png"
 
 # Plot 1: Accuracy Metrics
-fig, ax = plt.subplots(figsize=(8, 4))
-labels = ["Precision", "Recall", "F1-Score", "Input Handling"]
-values = [metrics["precision"], metrics["recall"], metrics["f1_score"], metrics["input_handling_accuracy"]]
-colors = ["#4e79a7", "#f28e2b", "#e15759", "#76b7b2"]
-ax.bar(labels, values, color=colors)
-ax.set_ylim(0, 1)
-ax.set_ylabel("Score")
-ax.set_title("Accuracy Metrics for Voice2Sign System")
-for i, v in enumerate(values):
-    ax.text(i, v + 0.02, f"{v:.3f}", ha="center")
-plt.tight_layout()
-plt.savefig("accuracy_metrics.png", dpi=300)
-plt.close()
+if has("precision", "recall", "f1_score", "input_handling_accuracy"):
+    fig, ax = plt.subplots(figsize=(8, 4))
+    labels = ["Precision", "Recall", "F1-Score", "Input Handling"]
+    values = [metrics["precision"], metrics["recall"], metrics["f1_score"], metrics["input_handling_accuracy"]]
+    colors = ["#4e79a7", "#f28e2b", "#e15759", "#76b7b2"]
+    ax.bar(labels, values, color=colors)
+    ax.set_ylim(0, 1)
+    ax.set_ylabel("Score")
+    ax.set_title("Accuracy Metrics for Voice2Sign System")
+    for i, v in enumerate(values):
+        ax.text(i, v + 0.02, f"{v:.3f}", ha="center")
+    plt.tight_layout()
+    plt.savefig("accuracy_metrics.png", dpi=300)
+    plt.close()
+    saved.append("accuracy_metrics.png")
 
 # Plot 2: Cosine Similarity Scores
-fig, ax = plt.subplots(figsize=(6, 4))
-labels = ["Correct Matches", "Incorrect Matches"]
-values = [metrics["avg_similarity_correct"], metrics["avg_similarity_incorrect"]]
-colors = ["#59a14f", "#edc949"]
-ax.bar(labels, values, color=colors)
-ax.set_ylim(0, 1)
-ax.set_ylabel("Cosine Similarity Score")
-ax.set_title("Cosine Similarity Scores for Voice2Sign System")
-for i, v in enumerate(values):
-    ax.text(i, v + 0.02, f"{v:.3f}", ha="center")
-plt.tight_layout()
-plt.savefig("similarity_scores.png", dpi=300)
-plt.close()
+if has("avg_similarity_correct", "avg_similarity_incorrect"):
+    fig, ax = plt.subplots(figsize=(6, 4))
+    labels = ["Correct Matches", "Incorrect Matches"]
+    values = [metrics["avg_similarity_correct"], metrics["avg_similarity_incorrect"]]
+    colors = ["#59a14f", "#edc949"]
+    ax.bar(labels, values, color=colors)
+    ax.set_ylim(0, 1)
+    ax.set_ylabel("Cosine Similarity Score")
+    ax.set_title("Cosine Similarity Scores for Voice2Sign System")
+    for i, v in enumerate(values):
+        ax.text(i, v + 0.02, f"{v:.3f}", ha="center")
+    plt.tight_layout()
+    plt.savefig("similarity_scores.png", dpi=300)
+    plt.close()
+    saved.append("similarity_scores.png")
 
 # Plot 3: System Efficiency Metrics
-fig, ax = plt.subplots(figsize=(8, 4))
-labels = ["Video Retrieval Rate", "Response Time (s)", "Memory Usage (MB)"]
-values = [metrics["video_retrieval_rate"], metrics["avg_response_time_seconds"], metrics["memory_usage_mb"]]
-colors = ["#bc5090", "#ff6361", "#003f5c"]
-ax.bar(labels, values, color=colors)
-ax.set_ylabel("Value")
-ax.set_title("System Efficiency Metrics for Voice2Sign System")
-for i, v in enumerate(values):
-    ax.text(i, v + max(values)*0.02, f"{v:.3f}", ha="center")
-plt.tight_layout()
-plt.savefig("efficiency_metrics.png", dpi=300)
-plt.close()
-
-print("Graphs saved as: accuracy_metrics.png, similarity_scores.png, efficiency_metrics.png")
\ No newline at end of file
+efficiency = [("Video Retrieval Rate", "video_retrieval_rate"), ("Response Time (s)", "avg_response_time_seconds"),
+              ("Memory Usage (MB)", "memory_usage_mb")]
+efficiency = [(label, key) for label, key in efficiency if has(key)]
+if efficiency:
+    fig, ax = plt.subplots(figsize=(8, 4))
+    labels = [label for label, _ in efficiency]
+    values = [metrics[key] for _, key in efficiency]
+    colors = ["#bc5090", "#ff6361", "#003f5c"][-len(values):]
+    ax.bar(labels, values, color=colors)
+    ax.set_ylabel("Value")
+    ax.set_title("System Efficiency Metrics for Voice2Sign System")
+    for i, v in enumerate(values):
+        ax.text(i, v + max(values)*0.02, f"{v:.3f}", ha="center")
+    plt.tight_layout()
+    plt.savefig(EFFICIENCY_PNG, dpi=300)
+    plt.close()
+    saved.append(EFFICIENCY_PNG)
+
+# Plot 4: Latency Percentiles under load (loadtest.py)
+if has("p50_response_time_seconds", "p95_response_time_seconds", "p99_response_time_seconds"):
+    fig, ax = plt.subplots(figsize=(6, 4))
+    labels = ["p50", "p95", "p99"]
+    values = [metrics[f"{p}_response_time_seconds"] * 1000 for p in labels]
+    colors = ["#4e79a7", "#f28e2b", "#e15759"]
+    ax.bar(labels, values, color=colors)
+    ax.set_ylabel("Latency (ms)")
+    ax.set_title(f"Latency at {metrics.get('throughput_rps', 0)} req/s "
+                 f"(error rate {metrics.get('error_rate', 0):.2%})")
+    for i, v in enumerate(values):
+        ax.text(i, v + max(values)*0.02, f"{v:.1f}", ha="center")
+    plt.tight_layout()
+    plt.savefig("latency_metrics.png", dpi=300)
+    plt.close()
+    saved.append("latency_metrics.png")
+
+# Plot 5: Throughput, tail latency and server memory over time (loadtest.py)
+if metrics.get("timeline"):
+    timeline = metrics["timeline"]
+    t = np.array([w["t"] for w in timeline])
+    fig, axes = plt.subplots(3, 1, figsize=(8, 7), sharex=True)
+    axes[0].plot(t, [w["requests"] for w in timeline], color="#4e79a7")
+    axes[0].set_ylabel("Requests / window")
+    axes[1].plot(t, [w["p95_response_time_seconds"] * 1000 for w in timeline], color="#e15759")
+    axes[1].set_ylabel("p95 latency (ms)")
+    rss = [w["rss_mb"] for w in timeline]
+    axes[2].plot(t, [np.nan if r is None else r for r in rss], color="#003f5c")
+    axes[2].set_ylabel("Server RSS (MB)")
+    axes[2].set_xlabel("Time (s)")
+    axes[0].set_title("Load Test Timeline for Voice2Sign System")
+    plt.tight_layout()
+    plt.savefig("load_timeline.png", dpi=300)
+    plt.close()
+    saved.append("load_timeline.png")
+
+print("Graphs saved as: " + ", ".join(saved))
@@ -0,0 +1,283 @@
+"""
+Binary keypoint storage.
+
+A gloss is stored as a float32 array of shape (frames, landmarks, 3) holding
+x/y/z for the selected landmark groups (all 543 Holistic landmarks by default)
+and a bool presence mask of shape (frames, groups); coordinates of a missing
+group are zero. Single glosses are saved as `<gloss>.npz`; the whole vocabulary
+can be packed into one archive directory whose arrays are memory-mapped:
+
+    index.json              {"version": "pack-...", "groups": [...],
+                             "glosses": {gloss: [start, end]},
+                             "sources": {gloss: [file name, mtime_ns, size]}}
+    pack-.../keypoints.npy  float32 (total_frames, landmarks, 3)
+    pack-.../mask.npy       bool    (total_frames, groups)
+
+Every pack writes its arrays into a new version directory; replacing
+index.json is what publishes it, so a reader always gets arrays and index
+from the same pack.
+
+`read_keypoints` serves a gloss from the archive while its source file is
+unchanged since packing and falls back to the file otherwise.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import numpy as np
+
+# Landmark groups in storage order, with MediaPipe Holistic's landmark counts
+LANDMARK_GROUPS = {
+    "pose":       33,
+    "left_hand":  21,
+    "right_hand": 21,
+    "face":       468,
+}
+GROUP_NAMES   = tuple(LANDMARK_GROUPS)
+NUM_LANDMARKS = sum(LANDMARK_GROUPS.values())   # 543
+
+KEYPOINT_DIR = "data/key"
+ARCHIVE_DIR  = "data/keypoint_archive"
+
+
+def group_slices(groups=GROUP_NAMES):
+    """Landmark slice of each group inside an array stored with `groups`."""
+    slices, offset = {}, 0
+    for name in groups:
+        count = LANDMARK_GROUPS[name]
+        slices[name] = slice(offset, offset + count)
+        offset += count
+    return slices
+
+
+def num_landmarks(groups=GROUP_NAMES):
+    return sum(LANDMARK_GROUPS[name] for name in groups)
+
+
+def frames_to_array(frames, groups=GROUP_NAMES):
+    """Convert the JSON frame dicts written by extractkeypoints.py into (keypoints, mask)."""
+    slices = group_slices(groups)
+    keypoints = np.zeros((len(frames), num_landmarks(groups), 3), dtype=np.float32)
+    mask = np.zeros((len(frames), len(groups)), dtype=bool)
+    for i, frame in enumerate(frames):
+        for g, name in enumerate(groups):
+            points = frame.get(name)
+            if points:
+                keypoints[i, slices[name]] = points
+                mask[i, g] = True
+    return keypoints, mask
+
+
+def array_to_frames(keypoints, mask, groups=GROUP_NAMES):
+    """Inverse of `frames_to_array`: one dict of landmark lists per frame (missing groups are [])."""
+    slices = group_slices(groups)
+    frames = []
+    for i in range(len(keypoints)):
+        frames.append({
+            name: keypoints[i, slices[name]].tolist() if mask[i, g] else []
+            for g, name in enumerate(groups)
+        })
+    return frames
+
+
+def select_groups(keypoints, mask, groups, wanted):
+    """Re-layout an array stored with `groups` to `wanted`; groups it lacks come back masked out."""
+    if tuple(groups) == tuple(wanted):
+        return keypoints, mask
+    src = group_slices(groups)
+    dst = group_slices(wanted)
+    out = np.zeros((len(keypoints), num_landmarks(wanted), 3), dtype=np.float32)
+    out_mask = np.zeros((len(keypoints), len(wanted)), dtype=bool)
+    for g, name in enumerate(wanted):
+        if name in src:
+            out[:, dst[name]] = keypoints[:, src[name]]
+            out_mask[:, g] = mask[:, list(groups).index(name)]
+    return out, out_mask
+
+
+def save_keypoints(path, keypoints, mask, groups=GROUP_NAMES):
+    """Write one gloss as an uncompressed .npz (atomically)."""
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, keypoints=np.asarray(keypoints, dtype=np.float32),
+                 mask=np.asarray(mask, dtype=bool), groups=np.array(groups))
+    os.replace(tmp, path)
+
+
+def load_keypoints(path):
+    """Load one gloss from .npz or legacy .json. Returns (keypoints, mask, groups)."""
+    if path.endswith(".json"):
+        with open(path) as f:
+            frames = json.load(f)
+        return (*frames_to_array(frames), GROUP_NAMES)
+    with np.load(path) as data:
+        return data["keypoints"], data["mask"], tuple(data["groups"].tolist())
+
+
+class KeypointArchive:
+    """Memory-mapped keypoints for the whole vocabulary (see module notes for the layout)."""
+
+    def __init__(self, archive_dir=ARCHIVE_DIR):
+        with open(os.path.join(archive_dir, "index.json")) as f:
+            index = json.load(f)
+        # Archives packed before versioning keep their arrays next to index.json
+        self.version   = index.get("version")
+        data_dir       = os.path.join(archive_dir, self.version) if self.version else archive_dir
+        self.groups    = tuple(index["groups"])
+        self.spans     = {gloss: tuple(span) for gloss, span in index["glosses"].items()}
+        self.sources   = {gloss: tuple(sig) for gloss, sig in index.get("sources", {}).items()}
+        self.keypoints = np.load(os.path.join(data_dir, "keypoints.npy"), mmap_mode="r")
+        self.mask      = np.load(os.path.join(data_dir, "mask.npy"), mmap_mode="r")
+
+    def __contains__(self, gloss):
+        return gloss in self.spans
+
+    def __len__(self):
+        return len(self.spans)
+
+    @property
+    def glosses(self):
+        return list(self.spans)
+
+    def get(self, gloss):
+        """Zero-copy (keypoints, mask) views for one gloss."""
+        start, end = self.spans[gloss]
+        return self.keypoints[start:end], self.mask[start:end]
+
+    def is_current(self, gloss, path):
+        """True if `gloss` was packed from the file now at `path` (same size and mtime)."""
+        return gloss in self.spans and self.sources.get(gloss) == source_signature(path)
+
+
+def source_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.basename(path), st.st_mtime_ns, st.st_size)
+
+
+def open_archive(archive_dir=ARCHIVE_DIR):
+    """The packed archive in `archive_dir`, or None if there is none."""
+    if not os.path.exists(os.path.join(archive_dir, "index.json")):
+        return None
+    return KeypointArchive(archive_dir)
+
+
+def read_keypoints(gloss, path, archive=None):
+    """
+    (keypoints, mask, groups) for one gloss: memory-mapped views from the
+    archive when it holds the current version of `path`, otherwise loaded
+    from the file.
+    """
+    if archive is not None and archive.is_current(gloss, path):
+        return (*archive.get(gloss), archive.groups)
+    return load_keypoints(path)
+
+
+def frame_count(path):
+    """Number of frames in a keypoint file, reading as little of it as possible."""
+    if path.endswith(".json"):
+        with open(path) as f:
+            return len(json.load(f))
+    with np.load(path) as data:
+        return len(data["mask"])
+
+
+def pack_archive(sources, archive_dir=ARCHIVE_DIR, groups=GROUP_NAMES):
+    """
+    Pack {gloss: keypoint file} into one archive directory.
+
+    Frame counts are read first so the arrays can be preallocated on disk;
+    each gloss is then loaded and written straight into them, so only one
+    gloss is held in memory at a time. The arrays go into a new version
+    directory and index.json is swapped in last, so readers of the old archive
+    are not disturbed. The previous version is kept for readers that have just
+    read the old index; older ones are removed.
+    """
+    glosses = sorted(sources)
+    spans, total = {}, 0
+    for gloss in glosses:
+        count = frame_count(sources[gloss])
+        spans[gloss] = [total, total + count]
+        total += count
+
+    os.makedirs(archive_dir, exist_ok=True)
+    index_path = os.path.join(archive_dir, "index.json")
+    previous = archive_version(archive_dir)
+    data_dir = tempfile.mkdtemp(prefix="pack-", dir=archive_dir)
+    version = os.path.basename(data_dir)
+    out = np.lib.format.open_memmap(os.path.join(data_dir, "keypoints.npy"), mode="w+",
+                                    dtype=np.float32, shape=(total, num_landmarks(groups), 3))
+    out_mask = np.lib.format.open_memmap(os.path.join(data_dir, "mask.npy"), mode="w+",
+                                         dtype=bool, shape=(total, len(groups)))
+    signatures = {}
+    for gloss in glosses:
+        keypoints, mask, stored = load_keypoints(sources[gloss])
+        keypoints, mask = select_groups(keypoints, mask, stored, groups)
+        start, end = spans[gloss]
+        out[start:end] = keypoints
+        out_mask[start:end] = mask
+        signatures[gloss] = source_signature(sources[gloss])
+    out.flush()
+    out_mask.flush()
+    del out, out_mask
+    with open(index_path + ".tmp", "w") as f:
+        json.dump({"version": version, "groups": list(groups), "glosses": spans, "sources": signatures}, f)
+    os.replace(index_path + ".tmp", index_path)
+
+    # Drop versions no reader can reach any more (including unversioned arrays and unfinished packs)
+    for name in os.listdir(archive_dir):
+        path = os.path.join(archive_dir, name)
+        if name.startswith("pack-") and name not in (version, previous):
+            shutil.rmtree(path, ignore_errors=True)
+        elif name in ("keypoints.npy", "mask.npy") and previous is not None:
+            os.remove(path)
+    return total
+
+
+def archive_version(archive_dir=ARCHIVE_DIR):
+    """Version directory the archive's index.json currently points to (None if unversioned or missing)."""
+    try:
+        with open(os.path.join(archive_dir, "index.json")) as f:
+            return json.load(f).get("version")
+    except (OSError, ValueError):
+        return None
+
+
+def convert_json_dir(keypoint_dir=KEYPOINT_DIR, remove_json=False):
+    """Write a .npz next to every legacy .json keypoint file. Returns the number converted."""
+    converted = 0
+    for fname in sorted(os.listdir(keypoint_dir)):
+        if not fname.endswith(".json"):
+            continue
+        json_path = os.path.join(keypoint_dir, fname)
+        keypoints, mask, groups = load_keypoints(json_path)
+        save_keypoints(json_path[:-5] + ".npz", keypoints, mask, groups)
+        if remove_json:
+            os.remove(json_path)
+        converted += 1
+    return converted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert keypoints to the binary format and pack the archive.")
+    parser.add_argument("command", choices=["convert", "pack"])
+    parser.add_argument("--keypoint-dir", default=KEYPOINT_DIR)
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR)
+    parser.add_argument("--remove-json", action="store_true", help="delete the .json files after converting")
+    args = parser.parse_args()
+
+    if args.command == "convert":
+        count = convert_json_dir(args.keypoint_dir, remove_json=args.remove_json)
+        print(f"Converted {count} keypoint files in {args.keypoint_dir}")
+    else:
+        from vocabulary import scan_dir, KEYPOINT_EXTENSIONS
+        files = scan_dir(args.keypoint_dir, KEYPOINT_EXTENSIONS)
+        sources = {gloss: os.path.join(args.keypoint_dir, fname) for gloss, fname in files.items()}
+        if not sources:
+            sys.exit(f"No keypoint files in {args.keypoint_dir}")
+        frames = pack_archive(sources, args.archive_dir)
+        print(f"Packed {len(sources)} glosses ({frames} frames) into {args.archive_dir}")
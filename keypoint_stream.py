@@ -0,0 +1,131 @@
+"""
+Compact wire format for streaming gloss keypoints to the browser.
+
+Coordinates are quantized to int16 (value * SCALE, so normalised image
+coordinates keep ~1/8000 resolution) and each frame is sent as the
+difference from the previous one, computed with 16-bit wraparound so
+decoding is exact. Consecutive frames differ little, so the deltas are
+small and compress well (responses are gzip-encoded on top).
+
+All integers are little-endian. A stream is a header followed by one
+record per gloss:
+
+    header  "V2SK" | u8 version | u8 n_groups | u16 n_landmarks | f32 scale | u16 n_glosses
+            | u8 group id * n_groups            (index into keypoint_store.GROUP_NAMES)
+            | padding to an even offset
+            | u16 landmark index * n_landmarks  (into the selected groups' layout)
+    record  u8 name_len | name (utf-8) | u32 n_frames
+            | u8 mask * n_frames                (bit g set: group g present in the frame)
+            | padding to an even offset
+            | i16 delta * (n_frames * n_landmarks * 3)
+
+static/js/keypoints.js decodes this format in the browser.
+"""
+import os
+import struct
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from keypoint_store import GROUP_NAMES, num_landmarks, read_keypoints, select_groups
+
+MAGIC   = b"V2SK"
+VERSION = 1
+SCALE   = 8192.0   # int16 covers coordinates in [-4, 4)
+RECORD_CACHE_SIZE = 512   # encoded gloss records kept in memory
+# Hands and pose are enough for most avatars; the 468 face points are opt-in
+STREAM_GROUPS = ("pose", "left_hand", "right_hand")
+
+_HEADER = struct.Struct("<4sBBHfH")
+
+
+def quantize(keypoints, scale=SCALE):
+    return np.clip(np.rint(np.asarray(keypoints, dtype=np.float32) * scale), -32768, 32767).astype(np.int16)
+
+
+def delta_encode(quantized):
+    """Frame-to-frame differences with int16 wraparound (the first frame is kept as is)."""
+    q = quantized.view(np.uint16)
+    deltas = q.copy()
+    deltas[1:] -= q[:-1]
+    return deltas.view(np.int16)
+
+
+def delta_decode(deltas):
+    return np.cumsum(deltas.view(np.uint16), axis=0, dtype=np.uint16).view(np.int16)
+
+
+def encode_header(n_glosses, groups=STREAM_GROUPS, landmarks=None, scale=SCALE):
+    landmarks = np.arange(num_landmarks(groups)) if landmarks is None else np.asarray(landmarks)
+    return (_HEADER.pack(MAGIC, VERSION, len(groups), len(landmarks), scale, n_glosses)
+            + bytes(GROUP_NAMES.index(g) for g in groups) + b"\0" * (len(groups) % 2)
+            + landmarks.astype("<u2").tobytes())
+
+
+def encode_gloss(name, keypoints, mask, groups=STREAM_GROUPS, landmarks=None, scale=SCALE):
+    """One gloss record. `keypoints`/`mask` must already use the `groups` layout."""
+    if landmarks is not None:
+        keypoints = keypoints[:, landmarks]
+    name = name.encode("utf-8")
+    bits = (np.asarray(mask, dtype=np.uint8) << np.arange(len(groups), dtype=np.uint8)).sum(axis=1, dtype=np.uint8)
+    head = struct.pack("<B", len(name)) + name + struct.pack("<I", len(keypoints)) + bits.tobytes()
+    padding = b"\0" * (len(head) % 2)
+    return head + padding + delta_encode(quantize(keypoints, scale)).astype("<i2").tobytes()
+
+
+# Encoded records in LRU order. Keyed on the archive's version rather than the
+# archive itself, so a re-packed archive's old memory maps are not kept alive.
+_records      = OrderedDict()
+_records_lock = threading.Lock()
+
+
+def gloss_record(name, path, groups=STREAM_GROUPS, landmarks=None, archive=None):
+    """
+    Encoded record for the keypoint file at `path`, memoized per file version.
+    With a KeypointArchive that holds the current version, the keypoints are
+    read from its memory map instead of loading the file.
+    """
+    groups = tuple(groups)
+    landmarks = None if landmarks is None else tuple(landmarks)
+    key = (name, path, os.stat(path).st_mtime_ns, groups, landmarks,
+           None if archive is None else archive.version)
+    with _records_lock:
+        record = _records.get(key)
+        if record is not None:
+            _records.move_to_end(key)
+            return record
+    keypoints, mask, stored = read_keypoints(name, path, archive)
+    keypoints, mask = select_groups(keypoints, mask, stored, groups)
+    record = encode_gloss(name, keypoints, mask, groups, None if landmarks is None else list(landmarks))
+    with _records_lock:
+        _records[key] = record
+        while len(_records) > RECORD_CACHE_SIZE:
+            _records.popitem(last=False)
+    return record
+
+
+def decode_stream(data):
+    """Inverse of the encoder: (groups, landmarks, [(name, keypoints, mask), ...])."""
+    magic, version, n_groups, n_landmarks, scale, n_glosses = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("not a V2SK keypoint stream")
+    offset = _HEADER.size
+    groups = tuple(GROUP_NAMES[i] for i in data[offset:offset + n_groups])
+    offset += n_groups + n_groups % 2
+    landmarks = np.frombuffer(data, "<u2", n_landmarks, offset)
+    offset += 2 * n_landmarks
+    glosses = []
+    for _ in range(n_glosses):
+        name_len = data[offset]
+        name = bytes(data[offset + 1:offset + 1 + name_len]).decode("utf-8")
+        offset += 1 + name_len
+        (n_frames,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        bits = np.frombuffer(data, np.uint8, n_frames, offset)
+        offset += n_frames + (offset + n_frames) % 2
+        count = n_frames * n_landmarks * 3
+        deltas = np.frombuffer(data, "<i2", count, offset).reshape(n_frames, n_landmarks, 3)
+        offset += 2 * count
+        mask = (bits[:, None] >> np.arange(n_groups)) & 1
+        glosses.append((name, delta_decode(deltas).astype(np.float32) / scale, mask.astype(bool)))
+    return groups, landmarks, glosses
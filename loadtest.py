@@ -0,0 +1,198 @@
+import sys
+import json
+import time
+import argparse
+import threading
+import http.client
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from gloss_index import gloss_text
+from vocabulary import scan_dir, KEYPOINT_EXTENSIONS
+
+BASE_URL      = "http://127.0.0.1:5001"
+ENDPOINT      = "/find-keypoint"
+KEYPOINT_DIR  = "data/key"
+OUTPUT_FILE   = "loadtest_metrics.json"
+CONCURRENCY   = 8
+ZIPF_EXPONENT = 1.1
+WINDOW_SECONDS = 1.0   # resolution of the timeline
+
+
+def load_query_log(path):
+    """Queries to replay: one per line, either plain text or JSON with an "input" field."""
+    queries = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line).get("input", "")
+            queries.append(line)
+    return queries
+
+
+def zipf_workload(vocabulary, count, exponent=ZIPF_EXPONENT, seed=0):
+    """`count` queries over `vocabulary` with Zipf-distributed popularity (random rank order)."""
+    rng = np.random.default_rng(seed)
+    ranked = rng.permutation(sorted(vocabulary))
+    weights = 1.0 / np.arange(1, len(ranked) + 1) ** exponent
+    picks = rng.choice(len(ranked), size=count, p=weights / weights.sum())
+    return [gloss_text(ranked[i]) for i in picks]
+
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+class RssSampler:
+    """Samples a process's resident set size from a background thread."""
+
+    def __init__(self, pid, interval=WINDOW_SECONDS):
+        import psutil
+        self.process  = psutil.Process(pid)
+        self.interval = interval
+        self.samples  = []   # (seconds since start, MB)
+        self._stop    = threading.Event()
+        self._thread  = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def start(self, started):
+        self.started = started
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            rss = self.process.memory_info().rss / (1024 * 1024)
+            self.samples.append((time.perf_counter() - self.started, rss))
+            if self._stop.wait(self.interval):
+                return
+
+
+def send(url, query, timeout):
+    body = json.dumps({"input": query}).encode()
+    req = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        response.read()
+        return response.status
+
+
+def run_load(queries, url, concurrency=CONCURRENCY, rate=0.0, timeout=30.0, rss_pid=None):
+    """
+    Replay `queries` against `url` from `concurrency` threads.
+
+    With `rate` > 0 requests are scheduled open-loop at that many per second
+    and latency is measured from each request's scheduled start, so a slow
+    server is charged for the queueing it causes. With `rate` = 0 every
+    thread sends its next request as soon as the previous one finishes.
+    Returns one (start offset, latency seconds, ok) tuple per request and
+    the RSS samples.
+    """
+    results = [None] * len(queries)
+    sampler = RssSampler(rss_pid) if rss_pid else None
+    started = time.perf_counter()
+    if sampler:
+        sampler.start(started)
+
+    def one(i):
+        scheduled = started + i / rate if rate > 0 else time.perf_counter()
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            ok = 200 <= send(url, queries[i], timeout) < 400
+        except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError):
+            ok = False
+        results[i] = (scheduled - started, time.perf_counter() - scheduled, ok)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(len(queries))))
+    if sampler:
+        sampler.stop()
+    return results, sampler.samples if sampler else []
+
+
+def summarize(results, rss_samples, elapsed, concurrency, rate, window=WINDOW_SECONDS):
+    """Metrics in the flat shape written by eval.py and read by graph.py, plus a timeline."""
+    latencies = [lat for _, lat, ok in results if ok]
+    errors = sum(1 for *_, ok in results if not ok)
+    metrics = {
+        "requests": len(results),
+        "errors": errors,
+        "error_rate": round(errors / len(results), 4) if results else 0.0,
+        "throughput_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "avg_response_time_seconds": round(float(np.mean(latencies)), 4) if latencies else 0.0,
+        "p50_response_time_seconds": round(percentile(latencies, 50), 4),
+        "p95_response_time_seconds": round(percentile(latencies, 95), 4),
+        "p99_response_time_seconds": round(percentile(latencies, 99), 4),
+        "concurrency": concurrency,
+        "target_rate_rps": rate,
+        "duration_seconds": round(elapsed, 2),
+    }
+    if rss_samples:
+        metrics["memory_usage_mb"] = round(max(mb for _, mb in rss_samples), 2)
+
+    # Per-window throughput, tail latency, errors and server RSS
+    timeline = []
+    for w in range(int(elapsed // window) + 1):
+        lo, hi = w * window, (w + 1) * window
+        in_window = [(lat, ok) for start, lat, ok in results if lo <= start < hi]
+        rss = [mb for t, mb in rss_samples if lo <= t < hi]
+        timeline.append({
+            "t": round(lo, 2),
+            "requests": len(in_window),
+            "errors": sum(1 for _, ok in in_window if not ok),
+            "p95_response_time_seconds": round(percentile([lat for lat, ok in in_window if ok], 95), 4),
+            "rss_mb": round(rss[-1], 2) if rss else None,
+        })
+    metrics["timeline"] = timeline
+    return metrics
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test a running app by replaying queries.")
+    parser.add_argument("--url", default=BASE_URL, help="base URL of the running app")
+    parser.add_argument("--endpoint", default=ENDPOINT, help="JSON endpoint taking {\"input\": ...}")
+    parser.add_argument("--log", help="query log to replay (text lines or JSON lines with \"input\")")
+    parser.add_argument("--requests", type=int, default=1000, help="requests to send (a log is repeated to reach it)")
+    parser.add_argument("--zipf", type=float, default=ZIPF_EXPONENT, help="Zipf exponent of the synthetic workload")
+    parser.add_argument("--keypoint-dir", default=KEYPOINT_DIR, help="vocabulary for the synthetic workload")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=0.0, help="requests per second (0: as fast as possible)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--pid", type=int, help="server process id, to record its RSS over time")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args()
+
+    if args.log:
+        queries = load_query_log(args.log)
+        # Replay the log in order, repeating it to reach --requests
+        queries = [queries[i % len(queries)] for i in range(max(args.requests, len(queries)))] if queries else []
+    else:
+        vocab = scan_dir(args.keypoint_dir, KEYPOINT_EXTENSIONS)
+        if not vocab:
+            sys.exit(f"No glosses in {args.keypoint_dir}; pass --log or --keypoint-dir")
+        queries = zipf_workload(vocab, args.requests, args.zipf, args.seed)
+    if not queries:
+        sys.exit("No queries to send")
+
+    print(f"Sending {len(queries)} requests to {args.url}{args.endpoint} "
+          f"(concurrency {args.concurrency}, rate {args.rate or 'unbounded'})")
+    started = time.perf_counter()
+    results, rss_samples = run_load(queries, args.url.rstrip("/") + args.endpoint, args.concurrency,
+                                    args.rate, args.timeout, args.pid)
+    metrics = summarize(results, rss_samples, time.perf_counter() - started, args.concurrency, args.rate)
+    with open(args.output, "w") as f:
+        json.dump(metrics, f, indent=4)
+
+    for key, value in metrics.items():
+        if key != "timeline":
+            print(f"{key.replace('_', ' ').title()}: {value}")
+    print(f"\nResults written to {args.output} (plot with `python graph.py {args.output}`)")
@@ -0,0 +1,156 @@
+import time
+import random
+import bisect
+import threading
+import contextvars
+from contextlib import nullcontext
+
+# Histogram bucket upper bounds (seconds)
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Per-request sampling decision (None outside a request: decide per span)
+_sampled = contextvars.ContextVar("v2s_metrics_sampled", default=None)
+_NO_SPAN = nullcontext()
+
+
+class Histogram:
+    """Prometheus-style histogram with one label, e.g. stage="encode"."""
+
+    def __init__(self, name, help_text, label, buckets=BUCKETS):
+        self.name    = name
+        self.help    = help_text
+        self.label   = label
+        self.buckets = tuple(buckets)
+        self._series = {}   # label value -> [bucket counts..., +Inf count, sum]
+        self._lock   = threading.Lock()
+
+    def observe(self, value, seconds):
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += seconds
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = {k: list(v) for k, v in self._series.items()}
+        for value, series in sorted(snapshot.items()):
+            label = f'{self.label}="{_escape(value)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{self.name}_bucket{{{label},le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{label}}} {series[-1]:.9f}")
+            lines.append(f"{self.name}_count{{{label}}} {cumulative}")
+        return lines
+
+
+class _Span:
+    __slots__ = ("histogram", "stage", "started")
+
+    def __init__(self, histogram, stage):
+        self.histogram = histogram
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(self.stage, time.perf_counter() - self.started)
+        return False
+
+
+class Metrics:
+    """
+    Latency spans for the matching hot path, exported in Prometheus text format.
+
+    `span(stage)` times a block into the `v2s_stage_seconds` histogram and
+    `start_request()`/`end_request()` time whole requests; `stream()` carries
+    a request's sampling into a streamed body and times the request until
+    the stream closes. Only a
+    `sample_rate` fraction of requests is timed; the decision is made once
+    per request, and unsampled requests pay for a shared no-op context
+    manager only. Histogram counts are therefore of sampled requests.
+    """
+
+    def __init__(self, sample_rate=1.0, buckets=BUCKETS):
+        self.sample_rate = sample_rate
+        self.stages   = Histogram("v2s_stage_seconds", "Time spent in each matching stage.", "stage", buckets)
+        self.requests = Histogram("v2s_request_seconds", "Request handling time (sampled requests).",
+                                  "endpoint", buckets)
+        self.requests_total  = 0
+        self.requests_sampled = 0
+        self._lock = threading.Lock()
+
+    def _sample(self):
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def sampled(self):
+        decision = _sampled.get()
+        return self._sample() if decision is None else decision
+
+    def span(self, stage):
+        """Context manager timing a block as `stage` (a no-op for unsampled requests)."""
+        if self.sample_rate <= 0 or not self.sampled():
+            return _NO_SPAN
+        return _Span(self.stages, stage)
+
+    def start_request(self):
+        """Decide whether the current request is sampled; returns its start time or None."""
+        decision = self.sample_rate > 0 and self._sample()
+        _sampled.set(decision)
+        with self._lock:
+            self.requests_total += 1
+            self.requests_sampled += decision
+        return time.perf_counter() if decision else None
+
+    def end_request(self, endpoint, started):
+        if started is not None:
+            self.requests.observe(endpoint, time.perf_counter() - started)
+        _sampled.set(None)
+
+    def stream(self, chunks, endpoint, started):
+        """
+        Iterate a streamed response body under its request's sampling decision
+        (the body runs after the request has ended) and record the request
+        once the stream is exhausted or closed.
+        """
+        decision = started is not None
+        chunks = iter(chunks)
+        try:
+            while True:
+                token = _sampled.set(decision)
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+                finally:
+                    _sampled.reset(token)
+                yield chunk
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+            if started is not None:
+                self.requests.observe(endpoint, time.perf_counter() - started)
+
+    def render(self, counters=()):
+        """Prometheus text exposition; `counters` adds (name, help, value) triples."""
+        lines = self.stages.render() + self.requests.render()
+        counters = [("v2s_requests_total", "Requests seen.", self.requests_total),
+                    ("v2s_requests_sampled_total", "Requests timed.", self.requests_sampled),
+                    *counters]
+        for name, help_text, value in counters:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter", f"{name} {value}"]
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
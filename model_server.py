@@ -0,0 +1,309 @@
+"""
+Local encoding service shared by the web workers of one node.
+
+Every process that imports app.py would otherwise load its own copy of the
+sentence encoder. `python model_server.py` loads it once, serves `encode`
+calls over a Unix domain socket and keeps the gloss index in a shared
+memory segment that workers map read-only instead of syncing their own.
+Point the app at it with V2S_MODEL_SOCKET; when the socket is missing or
+the server stops answering, the app loads the encoder in-process.
+
+Messages in both directions are
+
+    u32 header length | u32 payload length | JSON header | payload
+
+Requests carry {"op": "ping" | "encode" | "index", ...}. `encode` sends
+{"texts": [...]} and gets back {"shape": [n, dim]} with the float32
+embeddings as payload. `index` returns the names, shape and segment name
+of the published gloss matrix. Failures come back as {"error": message}.
+"""
+import os
+import sys
+import json
+import time
+import struct
+import signal
+import socket
+import logging
+import argparse
+import threading
+import socketserver
+from multiprocessing import shared_memory
+import numpy as np
+
+import resources
+from encoders import encoder_id, load_encoder, ENCODER_BACKEND, BACKENDS
+from encoder_scheduler import BatchingEncoder, MAX_BATCH_SIZE, MAX_WAIT_MS
+from gloss_index import GlossIndex, INDEX_DIR
+from vocabulary import Vocabulary
+
+SOCKET_PATH   = os.environ.get("V2S_MODEL_SOCKET", "data/run/model.sock")
+RETRY_SECONDS = 30.0   # after a failed connect, encode in-process this long before trying again
+TIMEOUT       = 30.0
+
+_LENGTHS = struct.Struct("<II")
+
+
+class ModelServerUnavailable(ConnectionError):
+    pass
+
+
+def send_message(sock, header, payload=b""):
+    head = json.dumps(header).encode()
+    sock.sendall(_LENGTHS.pack(len(head), len(payload)) + head)
+    if payload:
+        sock.sendall(payload)
+
+
+def _recv_exactly(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    got = 0
+    while got < size:
+        n = sock.recv_into(view[got:], size - got)
+        if n == 0:
+            raise ConnectionError("model server connection closed")
+        got += n
+    return buf
+
+
+def recv_message(sock):
+    """(header, payload) of the next message, or (None, b"") if the peer closed cleanly."""
+    first = sock.recv(1, socket.MSG_PEEK)
+    if not first:
+        return None, b""
+    head_len, payload_len = _LENGTHS.unpack(_recv_exactly(sock, _LENGTHS.size))
+    header = json.loads(_recv_exactly(sock, head_len))
+    return header, bytes(_recv_exactly(sock, payload_len)) if payload_len else b""
+
+
+def attach_matrix(name, shape):
+    """Read-only float32 view of a published gloss matrix, plus the segment keeping it mapped."""
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching registers the segment with this process's
+        # resource tracker, which would unlink it (under the server) at exit
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+    matrix = np.ndarray(tuple(shape), dtype=np.float32, buffer=shm.buf)
+    matrix.flags.writeable = False
+    return matrix, shm
+
+
+class ModelClient:
+    """
+    Thin client for the model server.
+
+    Each thread keeps one connection open and reuses it for every call; a
+    broken connection is reopened once before the call fails. After a
+    failed connect the client reports the server as unavailable for
+    `retry_seconds` without trying again, so callers can fall back to
+    in-process encoding cheaply.
+    """
+
+    def __init__(self, socket_path=SOCKET_PATH, retry_seconds=RETRY_SECONDS, timeout=TIMEOUT):
+        self.socket_path   = socket_path
+        self.retry_seconds = retry_seconds
+        self.timeout       = timeout
+        self._local   = threading.local()
+        self._down_until = 0.0
+        self._matrix  = None   # (segment name, names, matrix, shm) last attached
+        self._lock    = threading.Lock()
+
+    def available(self):
+        try:
+            return bool(self._call({"op": "ping"})[0].get("ok"))
+        except ModelServerUnavailable:
+            return False
+
+    def encode(self, texts, batch_size=None):
+        texts = list(texts)
+        header, payload = self._call({"op": "encode", "texts": texts})
+        return np.frombuffer(payload, dtype=np.float32).reshape(header["shape"])
+
+    def gloss_matrix(self):
+        """(names, read-only matrix) of the server's gloss index; None if nothing is published."""
+        header, _ = self._call({"op": "index"})
+        if not header.get("segment"):
+            return None
+        with self._lock:
+            if self._matrix is None or self._matrix[0] != header["segment"]:
+                matrix, shm = attach_matrix(header["segment"], header["shape"])
+                self._matrix = (header["segment"], header["names"], matrix, shm)
+            return self._matrix[1], self._matrix[2]
+
+    def close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def _connect(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            return sock
+        if time.monotonic() < self._down_until:
+            raise ModelServerUnavailable(f"model server at {self.socket_path} is unavailable")
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+        except OSError as e:
+            sock.close()
+            self._down_until = time.monotonic() + self.retry_seconds
+            logging.warning(f"Model server at {self.socket_path} unavailable ({e}); encoding in-process")
+            raise ModelServerUnavailable(str(e)) from e
+        self._local.sock = sock
+        return sock
+
+    def _call(self, header, payload=b""):
+        for attempt in range(2):
+            sock = self._connect()
+            try:
+                send_message(sock, header, payload)
+                reply, data = recv_message(sock)
+                if reply is None:
+                    raise ConnectionError("model server closed the connection")
+                break
+            except OSError as e:
+                # A reused connection may have been closed by a server restart; reconnect once
+                self.close()
+                if attempt:
+                    self._down_until = time.monotonic() + self.retry_seconds
+                    raise ModelServerUnavailable(str(e)) from e
+        if "error" in reply:
+            raise RuntimeError(f"model server: {reply['error']}")
+        return reply, data
+
+
+class ModelServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Serves one encoder and the gloss index to local clients.
+
+    Concurrent `encode` requests from different workers share forward passes
+    through a BatchingEncoder. The gloss matrix is copied into a fresh
+    shared memory segment whenever the vocabulary changes; the previous one
+    is unlinked, and workers that still map it keep a valid (stale) view
+    until they fetch the new one.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path, encoder, index_dir=INDEX_DIR, max_wait_ms=MAX_WAIT_MS):
+        self.encoder     = encoder
+        self.batcher     = BatchingEncoder(encoder.encode, MAX_BATCH_SIZE, max_wait_ms) if max_wait_ms > 0 else None
+        self.gloss_index = GlossIndex(self.encode, index_dir, encoder=encoder_id(encoder.name))
+        self.gloss_index.load()
+        self._published  = None   # (header, shm)
+        self._lock       = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)   # left behind by a server that did not shut down cleanly
+        super().__init__(socket_path, _Handler)
+
+    def encode(self, texts):
+        if self.batcher is not None and len(texts) < MAX_BATCH_SIZE:
+            return self.batcher.encode(texts)
+        return self.encoder.encode(texts, MAX_BATCH_SIZE)
+
+    def sync(self, glosses):
+        """Bring the gloss index up to date and publish it if it changed (or was never published)."""
+        if self.gloss_index.sync(glosses) or self._published is None:
+            self.publish()
+
+    def publish(self):
+        """Copy the current gloss matrix into a new shared memory segment."""
+        names, matrix = self.gloss_index.names, np.asarray(self.gloss_index.matrix, dtype=np.float32)
+        shm = None
+        if names:
+            shm = shared_memory.SharedMemory(create=True, size=max(matrix.nbytes, 1))
+            np.ndarray(matrix.shape, dtype=np.float32, buffer=shm.buf)[:] = matrix
+        header = {"segment": shm.name if shm else None, "names": list(names), "shape": list(matrix.shape)}
+        with self._lock:
+            old, self._published = self._published, (header, shm)
+        if old and old[1]:
+            old[1].close()
+            old[1].unlink()
+        logging.info(f"Published gloss matrix {matrix.shape} as {header['segment']}")
+
+    def index_header(self):
+        with self._lock:
+            return self._published[0] if self._published else {"segment": None}
+
+    def server_close(self):
+        super().server_close()
+        if os.path.exists(self.server_address):
+            os.unlink(self.server_address)
+        with self._lock:
+            old, self._published = self._published, None
+        if old and old[1]:
+            old[1].close()
+            old[1].unlink()
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # One connection carries any number of requests (clients reuse it)
+        while True:
+            try:
+                header, _ = recv_message(self.request)
+            except (OSError, ValueError):
+                return
+            if header is None:
+                return
+            try:
+                reply, payload = self.dispatch(header)
+            except Exception as e:
+                logging.exception("Model server request failed")
+                reply, payload = {"error": str(e)}, b""
+            try:
+                send_message(self.request, reply, payload)
+            except OSError:
+                return
+
+    def dispatch(self, header):
+        op = header.get("op")
+        if op == "ping":
+            return {"ok": True, "backend": self.server.encoder.name}, b""
+        if op == "encode":
+            texts = [str(t) for t in header.get("texts", [])]
+            if not texts:
+                return {"shape": [0, 0]}, b""
+            embeddings = np.ascontiguousarray(self.server.encode(texts), dtype=np.float32)
+            return {"shape": list(embeddings.shape)}, embeddings.tobytes()
+        if op == "index":
+            return self.server.index_header(), b""
+        raise ValueError(f"unknown op {op!r}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the sentence encoder and gloss index to local workers.")
+    parser.add_argument("--socket", default=SOCKET_PATH)
+    parser.add_argument("--backend", default=ENCODER_BACKEND, choices=BACKENDS)
+    parser.add_argument("--keypoint-dir", default="data/key")
+    parser.add_argument("--video-dir", default="data/video")
+    parser.add_argument("--batch-wait-ms", type=float, default=MAX_WAIT_MS)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    resources.configure()
+    encoder = load_encoder(args.backend)
+    server = ModelServer(args.socket, encoder, INDEX_DIR, args.batch_wait_ms)
+
+    # The server is the only process that encodes and saves the gloss index
+    vocabulary = Vocabulary(args.keypoint_dir, args.video_dir)
+    vocabulary.on_change(lambda vocab: server.sync(vocab.keypoints))
+    vocabulary.start_watching()
+    server.sync(vocabulary.keypoints)
+
+    # Shut down cleanly on SIGTERM too, so the socket and shared segment are removed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    logging.info(f"Model server ({encoder.name}) listening on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
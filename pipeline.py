@@ -0,0 +1,310 @@
+"""
+Streaming dataset build: download -> cut -> extract in one pass.
+
+The separate scripts fetch every source, cut each clip to data/video, and
+later decode every clip again for extractkeypoints.py. Here the three
+stages overlap and are connected by bounded queues:
+
+    download  fetches each source once (video_download.SourceCache), or reads
+              <id>.mp4 in place from --source-dir, and queues its clips
+    cut       runs one ffmpeg per clip with two outputs: the MP4 written to
+              data/video, and the sampled frames decoded once and piped out
+              as raw RGB. The MP4's video is re-encoded rather than stream
+              copied, so both start exactly at the cut (a stream copy would
+              start at the keyframe before it)
+    extract   feeds those frames straight into MediaPipe Holistic and saves
+              the keypoints, recording them in the extraction manifest so
+              extractkeypoints.py treats the clip as current
+
+A full queue makes the stage before it wait, so at most a few clips (and
+FRAME_QUEUE frames per clip) are in flight. Clips that already exist in
+data/video are skipped, as in video_download.py.
+"""
+import os
+import json
+import queue
+import argparse
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import numpy as np
+from tqdm import tqdm
+
+import extractkeypoints as ek
+from ffmpeg_utils import probe, video_stream
+from video_download import (FOLDER, LINKS_CSV, MAX_WORKERS, RETRIES, SOURCE_CACHE, SourceCache,
+                            YtDlpFetcher, has_segment, load_links, plan_downloads)
+
+CLIP_QUEUE    = 8    # clips waiting to be cut
+EXTRACT_QUEUE = 4    # cut clips waiting for an extractor
+FRAME_QUEUE   = 64   # decoded frames buffered per clip
+EXTRACT_WORKERS = 1  # Holistic instances (threads)
+# H.264 settings for the clip MP4s (near-transparent; the audio is copied)
+CLIP_CRF    = 18
+CLIP_PRESET = "veryfast"
+
+
+class ClipFrames:
+    """Decoded frames of one clip, handed from its cutter to an extractor."""
+
+    def __init__(self, name, video_file, size=None):
+        self.name       = name
+        self.video_file = video_file
+        self.size       = size   # (width, height)
+        self.result     = Future()   # resolves once the MP4 is in place, or to the cut error
+        self._frames    = queue.Queue(maxsize=FRAME_QUEUE)
+        self._ended     = False   # the end-of-frames marker has been queued
+        self._closed    = False   # ... and read
+
+    def put(self, frame):
+        self._frames.put(frame)
+
+    def close(self):
+        if not self._ended:
+            self._ended = True
+            self._frames.put(None)
+
+    def __iter__(self):
+        while True:
+            if self._closed:
+                return
+            frame = self._frames.get()
+            if frame is None:
+                self._closed = True
+                return
+            yield frame
+
+    def drain(self):
+        """Discard the remaining frames so the cutter is never left blocked."""
+        for _ in self:
+            pass
+
+
+def frame_filter(size, target_fps=None, frame_skip=ek.FRAME_SKIP):
+    """Video filter sampling frames like extractkeypoints.py, then scaling to exactly `size`."""
+    if target_fps:
+        sample = f"fps={target_fps}"
+    else:
+        # Every frame_skip-th frame, starting with the frame_skip-th (as extract_keypoints does)
+        sample = f"select=not(mod(n+1\\,{int(frame_skip)}))"
+    return f"{sample},scale={size[0]}:{size[1]}"
+
+
+def output_size(source_path, max_height=None):
+    video = video_stream(probe(source_path))
+    width, height = int(video["width"]), int(video["height"])
+    if max_height and height > max_height:
+        width, height = max(1, round(width * max_height / height)), max_height
+    return width, height
+
+
+def cut_and_decode(source_path, output_path, start_time, duration_time, clip, target_fps=None):
+    """
+    Cut one clip and decode its sampled frames in a single ffmpeg run. The
+    MP4 goes to a temporary file that replaces `output_path` once ffmpeg
+    succeeds; frames are pushed into `clip` as they arrive.
+    """
+    width, height = clip.size
+    trim = has_segment(start_time, duration_time)
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y"]
+    if trim:
+        cmd += ["-ss", str(start_time).strip()]
+    cmd += ["-i", source_path]
+    to = ["-to", str(duration_time).strip()] if trim else []
+    tmp_path = output_path + ".part"
+    cmd += to + ["-c:v", "libx264", "-preset", CLIP_PRESET, "-crf", str(CLIP_CRF), "-pix_fmt", "yuv420p",
+                 "-c:a", "copy", "-movflags", "+faststart", "-f", "mp4", tmp_path]
+    cmd += to + ["-map", "0:v:0", "-vf", frame_filter(clip.size, target_fps), "-fps_mode", "passthrough",
+                 "-f", "rawvideo", "-pix_fmt", "rgb24", "pipe:1"]
+
+    frame_bytes = width * height * 3
+    # stderr goes to a file: a pipe read only after stdout ends could fill up and stall ffmpeg
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            while True:
+                data = process.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                clip.put(np.frombuffer(data, dtype=np.uint8).reshape(height, width, 3))
+            if process.wait() != 0:
+                errors.seek(0)
+                stderr = errors.read().decode(errors="replace").strip()
+                raise subprocess.CalledProcessError(process.returncode, cmd, stderr=stderr)
+            os.replace(tmp_path, output_path)
+        except BaseException:
+            process.kill()
+            process.wait()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            process.stdout.close()
+            clip.close()
+
+
+def run_pipeline(df_links, fetcher=None, source_dir=None, folder=FOLDER, cache_dir=SOURCE_CACHE,
+                 workers=MAX_WORKERS, extract_workers=EXTRACT_WORKERS, retries=RETRIES, fmt=ek.OUTPUT_FORMAT,
+                 keep_sources=True, groups=ek.KEYPOINT_GROUPS, target_fps=ek.TARGET_FPS, max_height=ek.MAX_HEIGHT):
+    """
+    Download, cut and extract every clip in `df_links`. `workers` threads
+    fetch sources and as many cut clips; `extract_workers` threads run
+    Holistic, with a new instance per clip so no tracking state carries
+    over. With `source_dir` sources are read in place; with `keep_sources`
+    False a cached source is deleted once its clips are done.
+    Returns the number of clips that failed.
+    """
+    os.makedirs(folder, exist_ok=True)
+    cache = None if source_dir else SourceCache(fetcher or YtDlpFetcher(), cache_dir, retries)
+    jobs = plan_downloads(df_links, folder)
+    total = sum(len(segments) for segments in jobs.values())
+    clip_queue = queue.Queue(maxsize=CLIP_QUEUE)
+    extract_queue = queue.Queue(maxsize=EXTRACT_QUEUE)
+    remaining = {video_id: len(segments) for video_id, segments in jobs.items()}
+    manifest = ek.load_manifest()
+    params = ek.extraction_params(fmt, groups, target_fps, max_height)
+    lock = threading.Lock()
+    failed = 0
+
+    def fail(name, error):
+        nonlocal failed
+        with lock:
+            failed += 1
+        tqdm.write(f"Failed: {name}: {error}")
+
+    def source_done(video_id, source_path):
+        with lock:
+            remaining[video_id] -= 1
+            last = remaining[video_id] == 0
+        if last and cache is not None and not keep_sources and os.path.exists(source_path):
+            os.remove(source_path)
+
+    def fetch(video_id):
+        if cache is not None:
+            return cache.get(video_id)
+        path = os.path.join(source_dir, f"{video_id}.mp4")
+        if not os.path.exists(path):
+            raise FileNotFoundError(path)
+        return path
+
+    def cutter():
+        while True:
+            job = clip_queue.get()
+            if job is None:
+                return
+            video_id, source_path, (name, output_path, start_time, duration_time) = job
+            clip = ClipFrames(name, os.path.basename(output_path))
+            extract_queue.put(clip)
+            try:
+                clip.size = output_size(source_path, max_height)
+                cut_and_decode(source_path, output_path, start_time, duration_time, clip, target_fps)
+                clip.result.set_result(output_path)
+            except Exception as e:
+                clip.result.set_exception(e)
+            finally:
+                clip.close()
+            try:
+                source_done(video_id, source_path)
+            except OSError as e:
+                tqdm.write(f"Could not remove {source_path}: {e}")
+
+    def extract(clip):
+        buffer = ek.FrameBuffer(groups)
+        with ek.new_holistic() as holistic:
+            for frame in clip:
+                buffer.append(holistic.process(frame))
+        video_path = clip.result.result()
+        keypoints, mask = buffer.arrays()
+        if not len(keypoints):
+            raise ValueError("no frames decoded")
+        gesture_name = os.path.splitext(clip.video_file)[0]
+        ek.save_output(ek.keypoint_path(gesture_name, fmt), keypoints, mask, groups=groups, fmt=fmt)
+        entry = {"video": clip.video_file, **ek.video_signature(video_path),
+                 "sha1": ek.file_digest(video_path), "params": params}
+        with lock:
+            manifest[clip.video_file] = entry
+            journal.write(json.dumps(entry) + "\n")
+            journal.flush()
+
+    def extractor():
+        while True:
+            clip = extract_queue.get()
+            if clip is None:
+                return
+            try:
+                extract(clip)
+            except Exception as e:
+                # Also covers a Holistic that cannot be created: drain so the cutter never blocks
+                clip.drain()
+                fail(clip.name, e)
+            progress.update(1)
+
+    os.makedirs(os.path.dirname(ek.MANIFEST_PATH) or ".", exist_ok=True)
+    ek.save_manifest(manifest)
+    with open(ek.MANIFEST_PATH, "a") as journal, tqdm(total=total, desc="Clips") as progress:
+        extractors = [threading.Thread(target=extractor, name=f"extract-{i}")
+                      for i in range(max(1, extract_workers))]
+        cutters = [threading.Thread(target=cutter, name=f"cut-{i}") for i in range(max(1, workers))]
+        for thread in extractors + cutters:
+            thread.start()
+
+        # Download stage: queue each source's clips as soon as it is available
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as fetch_pool:
+                fetches = {fetch_pool.submit(fetch, video_id): video_id for video_id in jobs}
+                for future in as_completed(fetches):
+                    video_id = fetches[future]
+                    try:
+                        source_path = future.result()
+                    except Exception as e:
+                        for name, *_ in jobs[video_id]:
+                            fail(name, e)
+                            progress.update(1)
+                        continue
+                    for segment in jobs[video_id]:
+                        clip_queue.put((video_id, source_path, segment))
+        finally:
+            # Shut the stages down in order, even if the download stage failed
+            for _ in cutters:
+                clip_queue.put(None)
+            for thread in cutters:
+                thread.join()
+            for _ in extractors:
+                extract_queue.put(None)
+            for thread in extractors:
+                thread.join()
+
+    # Compact the journal to one line per video
+    ek.save_manifest(manifest)
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download, cut and extract keypoints in one streaming pass.")
+    parser.add_argument("csv", nargs="?", default=LINKS_CSV, help="CSV with name,id,start_time,duration_time")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="concurrent downloads / cuts")
+    parser.add_argument("--extract-workers", type=int, default=EXTRACT_WORKERS,
+                        help="concurrent Holistic instances")
+    parser.add_argument("--retries", type=int, default=RETRIES)
+    parser.add_argument("--source-dir", help="read <id>.mp4 source videos in place from this directory")
+    parser.add_argument("--no-keep-sources", action="store_true",
+                        help="delete each downloaded source once all its clips are done")
+    parser.add_argument("--format", choices=["json", "npz"], default=ek.OUTPUT_FORMAT, help="keypoint file format")
+    parser.add_argument("--groups", default=",".join(ek.KEYPOINT_GROUPS),
+                        help="comma-separated landmark groups to keep (pose,left_hand,right_hand,face)")
+    parser.add_argument("--target-fps", type=float, default=ek.TARGET_FPS,
+                        help="sample frames at this rate instead of every FRAME_SKIP-th frame")
+    parser.add_argument("--max-height", type=int, default=ek.MAX_HEIGHT,
+                        help="downscale taller frames to this height before inference")
+    args = parser.parse_args()
+    groups = tuple(g.strip() for g in args.groups.split(",") if g.strip())
+    unknown = [g for g in groups if g not in ek.LANDMARK_GROUPS]
+    if unknown:
+        parser.error(f"unknown landmark groups: {', '.join(unknown)}")
+
+    failed = run_pipeline(load_links(args.csv), source_dir=args.source_dir, workers=args.workers,
+                          extract_workers=args.extract_workers, retries=args.retries, fmt=args.format,
+                          keep_sources=not args.no_keep_sources, groups=groups,
+                          target_fps=args.target_fps, max_height=args.max_height)
+    print(f"\nPipeline completed ({failed} failed).\n")
@@ -0,0 +1,86 @@
+import os
+import sys
+import argparse
+
+# Local resource bundle: NLTK data and the sentence encoder, so startup needs no network.
+# Build it once with `python resources.py` on a machine with network access.
+RESOURCE_DIR = os.environ.get("V2S_RESOURCE_DIR", "resources")
+NLTK_DIR     = os.path.join(RESOURCE_DIR, "nltk_data")
+MODEL_NAME   = "sentence-transformers/all-MiniLM-L6-v2"
+MODEL_DIR    = os.path.join(RESOURCE_DIR, "models", "all-MiniLM-L6-v2")
+
+# V2S_OFFLINE=1: never download anything; missing resources are an error
+OFFLINE = os.environ.get("V2S_OFFLINE", "0") == "1"
+
+# NLTK package -> resource path checked by nltk.data.find
+NLTK_RESOURCES = {
+    "punkt":     "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab",
+    "stopwords": "corpora/stopwords",
+    "wordnet":   "corpora/wordnet",
+}
+
+
+def configure():
+    """Point NLTK and Hugging Face at the local bundle without importing either."""
+    nltk_dir = os.path.abspath(NLTK_DIR)
+    if "nltk" in sys.modules:
+        import nltk
+        if nltk_dir not in nltk.data.path:
+            nltk.data.path.insert(0, nltk_dir)
+    else:
+        # nltk builds its search path from NLTK_DATA when first imported
+        paths = os.environ.get("NLTK_DATA", "")
+        if nltk_dir not in paths.split(os.pathsep):
+            os.environ["NLTK_DATA"] = os.pathsep.join(p for p in (nltk_dir, paths) if p)
+    if OFFLINE:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+
+def ensure_nltk(name, required=True):
+    """Make sure an NLTK package is available, downloading it only if missing and not offline."""
+    import nltk
+    configure()
+    path = NLTK_RESOURCES[name]
+    for candidate in (path, path + ".zip"):
+        try:
+            nltk.data.find(candidate)
+            return True
+        except LookupError:
+            pass
+    if not OFFLINE and nltk.download(name, quiet=True):
+        return True
+    if required:
+        raise LookupError(f"NLTK resource '{name}' not found (looked in {NLTK_DIR}; offline={OFFLINE})")
+    return False
+
+
+def model_source():
+    """The bundled model directory if present, otherwise the hub name."""
+    return MODEL_DIR if os.path.isdir(MODEL_DIR) else MODEL_NAME
+
+
+def load_model():
+    configure()
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(model_source())
+
+
+def bundle(nltk_packages=tuple(NLTK_RESOURCES), include_model=True):
+    """Download NLTK data and the encoder into RESOURCE_DIR."""
+    import nltk
+    os.makedirs(NLTK_DIR, exist_ok=True)
+    for name in nltk_packages:
+        nltk.download(name, download_dir=NLTK_DIR, quiet=True)
+    if include_model:
+        from sentence_transformers import SentenceTransformer
+        SentenceTransformer(MODEL_NAME).save(MODEL_DIR)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Bundle NLTK data and the encoder into {RESOURCE_DIR}.")
+    parser.add_argument("--no-model", action="store_true", help="only bundle the NLTK data")
+    args = parser.parse_args()
+    bundle(include_model=not args.no_model)
+    print(f"Resources bundled in {RESOURCE_DIR}")
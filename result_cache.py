@@ -0,0 +1,151 @@
+import json
+import time
+import threading
+from collections import OrderedDict
+
+# Defaults for the query result cache
+CACHE_SIZE = 4096   # entries kept in-process
+CACHE_TTL  = 600    # seconds
+
+
+def normalize_query(text):
+    """Cache key form of a query: lower-case with runs of whitespace collapsed."""
+    return " ".join(text.lower().split())
+
+
+class LocalSharedBackend:
+    """In-memory stand-in for a shared cache server (tests and single-process runs)."""
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """(value, seconds left or None if it never expires), or (None, None) if missing."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None, None
+            value, expires = item
+            if expires is None:
+                return value, None
+            left = expires - time.monotonic()
+            if left <= 0:
+                del self._data[key]
+                return None, None
+            return value, left
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl if ttl else None)
+
+
+class RedisBackend:
+    """Shared cache in Redis, so every web worker sees the others' results."""
+
+    def __init__(self, url):
+        import redis  # optional dependency
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        """(value, seconds left or None if it never expires), or (None, None) if missing."""
+        pipe = self.client.pipeline()
+        pipe.get(key)
+        pipe.pttl(key)
+        value, pttl = pipe.execute()
+        if value is None:
+            return None, None
+        return value.decode(), pttl / 1000 if pttl >= 0 else None
+
+    def set(self, key, value, ttl=None):
+        # Milliseconds, so TTLs under a second neither round to 0 (an error) nor lose precision
+        self.client.set(key, value, px=max(1, int(ttl * 1000)) if ttl else None)
+
+
+def shared_backend(url):
+    """Backend for a V2S_CACHE_URL value: "local" for the in-memory stand-in, or a redis:// URL."""
+    if not url:
+        return None
+    if url == "local":
+        return LocalSharedBackend()
+    return RedisBackend(url)
+
+
+class ResultCache:
+    """
+    Bounded LRU cache of query results with a TTL.
+
+    Entries live in-process (an OrderedDict in LRU order) and, if a shared
+    backend is given, are also written there as JSON so other workers can
+    reuse them. An entry found in the shared backend is kept locally only
+    for the rest of its shared TTL. Callers fold a vocabulary fingerprint
+    into the key, so results computed against an older vocabulary are never
+    served; `clear()` drops the local entries when the vocabulary changes.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE, ttl=CACHE_TTL, backend=None, namespace="v2s:matches"):
+        self.maxsize   = maxsize
+        self.ttl       = ttl
+        self.backend   = backend
+        self.namespace = namespace
+        self._entries  = OrderedDict()
+        self._lock     = threading.Lock()
+        self.hits = self.shared_hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                value, expires = item
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+        if self.backend is not None:
+            raw, left = self.backend.get(f"{self.namespace}:{key}")
+            if raw is not None:
+                value = json.loads(raw)
+                self._store(key, value, self.ttl if left is None else min(left, self.ttl))
+                with self._lock:
+                    self.shared_hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(f"{self.namespace}:{key}", json.dumps(value), self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else 0.0,
+                "shared_backend": type(self.backend).__name__ if self.backend is not None else None,
+            }
+
+    def _store(self, key, value, ttl=None):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
@@ -0,0 +1,189 @@
+import os
+import logging
+import hashlib
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+
+from ffmpeg_utils import probe, video_stream
+
+SENTENCE_CACHE_DIR   = "data/cache/sentences"
+SENTENCE_CACHE_BYTES = 512 * 1024 * 1024   # assembled videos kept on disk
+MAX_SENTENCE_CLIPS   = 32   # clips joined into one sentence video
+MAX_BUILDS           = 2    # ffmpeg assemblies running at once; further requests wait
+
+# Output of the re-encode fallback, used when the clips' codec parameters differ
+FALLBACK_FPS = 25
+FALLBACK_CRF = 23
+
+
+def _video_size(params):
+    video = video_stream(params)
+    # libx264 with yuv420p needs even dimensions
+    return video["width"] // 2 * 2, video["height"] // 2 * 2
+
+
+def concat_videos(paths, output_path):
+    """
+    Join `paths` into one MP4 at `output_path`.
+
+    Clips whose streams all share codec parameters are joined with the concat
+    demuxer and a stream copy (no re-encode). Otherwise every clip is scaled
+    to the first clip's frame size and re-encoded to H.264 without audio.
+    Returns True if the stream-copy path was used.
+    """
+    params = [probe(p) for p in paths]
+    copy = all(p == params[0] for p in params[1:])
+    tmp_path = output_path + ".part"
+    try:
+        if copy:
+            _concat_copy(paths, tmp_path)
+        else:
+            _concat_reencode(paths, _video_size(params[0]), tmp_path)
+    except BaseException:
+        # A failed or interrupted ffmpeg run must not leave its partial output behind
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    os.replace(tmp_path, output_path)
+    return copy
+
+
+def _concat_copy(paths, output_path):
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as listing:
+        for path in paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            listing.write(f"file '{escaped}'\n")
+    try:
+        subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+             "-f", "concat", "-safe", "0", "-i", listing.name,
+             "-c", "copy", "-movflags", "+faststart", "-f", "mp4", output_path],
+            check=True,
+        )
+    finally:
+        os.remove(listing.name)
+
+
+def _concat_reencode(paths, size, output_path):
+    width, height = size
+    inputs, chains = [], []
+    for i, path in enumerate(paths):
+        inputs += ["-i", path]
+        chains.append(
+            f"[{i}:v:0]scale={width}:{height}:force_original_aspect_ratio=decrease,"
+            f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={FALLBACK_FPS},format=yuv420p[v{i}]"
+        )
+    graph = ";".join(chains) + ";" + "".join(f"[v{i}]" for i in range(len(paths))) \
+        + f"concat=n={len(paths)}:v=1:a=0[out]"
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", *inputs,
+         "-filter_complex", graph, "-map", "[out]",
+         "-c:v", "libx264", "-preset", "veryfast", "-crf", str(FALLBACK_CRF),
+         "-an", "-movflags", "+faststart", "-f", "mp4", output_path],
+        check=True,
+    )
+
+
+class SentenceVideoCache:
+    """
+    Disk cache of assembled sentence videos keyed by their clip sequence.
+
+    The key covers each clip's name, size and mtime, so re-cut clips produce
+    a new entry. Reads refresh an entry's mtime and the oldest entries are
+    evicted once the directory grows beyond `max_bytes`. Each sequence is
+    assembled at most once, even when several requests ask for it together,
+    and at most `max_builds` sequences are assembled at a time.
+
+    An entry is opened, built and evicted only under its own lock, so a
+    reader always gets an open file; evicting it later does not cut off a
+    response that is still streaming it.
+    """
+
+    def __init__(self, video_dir, cache_dir=SENTENCE_CACHE_DIR, max_bytes=SENTENCE_CACHE_BYTES,
+                 max_builds=MAX_BUILDS, delivery_dir=None):
+        self.video_dir = video_dir
+        self.delivery_dir = delivery_dir   # transcoded copies, used instead of the clips when present
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._locks  = {}   # entry name -> [lock, number of threads using it]
+        self._guard  = threading.Lock()
+        self._builds = threading.BoundedSemaphore(max_builds)
+        self._stats_lock = threading.Lock()
+        self.hits = self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, video_files):
+        digest = hashlib.sha1()
+        for fname in video_files:
+            st = os.stat(self.clip_path(fname))
+            digest.update(f"{fname}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+
+    def open(self, video_files):
+        """(file name in `cache_dir`, open binary file) of the video joining `video_files` in order."""
+        fname = self.key(video_files) + ".mp4"
+        path = os.path.join(self.cache_dir, fname)
+        with self._locked(fname):
+            if os.path.exists(path):
+                with self._stats_lock:
+                    self.hits += 1
+                os.utime(path)   # mark as recently used
+                return fname, open(path, "rb")
+            with self._stats_lock:
+                self.misses += 1
+            with self._builds:
+                copied = concat_videos([self.clip_path(f) for f in video_files], path)
+            logging.info(f"Assembled {len(video_files)} clips into {fname} ({'stream copy' if copied else 're-encoded'})")
+            f = open(path, "rb")
+        self.evict(keep=fname)
+        return fname, f
+
+    def clip_path(self, fname):
+        if self.delivery_dir:
+            path = os.path.join(self.delivery_dir, fname)
+            if os.path.exists(path):
+                return path
+        return os.path.join(self.video_dir, fname)
+
+    @contextmanager
+    def _locked(self, fname):
+        # Per-entry locks are dropped once no thread holds or waits for them
+        with self._guard:
+            entry = self._locks.setdefault(fname, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._guard:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[fname]
+
+    def evict(self, keep=None):
+        """Delete least recently used entries until the cache fits in `max_bytes`."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".mp4"):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            with self._locked(name):
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    pass
+            total -= size
+
+    def stats(self):
+        with self._stats_lock:
+            return {"hits": self.hits, "misses": self.misses, "max_bytes": self.max_bytes}
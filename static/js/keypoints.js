@@ -0,0 +1,82 @@
+// Decoder for the V2SK keypoint stream served by /keypoints/stream (format: keypoint_stream.py)
+// Usage:
+//   const stream = await fetchKeypoints({ input: 'thank you' });
+//   drawFrame(canvas.getContext('2d'), stream, stream.glosses[0], 0);
+const V2SK_GROUPS = ['pose', 'left_hand', 'right_hand', 'face'];
+
+function decodeKeypoints(buffer) {
+  const view  = new DataView(buffer),
+        bytes = new Uint8Array(buffer);
+  if (String.fromCharCode(...bytes.subarray(0, 4)) !== 'V2SK' || view.getUint8(4) !== 1) {
+    throw new Error('not a V2SK keypoint stream');
+  }
+  const nGroups    = view.getUint8(5),
+        nLandmarks = view.getUint16(6, true),
+        scale      = view.getFloat32(8, true),
+        nGlosses   = view.getUint16(12, true);
+  let offset = 14;
+  const groups = Array.from(bytes.subarray(offset, offset + nGroups), i => V2SK_GROUPS[i]);
+  offset += nGroups + nGroups % 2;
+  const landmarks = Array.from({ length: nLandmarks }, (_, i) => view.getUint16(offset + 2 * i, true));
+  offset += 2 * nLandmarks;
+
+  const decoder = new TextDecoder(),
+        glosses = [];
+  for (let g = 0; g < nGlosses; g++) {
+    const nameLen = bytes[offset];
+    const name = decoder.decode(bytes.subarray(offset + 1, offset + 1 + nameLen));
+    offset += 1 + nameLen;
+    const frames = view.getUint32(offset, true);
+    offset += 4;
+    const mask = bytes.slice(offset, offset + frames);
+    offset += frames + (offset + frames) % 2;
+
+    // Undo the frame deltas with 16-bit wraparound, then dequantize
+    const size   = nLandmarks * 3,
+          deltas = new Int16Array(buffer, offset, frames * size),
+          acc    = new Int16Array(size),
+          coords = new Float32Array(frames * size);
+    for (let f = 0; f < frames; f++) {
+      for (let i = 0; i < size; i++) {
+        acc[i] += deltas[f * size + i];
+        coords[f * size + i] = acc[i] / scale;
+      }
+    }
+    offset += 2 * frames * size;
+    glosses.push({ name, frames, mask, coords });
+  }
+  return { groups, landmarks, scale, glosses };
+}
+
+// Fetch and decode the keypoints for `{ input }` or `{ glosses: [...] }`
+async function fetchKeypoints({ input, glosses, groups, landmarks } = {}) {
+  const params = new URLSearchParams();
+  if (input) params.set('input', input);
+  (glosses || []).forEach(g => params.append('g', g));
+  if (groups) params.set('groups', groups.join(','));
+  if (landmarks) params.set('landmarks', landmarks.join(','));
+  const response = await fetch('/keypoints/stream?' + params);
+  if (!response.ok) throw new Error(`keypoint stream failed: ${response.status}`);
+  return decodeKeypoints(await response.arrayBuffer());
+}
+
+// True if landmark group `name` was detected in `frame` of a decoded gloss
+function groupPresent(stream, gloss, frame, name) {
+  const g = stream.groups.indexOf(name);
+  return g >= 0 && Boolean(gloss.mask[frame] & (1 << g));
+}
+
+// Draw one frame as dots on a 2D canvas (coordinates are normalised to the video frame)
+function drawFrame(ctx, stream, gloss, frame, radius = 2) {
+  const { width, height } = ctx.canvas,
+        size = stream.landmarks.length * 3,
+        base = frame * size;
+  ctx.clearRect(0, 0, width, height);
+  for (let i = 0; i < stream.landmarks.length; i++) {
+    const x = gloss.coords[base + 3 * i], y = gloss.coords[base + 3 * i + 1];
+    if (x === 0 && y === 0) continue;  // landmark of a missing group
+    ctx.beginPath();
+    ctx.arc(x * width, y * height, radius, 0, 2 * Math.PI);
+    ctx.fill();
+  }
+}
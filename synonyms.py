@@ -0,0 +1,172 @@
+import os
+import sys
+import json
+import logging
+import threading
+from functools import lru_cache
+
+import resources
+
+# Precomputed WordNet lemma -> gloss table (built offline with `python synonyms.py`)
+SYNONYM_TABLE = "data/index/synonyms.json"
+
+# WordNet's morphy detachment rules, used to find the base form of an inflected
+# token without loading the corpus (e.g. "greetings" -> "greeting")
+MORPHY_SUFFIXES = [
+    ("s", ""), ("ses", "s"), ("xes", "x"), ("zes", "z"), ("ches", "ch"), ("shes", "sh"),
+    ("men", "man"), ("ies", "y"), ("es", "e"), ("es", ""), ("ed", "e"), ("ed", ""),
+    ("ing", "e"), ("ing", ""), ("er", ""), ("est", ""), ("er", "e"), ("est", "e"),
+]
+
+
+def wordnet_synonyms(word, wordnet):
+    """Lemma names of every synset of `word`, in WordNet's synset/lemma order, without duplicates."""
+    seen = {}
+    for s in wordnet.synsets(word):
+        for lem in s.lemmas():
+            seen.setdefault(lem.name(), None)
+    return list(seen)
+
+
+def base_forms(word):
+    """Candidate base forms of an inflected word (the word itself first)."""
+    forms = [word]
+    for suffix, ending in MORPHY_SUFFIXES:
+        if word.endswith(suffix) and len(word) > len(suffix):
+            form = word[:-len(suffix)] + ending
+            if form not in forms:
+                forms.append(form)
+    return forms
+
+
+def build_synonym_table(glosses, wordnet):
+    """
+    Map every WordNet lemma to the glosses it reaches through its synsets.
+
+    Glosses are listed in the order the query-time expansion would try them.
+    Lemmas that are glosses themselves, or reach no gloss, are left out unless
+    stripping their suffix would wrongly land on another entry or gloss (e.g.
+    "news" -> "new"); those are kept with an empty list.
+    """
+    gloss_set = set(glosses)
+    lemmas = [lemma for lemma in wordnet.all_lemma_names() if lemma not in gloss_set]
+    table = {}
+    for lemma in lemmas:
+        hits = [syn for syn in wordnet_synonyms(lemma, wordnet) if syn in gloss_set]
+        if hits:
+            table[lemma] = hits
+    for lemma in lemmas:
+        if lemma not in table and any(form in table or form in gloss_set for form in base_forms(lemma)[1:]):
+            table[lemma] = []
+    return {"glosses": sorted(gloss_set), "table": table}
+
+
+class SynonymTable:
+    """
+    Query-time synonym expansion against the gloss vocabulary.
+
+    Lookups go to the precomputed lemma -> gloss table, so the web process
+    does not need the WordNet corpus at all. If the table is missing or was
+    built for an older vocabulary and `use_wordnet` is set, lookups fall back
+    to walking WordNet directly (memoized per word). The corpus is checked
+    for the first time the fallback is needed; without it, lookups use
+    whatever table there is.
+    """
+
+    def __init__(self, path=SYNONYM_TABLE, use_wordnet=True):
+        self.path        = path
+        self.use_wordnet = use_wordnet
+        self.table   = {}
+        self.glosses = None   # vocabulary the table was built for (None: no table)
+        self._wordnet_checked = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            logging.warning(f"No synonym table at {self.path}; run `python synonyms.py` to build it")
+            return False
+        with open(self.path) as f:
+            data = json.load(f)
+        self.table   = data["table"]
+        self.glosses = frozenset(data["glosses"])
+        return True
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"glosses": sorted(self.glosses), "table": self.table}, f)
+        os.replace(tmp, self.path)
+
+    def build(self, glosses, wordnet):
+        data = build_synonym_table(glosses, wordnet)
+        self.table   = data["table"]
+        self.glosses = frozenset(data["glosses"])
+
+    def is_current(self, vocabulary):
+        """True if the table covers every gloss in `vocabulary`."""
+        return self.glosses is not None and self.glosses.issuperset(vocabulary)
+
+    def wordnet_available(self):
+        """Make sure the WordNet corpus is available (checked once); if not, turn the live fallback off."""
+        if not self._wordnet_checked:
+            with self._lock:
+                if not self._wordnet_checked and self.use_wordnet:
+                    try:
+                        found = resources.ensure_nltk("wordnet", required=False)
+                    except Exception as e:
+                        logging.warning(f"Could not load WordNet: {e}")
+                        found = False
+                    if not found:
+                        self._disable_wordnet()
+                self._wordnet_checked = True
+        return self.use_wordnet
+
+    def _disable_wordnet(self):
+        logging.warning("WordNet unavailable; synonym expansion uses the precomputed table only")
+        self.use_wordnet = False
+
+    def lookup(self, word, vocabulary):
+        """The gloss in `vocabulary` that `word` expands to, or None."""
+        if self.use_wordnet and not self.is_current(vocabulary) and self.wordnet_available():
+            try:
+                synonyms = _live_synonyms(word)
+            except LookupError:
+                self._disable_wordnet()
+            else:
+                for syn in synonyms:
+                    if syn in vocabulary:
+                        return syn
+                return None
+        for form in base_forms(word):
+            if form in self.table:
+                for gloss in self.table[form]:
+                    if gloss in vocabulary:
+                        return gloss
+                return None
+            # Inflected form of a gloss ("walked" -> "walk"), as WordNet's morphy would resolve it
+            if form in vocabulary:
+                return form
+        return None
+
+
+@lru_cache(maxsize=65536)
+def _live_synonyms(word):
+    from nltk.corpus import wordnet
+    return tuple(wordnet_synonyms(word, wordnet))
+
+
+if __name__ == "__main__":
+    # Build the table for the current keypoint vocabulary:
+    #   python synonyms.py [keypoint_dir] [output.json]
+    from nltk.corpus import wordnet
+    from vocabulary import scan_dir, KEYPOINT_EXTENSIONS
+
+    keypoint_dir = sys.argv[1] if len(sys.argv) > 1 else "data/key"
+    output       = sys.argv[2] if len(sys.argv) > 2 else SYNONYM_TABLE
+
+    glosses = scan_dir(keypoint_dir, KEYPOINT_EXTENSIONS)
+    synonyms = SynonymTable(output)
+    synonyms.build(glosses, wordnet)
+    synonyms.save()
+    print(f"Wrote {len(synonyms.table)} lemma entries for {len(glosses)} glosses to {output}")
@@ -3,25 +3,35 @@ import sys
 import pandas as pd
 
 # Import your matching function
-from app import find_matching_keypoints
+from app import find_matching_keypoints_batch
+
+# Queries scored per find_matching_keypoints_batch call
+BATCH_SIZE = 256
+
+def test_gestures(gestures_csv: str, output_csv: str, batch_size: int = BATCH_SIZE):
+    if batch_size < 1:
+        raise ValueError("batch_size must be at least 1")
 
-def test_gestures(gestures_csv: str, output_csv: str):
     # Load the CSV of test cases
     df = pd.read_csv(gestures_csv)
 
-    records = []
-    for _, row in df.iterrows():
-        # Normalize the ground-truth name and prepare user input
-        name = str(row['name']).strip()
-        user_input = name.replace('_', ' ').lower()
+    # Normalize the ground-truth names and prepare user inputs
+    names = [str(name).strip() for name in df['name']]
+    inputs = [name.replace('_', ' ').lower() for name in names]
 
-        # Call your function
-        matches = find_matching_keypoints(user_input)
+    # Call your function, one batch of queries at a time
+    all_matches = []
+    for start in range(0, len(inputs), batch_size):
+        all_matches.extend(find_matching_keypoints_batch(inputs[start:start + batch_size]))
+
+    records = []
+    for name, user_input, matches in zip(names, inputs, all_matches):
         if matches:
             predicted, score = matches[0]
             predicted_norm = predicted.lower()
         else:
-            predicted_norm, score = None, 0.0
+            predicted = predicted_norm = None
+            score = 0.0
 
         # Compare lowercase-to-lowercase
         correct = (predicted_norm == name.lower())
@@ -44,10 +54,14 @@ def test_gestures(gestures_csv: str, output_csv: str):
     print(f"Top-1 accuracy: {acc*100:.2f}% over {len(results_df)} samples")
 
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python test.py <gestures.csv> <results.csv>")
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python test.py <gestures.csv> <results.csv> [batch_size]")
         sys.exit(1)
 
     gestures_csv = sys.argv[1]
     output_csv   = sys.argv[2]
-    test_gestures(gestures_csv, output_csv)
+    batch_size   = int(sys.argv[3]) if len(sys.argv) == 4 else BATCH_SIZE
+    if batch_size < 1:
+        print("batch_size must be at least 1")
+        sys.exit(1)
+    test_gestures(gestures_csv, output_csv, batch_size)
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """The Flask app, imported inside a scratch tree with two glosses (hello, world) and their clips."""
+    root = tmp_path_factory.mktemp("site")
+    for name in ("hello", "world"):
+        key = root / "data" / "key" / f"{name}.json"
+        key.parent.mkdir(parents=True, exist_ok=True)
+        key.write_text("[]")
+        video = root / "data" / "video" / f"{name}.mp4"
+        video.parent.mkdir(parents=True, exist_ok=True)
+        video.write_bytes(bytes(range(256)) * (4 if name == "hello" else 2))
+    cwd = os.getcwd()
+    os.environ["V2S_WARMUP"] = "0"
+    # The app's data paths are relative, so the tests run from the scratch tree
+    os.chdir(root)
+    import app
+    yield app
+    os.chdir(cwd)
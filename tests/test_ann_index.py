@@ -0,0 +1,117 @@
+import threading
+
+import numpy as np
+import pytest
+
+import ann_index
+import gloss_index
+from ann_index import FlatIndex, IVFIndex, build_ann_index
+from gloss_index import GlossIndex
+
+
+def clustered(n, dim=32, clusters=40, seed=0):
+    """Unit vectors scattered around random centres, like sentence embeddings of related glosses."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    data = centres[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    return ann_index._normalize(data).astype(np.float32)
+
+
+def recall_at_k(index, exact, queries, k):
+    found = 0
+    for (rows, _), (true_rows, _) in zip(index.search(queries, k), exact.search(queries, k)):
+        found += len(set(rows.tolist()) & set(true_rows.tolist()))
+    return found / (k * len(queries))
+
+
+def test_flat_index_is_exact():
+    data = clustered(500)
+    queries = clustered(20, seed=1)
+    for query, (rows, scores) in zip(queries, FlatIndex(data).search(queries, 5)):
+        expected = np.argsort(-(data @ query), kind="stable")[:5]
+        np.testing.assert_array_equal(rows, expected)
+        np.testing.assert_allclose(scores, data[expected] @ query, rtol=1e-6)
+        assert np.all(np.diff(scores) <= 0)
+
+
+def test_ivf_matches_flat_search():
+    data = clustered(5000)
+    queries = clustered(50, seed=1)
+    ivf = IVFIndex(data)
+    assert recall_at_k(ivf, FlatIndex(data), queries, 10) >= 0.9
+    # Probing every cell is exact
+    full = IVFIndex(data, nlist=16, nprobe=16)
+    assert recall_at_k(full, FlatIndex(data), queries, 10) == 1.0
+    for query, (rows, scores) in zip(queries, ivf.search(queries, 10)):
+        np.testing.assert_allclose(scores, data[rows] @ query, rtol=1e-5)
+        assert np.all(np.diff(scores) <= 0)
+
+
+def test_hnsw_matches_flat_search():
+    pytest.importorskip("hnswlib")
+    data = clustered(5000)
+    queries = clustered(50, seed=1)
+    assert recall_at_k(build_ann_index(data, "hnsw"), FlatIndex(data), queries, 10) >= 0.9
+
+
+def test_auto_backend_uses_flat_for_small_vocabularies():
+    assert build_ann_index(clustered(100), "auto").name == "flat"
+    with pytest.raises(ValueError):
+        build_ann_index(clustered(10), "annoy")
+
+
+class RowEncoder:
+    """Fixed vectors per gloss, so the index rows are known."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def __call__(self, texts):
+        return np.stack([self.vectors[t.replace(" ", "_")] for t in texts])
+
+
+def test_ann_is_built_outside_the_lock(tmp_path, monkeypatch):
+    data = clustered(50)
+    vectors = {f"g{i}": row for i, row in enumerate(data)}
+    index = GlossIndex(RowEncoder(vectors), str(tmp_path), ann_backend="ivf")
+    index.sync(vectors)
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_build(matrix, backend):
+        started.set()
+        release.wait(5)
+        return IVFIndex(matrix, nlist=1, nprobe=1)
+    monkeypatch.setattr(gloss_index, "build_ann_index", slow_build)
+
+    builder = threading.Thread(target=index.nearest, args=(data[:1],))
+    builder.start()
+    assert started.wait(5)
+    try:
+        # Lookups and searches carry on while the index is being built
+        np.testing.assert_array_equal(index.vectors(["g3"]), data[3:4])
+        names, fallback = index.ann()
+        assert isinstance(fallback, FlatIndex)
+        assert index.nearest(data[7:8], k=1) == [[("g7", pytest.approx(1.0))]]
+    finally:
+        release.set()
+        builder.join(5)
+    assert isinstance(index.ann()[1], IVFIndex)
+
+
+def test_ann_built_for_old_rows_is_not_installed(tmp_path, monkeypatch):
+    data = clustered(20)
+    vectors = {f"g{i}": row for i, row in enumerate(data)}
+    index = GlossIndex(RowEncoder(vectors), str(tmp_path), ann_backend="flat")
+    index.sync(list(vectors)[:10])
+
+    def build_then_change(matrix, backend):
+        index.sync(list(vectors))   # the vocabulary grows mid-build
+        return FlatIndex(matrix)
+    monkeypatch.setattr(gloss_index, "build_ann_index", build_then_change)
+    names, _ = index.ann()
+    assert len(names) == 10
+    assert index._ann is None
+
+    monkeypatch.setattr(gloss_index, "build_ann_index", build_ann_index)
+    assert len(index.ann()[0]) == 20
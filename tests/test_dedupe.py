@@ -0,0 +1,67 @@
+import numpy as np
+
+import dedupe
+from dedupe import PAA_SEGMENTS, SEQUENCE_LENGTH, dtw, envelopes, lb_keogh, paa
+
+
+def reference_dtw(x, y, radius):
+    """Textbook banded DTW, one cell at a time."""
+    n = len(x)
+    acc = np.full((n + 1, n + 1), np.inf)
+    acc[0, 0] = 0
+    for i in range(1, n + 1):
+        for j in range(max(1, i - radius), min(n, i + radius) + 1):
+            d = float(((x[i - 1] - y[j - 1]) ** 2).sum())
+            acc[i, j] = d + min(acc[i - 1, j - 1], acc[i - 1, j], acc[i, j - 1])
+    return acc[n, n]
+
+
+def library(n=24, dim=6, seed=0):
+    """Random walks, every third one a slightly perturbed copy of the one before."""
+    rng = np.random.default_rng(seed)
+    features = np.cumsum(rng.normal(0, 0.1, (n, SEQUENCE_LENGTH, dim)), axis=1)
+    for k in range(1, n, 3):
+        features[k] = features[k - 1] + rng.normal(0, 0.01, (SEQUENCE_LENGTH, dim))
+    return features.astype(np.float32)
+
+
+def test_vectorized_dtw_matches_reference():
+    features = library(6)
+    x, y = features[:3], features[3:]
+    for radius in (1, 4, SEQUENCE_LENGTH):
+        expected = [reference_dtw(a, b, radius) for a, b in zip(x, y)]
+        np.testing.assert_allclose(dtw(x, y, radius), expected, rtol=1e-4)
+
+
+def test_lower_bounds_never_exceed_dtw():
+    features = library(12, seed=1)
+    radius = 4
+    upper, lower = envelopes(features, radius)
+    segment = SEQUENCE_LENGTH // PAA_SEGMENTS
+    for i in range(len(features)):
+        exact = dtw(np.broadcast_to(features[i], features.shape), features, radius)
+        keogh = lb_keogh(features[i], upper, lower)
+        coarse = lb_keogh(paa(features[i:i + 1])[0], paa(upper, reduce=np.max), paa(lower, reduce=np.min), segment)
+        assert np.all(coarse <= keogh + 1e-4)
+        assert np.all(keogh <= exact + 1e-4)
+
+
+def test_pruned_search_finds_every_pair_under_the_limit():
+    features = library(24, seed=2)
+    n, radius = len(features), 3
+    exact_cost = np.array([dtw(np.broadcast_to(features[i], features.shape), features, radius)
+                           for i in range(n)])
+    limit = float(np.quantile(exact_cost[np.triu_indices(n, 1)], 0.1))
+
+    dedupe._init_pairs(features, radius, limit)
+    rows = dedupe._compare_rows(range(n - 1))
+    pruned = 0
+    for i, cost, exact, counts in rows:
+        truth = exact_cost[i, i + 1:]
+        # Exact where computed; elsewhere a lower bound already above the limit
+        np.testing.assert_allclose(cost[exact], truth[exact], rtol=1e-4)
+        assert np.all(cost[~exact] > limit)
+        assert np.all(cost[~exact] <= truth[~exact] * (1 + 1e-4))
+        assert np.all(exact[truth <= limit])
+        pruned += counts["paa"] + counts["keogh"]
+    assert pruned > 0
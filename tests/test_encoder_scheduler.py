@@ -0,0 +1,101 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from encoder_scheduler import BatchingEncoder
+
+
+def fake_encode(texts):
+    """One row per text: its length and first character, so rows can be traced back."""
+    return np.array([[len(t), ord(t[0])] for t in texts], dtype=np.float32)
+
+
+class GatedEncoder:
+    """Blocks the first call until released, so later submissions pile up into one batch."""
+
+    def __init__(self):
+        self.calls = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        self.started.set()
+        self.release.wait(5)
+        return fake_encode(texts)
+
+
+def test_each_caller_gets_its_own_rows():
+    encoder = BatchingEncoder(fake_encode, max_wait_ms=20)
+    try:
+        requests = [["a", "bb"], ["ccc"], ["dddd", "e", "ff"]]
+        with ThreadPoolExecutor(len(requests)) as pool:
+            results = list(pool.map(encoder.encode, requests))
+        for texts, rows in zip(requests, results):
+            np.testing.assert_array_equal(rows, fake_encode(texts))
+        assert encoder.texts == 6
+    finally:
+        encoder.close()
+
+
+def test_waiting_submissions_share_one_batch():
+    gated = GatedEncoder()
+    encoder = BatchingEncoder(gated, max_wait_ms=50)
+    try:
+        first = encoder.submit(["warm"])
+        assert gated.started.wait(5)
+        # The worker is busy: these queue up and go out together
+        futures = [encoder.submit([text]) for text in ("x", "yy", "zzz")]
+        gated.release.set()
+        first.result(5)
+        for text, future in zip(("x", "yy", "zzz"), futures):
+            np.testing.assert_array_equal(future.result(5), fake_encode([text]))
+        assert gated.calls == [["warm"], ["x", "yy", "zzz"]]
+        assert encoder.batches == 2
+    finally:
+        gated.release.set()
+        encoder.close()
+
+
+def test_batch_size_caps_a_batch():
+    gated = GatedEncoder()
+    encoder = BatchingEncoder(gated, max_batch_size=2, max_wait_ms=50)
+    try:
+        encoder.submit(["warm"])
+        assert gated.started.wait(5)
+        futures = [encoder.submit([text]) for text in ("a", "b", "c")]
+        gated.release.set()
+        for future in futures:
+            future.result(5)
+        assert gated.calls[1:] == [["a", "b"], ["c"]]
+    finally:
+        gated.release.set()
+        encoder.close()
+
+
+def test_encode_error_reaches_every_caller_and_worker_survives():
+    def failing(texts):
+        if "boom" in texts:
+            raise RuntimeError("model crashed")
+        return fake_encode(texts)
+
+    encoder = BatchingEncoder(failing, max_wait_ms=1)
+    try:
+        with pytest.raises(RuntimeError, match="model crashed"):
+            encoder.encode(["boom"])
+        np.testing.assert_array_equal(encoder.encode(["ok"]), fake_encode(["ok"]))
+    finally:
+        encoder.close()
+
+
+def test_empty_submission_and_async_encode():
+    encoder = BatchingEncoder(fake_encode, max_wait_ms=1)
+    try:
+        assert encoder.encode([]).shape == (0, 0)
+        rows = asyncio.run(encoder.aencode(["async"]))
+        np.testing.assert_array_equal(rows, fake_encode(["async"]))
+    finally:
+        encoder.close()
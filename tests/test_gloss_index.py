@@ -0,0 +1,80 @@
+import json
+import numpy as np
+
+from gloss_index import GlossIndex
+
+MINILM = {"model": "sentence-transformers/all-MiniLM-L6-v2", "backend": "torch"}
+
+
+class CountingEncoder:
+    """Deterministic unit vectors per text, recording every text it is asked to encode."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.extend(texts)
+        vectors = np.array([[len(t), sum(map(ord, t)) % 97, 1.0] for t in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_sync_saves_and_reloads(tmp_path):
+    encode = CountingEncoder()
+    index = GlossIndex(encode, str(tmp_path), encoder=MINILM)
+    assert index.sync(["world", "hello", "thank_you"])
+    assert sorted(encode.calls) == ["hello", "thank you", "world"]
+
+    reloaded = GlossIndex(CountingEncoder(), str(tmp_path), encoder=MINILM)
+    assert reloaded.load()
+    assert reloaded.names == ["hello", "thank_you", "world"]
+    np.testing.assert_array_equal(reloaded.matrix, index.matrix)
+    assert not reloaded.sync(["hello", "thank_you", "world"])
+
+
+def test_sync_encodes_only_new_glosses(tmp_path):
+    encode = CountingEncoder()
+    index = GlossIndex(encode, str(tmp_path), encoder=MINILM)
+    index.sync(["hello", "world"])
+    before = index.vectors(["hello"])
+    encode.calls.clear()
+    assert index.sync(["hello", "goodbye"])
+    assert encode.calls == ["goodbye"]
+    assert index.names == ["goodbye", "hello"]
+    np.testing.assert_array_equal(index.vectors(["hello"]), before)
+
+
+def test_index_from_another_encoder_is_stale(tmp_path):
+    GlossIndex(CountingEncoder(), str(tmp_path), encoder=MINILM).sync(["hello", "world"])
+    with open(tmp_path / "gloss_names.json") as f:
+        assert json.load(f)["encoder"] == MINILM
+
+    encode = CountingEncoder()
+    quantized = GlossIndex(encode, str(tmp_path), encoder={**MINILM, "backend": "onnx-int8"})
+    assert not quantized.load()
+    assert quantized.sync(["hello", "world"])
+    assert sorted(encode.calls) == ["hello", "world"]
+
+    # The rebuilt index now belongs to the new encoder
+    assert GlossIndex(CountingEncoder(), str(tmp_path), encoder={**MINILM, "backend": "onnx-int8"}).load()
+    assert not GlossIndex(CountingEncoder(), str(tmp_path), encoder=MINILM).load()
+
+
+def test_index_without_encoder_metadata_is_stale(tmp_path):
+    np.save(tmp_path / "gloss_embeddings.npy", np.eye(2, dtype=np.float32))
+    with open(tmp_path / "gloss_names.json", "w") as f:
+        json.dump(["hello", "world"], f)
+    assert not GlossIndex(CountingEncoder(), str(tmp_path), encoder=MINILM).load()
+
+
+def test_sync_without_save_leaves_the_directory_alone(tmp_path):
+    index = GlossIndex(CountingEncoder(), str(tmp_path / "index"), encoder=MINILM)
+    assert index.sync(["hello", "world"], save=False)
+    assert index.names == ["hello", "world"]
+    assert not (tmp_path / "index").exists()
+
+
+def test_save_leaves_no_temporary_files(tmp_path):
+    index = GlossIndex(CountingEncoder(), str(tmp_path), encoder=MINILM)
+    index.sync(["hello", "world"])
+    index.sync(["hello"])
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["gloss_embeddings.npy", "gloss_names.json"]
@@ -0,0 +1,68 @@
+import os
+import numpy as np
+
+from keypoint_store import (GROUP_NAMES, num_landmarks, open_archive, pack_archive, read_keypoints,
+                            save_keypoints)
+
+
+def write_gloss(path, frames, seed):
+    rng = np.random.default_rng(seed)
+    keypoints = rng.random((frames, num_landmarks(), 3), dtype=np.float32)
+    mask = rng.random((frames, len(GROUP_NAMES))) > 0.3
+    save_keypoints(path, keypoints, mask)
+    return keypoints, mask
+
+
+def test_pack_and_read_from_archive(tmp_path):
+    sources, expected = {}, {}
+    for i, (gloss, frames) in enumerate([("hello", 5), ("thank_you", 3), ("world", 7)]):
+        sources[gloss] = str(tmp_path / f"{gloss}.npz")
+        expected[gloss] = write_gloss(sources[gloss], frames, i)
+    archive_dir = str(tmp_path / "archive")
+    assert pack_archive(sources, archive_dir) == 15
+
+    archive = open_archive(archive_dir)
+    for gloss, (keypoints, mask) in expected.items():
+        got_keypoints, got_mask, groups = read_keypoints(gloss, sources[gloss], archive)
+        assert isinstance(got_keypoints, np.memmap)
+        assert groups == GROUP_NAMES
+        np.testing.assert_array_equal(got_keypoints, keypoints)
+        np.testing.assert_array_equal(got_mask, mask)
+
+
+def test_changed_source_falls_back_to_file(tmp_path):
+    path = str(tmp_path / "hello.npz")
+    write_gloss(path, 4, 0)
+    archive_dir = str(tmp_path / "archive")
+    pack_archive({"hello": path}, archive_dir)
+
+    keypoints, mask = write_gloss(path, 6, 1)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    got_keypoints, _, _ = read_keypoints("hello", path, open_archive(archive_dir))
+    assert not isinstance(got_keypoints, np.memmap)
+    np.testing.assert_array_equal(got_keypoints, keypoints)
+
+
+def test_no_archive(tmp_path):
+    assert open_archive(str(tmp_path / "missing")) is None
+
+
+def test_repack_keeps_the_open_archive_consistent(tmp_path):
+    path = str(tmp_path / "hello.npz")
+    first, _ = write_gloss(path, 4, 0)
+    archive_dir = str(tmp_path / "archive")
+    pack_archive({"hello": path}, archive_dir)
+    old = open_archive(archive_dir)
+
+    second, _ = write_gloss(path, 6, 1)
+    pack_archive({"hello": path}, archive_dir)
+    new = open_archive(archive_dir)
+    assert new.version != old.version
+    np.testing.assert_array_equal(old.get("hello")[0], first)
+    np.testing.assert_array_equal(new.get("hello")[0], second)
+
+    # A third pack drops the first version but keeps the one just replaced
+    pack_archive({"hello": path}, archive_dir)
+    versions = sorted(name for name in os.listdir(archive_dir) if name.startswith("pack-"))
+    assert versions == sorted([new.version, open_archive(archive_dir).version])
@@ -0,0 +1,49 @@
+import numpy as np
+
+from keypoint_store import GROUP_NAMES, num_landmarks, save_keypoints, select_groups
+from keypoint_stream import (SCALE, STREAM_GROUPS, decode_stream, delta_decode, delta_encode, encode_gloss,
+                             encode_header, gloss_record, quantize)
+
+
+def random_gloss(frames, groups, seed):
+    rng = np.random.default_rng(seed)
+    keypoints = rng.uniform(-1.5, 1.5, (frames, num_landmarks(groups), 3)).astype(np.float32)
+    mask = rng.random((frames, len(groups))) > 0.3
+    return keypoints, mask
+
+
+def test_delta_coding_is_exact_across_wraparound():
+    quantized = np.array([[32767, -32768], [-32768, 32767], [0, 0], [-1, 1]], dtype=np.int16)
+    np.testing.assert_array_equal(delta_decode(delta_encode(quantized)), quantized)
+
+
+def test_stream_round_trip():
+    glosses = [("hello", *random_gloss(5, STREAM_GROUPS, 0)),
+               ("thank_you", *random_gloss(1, STREAM_GROUPS, 1)),
+               ("ok", *random_gloss(4, STREAM_GROUPS, 2))]
+    data = encode_header(len(glosses)) + b"".join(encode_gloss(n, k, m) for n, k, m in glosses)
+
+    groups, landmarks, decoded = decode_stream(data)
+    assert groups == STREAM_GROUPS
+    np.testing.assert_array_equal(landmarks, np.arange(num_landmarks(STREAM_GROUPS)))
+    for (name, keypoints, mask), (got_name, got_keypoints, got_mask) in zip(glosses, decoded):
+        assert got_name == name
+        np.testing.assert_array_equal(got_mask, mask)
+        # Quantization is the only loss: within half a step of the original
+        np.testing.assert_allclose(got_keypoints, keypoints, atol=0.5 / SCALE + 1e-7)
+        np.testing.assert_array_equal(got_keypoints * SCALE, quantize(keypoints))
+
+
+def test_landmark_subset_and_stored_file(tmp_path):
+    keypoints, mask = random_gloss(6, GROUP_NAMES, 3)
+    path = str(tmp_path / "hello.npz")
+    save_keypoints(path, keypoints, mask)
+    groups, landmarks = ("left_hand", "right_hand"), [0, 4, 8, 21, 25]
+
+    data = encode_header(1, groups, landmarks) + gloss_record("hello", path, groups, landmarks)
+    got_groups, got_landmarks, [(name, got_keypoints, got_mask)] = decode_stream(data)
+    expected_keypoints, expected_mask = select_groups(keypoints, mask, GROUP_NAMES, groups)
+    assert got_groups == groups and name == "hello"
+    np.testing.assert_array_equal(got_landmarks, landmarks)
+    np.testing.assert_array_equal(got_mask, expected_mask)
+    np.testing.assert_allclose(got_keypoints, expected_keypoints[:, landmarks], atol=0.5 / SCALE + 1e-7)
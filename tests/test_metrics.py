@@ -0,0 +1,99 @@
+import metrics
+from metrics import Metrics
+
+
+def count(histogram, label):
+    series = histogram._series.get(label)
+    return sum(series[:-1]) if series else 0
+
+
+def draws(*values):
+    """random.random replacement returning `values`, then 0.99 (not sampled at 0.5)."""
+    values = iter(values)
+    return lambda: next(values, 0.99)
+
+
+def body(m, chunks=3):
+    for _ in range(chunks):
+        with m.span("encode"):
+            pass
+        yield b"x"
+
+
+def test_unsampled_requests_record_nothing(monkeypatch):
+    m = Metrics(sample_rate=0.5)
+    monkeypatch.setattr(metrics.random, "random", draws(0.9, 0.1, 0.1))
+    started = m.start_request()
+    with m.span("tokenize"):
+        pass
+    m.end_request("find_keypoint", started)
+    assert started is None
+    assert count(m.stages, "tokenize") == 0 and count(m.requests, "find_keypoint") == 0
+    assert (m.requests_total, m.requests_sampled) == (1, 0)
+
+
+def test_spans_follow_the_request_decision(monkeypatch):
+    m = Metrics(sample_rate=0.5)
+    monkeypatch.setattr(metrics.random, "random", draws(0.1))
+    started = m.start_request()
+    # Later draws would not sample, but the request already was
+    for _ in range(3):
+        with m.span("score"):
+            pass
+    m.end_request("find_keypoint", started)
+    assert count(m.stages, "score") == 3 and count(m.requests, "find_keypoint") == 1
+
+
+def test_stream_keeps_the_sampling_of_its_request(monkeypatch):
+    m = Metrics(sample_rate=0.5)
+    monkeypatch.setattr(metrics.random, "random", draws(0.1))
+    started = m.start_request()
+    stream = m.stream(body(m), "find_keypoint_stream", started)
+    m.end_request("find_keypoint_stream", None)
+
+    assert count(m.requests, "find_keypoint_stream") == 0   # not until the stream closes
+    assert list(stream) == [b"x"] * 3
+    assert count(m.stages, "encode") == 3
+    assert count(m.requests, "find_keypoint_stream") == 1
+    assert metrics._sampled.get() is None
+
+
+def test_stream_of_unsampled_request_stays_unsampled(monkeypatch):
+    m = Metrics(sample_rate=0.5)
+    monkeypatch.setattr(metrics.random, "random", draws(0.9, 0.1, 0.1, 0.1))
+    started = m.start_request()
+    stream = m.stream(body(m), "find_keypoint_stream", started)
+    m.end_request("find_keypoint_stream", None)
+    assert list(stream) == [b"x"] * 3
+    assert count(m.stages, "encode") == 0
+
+
+def test_closing_a_stream_early_records_the_request_and_closes_the_body():
+    m = Metrics(sample_rate=1.0)
+    closed = []
+
+    def events():
+        try:
+            while True:
+                yield b"event"
+        finally:
+            closed.append(True)
+
+    stream = m.stream(events(), "transcript_events", m.start_request())
+    m.end_request("transcript_events", None)
+    assert next(stream) == b"event"
+    stream.close()
+    assert closed == [True]
+    assert count(m.requests, "transcript_events") == 1
+
+
+def test_streamed_route_is_timed_to_the_end(app_module, monkeypatch):
+    m = Metrics(sample_rate=1.0)
+    monkeypatch.setattr(app_module, "metrics", m)
+    client = app_module.app.test_client()
+    response = client.get("/keypoints/stream?g=hello&g=world", buffered=False)
+    assert count(m.requests, "keypoint_stream") == 0
+    response.get_data()
+    response.close()
+    assert count(m.stages, "keypoint_encode") == 2
+    assert count(m.requests, "keypoint_stream") == 1
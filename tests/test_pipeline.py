@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import types
+
+import pandas as pd
+import pytest
+
+# extractkeypoints imports OpenCV and MediaPipe at module level
+pytest.importorskip("cv2")
+pytest.importorskip("mediapipe")
+
+WIDTH, HEIGHT, FRAMES = 8, 6, 12
+
+# Stand-ins for the ffmpeg binaries: ffprobe reports one WIDTHxHEIGHT video stream, and
+# ffmpeg logs its arguments, writes the MP4 output and pipes FRAMES frames whose first
+# byte is the frame number. Sources with "broken" in their name fail.
+FFPROBE = f"""#!{sys.executable}
+import json
+print(json.dumps({{"streams": [{{"codec_type": "video", "width": {WIDTH}, "height": {HEIGHT}}}]}}))
+"""
+FFMPEG = f"""#!{sys.executable}
+import os, sys
+args = sys.argv[1:]
+with open(os.environ["FFMPEG_LOG"], "a") as log:
+    log.write(" ".join(args) + "\\n")
+if os.environ.get("FFMPEG_CHATTY"):
+    sys.stderr.write("x" * 200000)
+src = args[args.index("-i") + 1]
+if "broken" in src:
+    sys.stderr.write("bad source\\n")
+    sys.exit(1)
+with open(args[args.index("mp4") + 1], "w") as f:
+    f.write("clip of " + src)
+for i in range({FRAMES}):
+    sys.stdout.buffer.write(bytes([i]) * ({WIDTH} * {HEIGHT} * 3))
+"""
+
+
+class FakeHolistic:
+    """Reports one pose landmark per frame at x = the frame's first byte."""
+
+    instances = 0
+
+    def __init__(self):
+        FakeHolistic.instances += 1
+        self.frames = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def process(self, frame):
+        self.frames += 1
+        point = types.SimpleNamespace(x=float(frame[0, 0, 0]), y=float(self.frames), z=0.0)
+        return types.SimpleNamespace(pose_landmarks=types.SimpleNamespace(landmark=[point] * 33),
+                                     left_hand_landmarks=None, right_hand_landmarks=None, face_landmarks=None)
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, script in (("ffmpeg", FFMPEG), ("ffprobe", FFPROBE)):
+        path = bin_dir / name
+        path.write_text(script)
+        path.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("FFMPEG_LOG", str(tmp_path / "ffmpeg.log"))
+    # The pipeline's data paths are relative
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data/key")
+    src = tmp_path / "src"
+    src.mkdir()
+    for video_id in ("aaaaaaaaaaa", "bbbbbbbbbbb", "broken00000"):
+        (src / f"{video_id}.mp4").write_text("source")
+
+    import extractkeypoints as ek
+    import pipeline
+    FakeHolistic.instances = 0
+    monkeypatch.setattr(ek, "new_holistic", FakeHolistic)
+    return types.SimpleNamespace(pipeline=pipeline, ek=ek, src=str(src), log=tmp_path / "ffmpeg.log")
+
+
+def links(*rows):
+    return pd.DataFrame(rows, columns=["name", "id", "start_time", "duration_time"])
+
+
+def test_clips_are_cut_and_extracted_in_one_pass(site):
+    failed = site.pipeline.run_pipeline(
+        links(("hello", "aaaaaaaaaaa", "00:00:01", "00:00:02"), ("world", "aaaaaaaaaaa", "00:00:03", "00:00:02"),
+              ("thanks", "bbbbbbbbbbb", "", "")),
+        source_dir=site.src, folder="data/video", workers=2)
+    assert failed == 0
+    assert sorted(os.listdir("data/video")) == ["hello.mp4", "thanks.mp4", "world.mp4"]
+
+    with open("data/key/hello.json") as f:
+        frames = json.load(f)
+    # Every decoded frame, in order, each through a fresh Holistic per clip
+    assert [frame["pose"][0][0] for frame in frames] == list(range(FRAMES))
+    assert [frame["pose"][0][1] for frame in frames] == list(range(1, FRAMES + 1))
+    assert FakeHolistic.instances == 3
+
+    manifest = site.ek.load_manifest()
+    assert sorted(manifest) == ["hello.mp4", "thanks.mp4", "world.mp4"]
+
+    commands = site.log.read_text().splitlines()
+    hello = next(c for c in commands if "hello.mp4" in c)
+    # Seek before the input, and re-encode the MP4 so it starts where the frames do
+    assert hello.startswith("-hide_banner -loglevel error -y -ss 00:00:01 -i")
+    assert "-c:v libx264" in hello and "-c copy" not in hello
+    thanks = next(c for c in commands if "thanks.mp4" in c)
+    assert "-ss" not in thanks and "-to" not in thanks
+
+
+def test_failures_are_counted_and_do_not_stall(site, monkeypatch):
+    monkeypatch.setenv("FFMPEG_CHATTY", "1")
+    failed = site.pipeline.run_pipeline(
+        links(("hello", "aaaaaaaaaaa", "00:00:01", "00:00:02"), ("bad", "broken00000", "00:00:01", "00:00:02"),
+              ("gone", "ccccccccccc", "00:00:01", "00:00:02")),
+        source_dir=site.src, folder="data/video", workers=2)
+    assert failed == 2
+    assert os.listdir("data/video") == ["hello.mp4"]
+    assert sorted(site.ek.load_manifest()) == ["hello.mp4"]
+
+
+def test_unusable_holistic_fails_every_clip(site, monkeypatch):
+    def broken():
+        raise RuntimeError("no GPU delegate")
+    monkeypatch.setattr(site.ek, "new_holistic", broken)
+    failed = site.pipeline.run_pipeline(
+        links(("hello", "aaaaaaaaaaa", "00:00:01", "00:00:02"), ("thanks", "bbbbbbbbbbb", "", "")),
+        source_dir=site.src, folder="data/video", workers=2)
+    assert failed == 2
+    assert site.ek.load_manifest() == {}
+
+
+def test_existing_clips_are_skipped(site):
+    os.makedirs("data/video")
+    with open("data/video/hello.mp4", "w") as f:
+        f.write("already cut")
+    assert site.pipeline.run_pipeline(links(("hello", "aaaaaaaaaaa", "00:00:01", "00:00:02")),
+                                      source_dir=site.src, folder="data/video") == 0
+    assert not site.log.exists()
@@ -0,0 +1,67 @@
+import result_cache
+from result_cache import LocalSharedBackend, RedisBackend, ResultCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_local_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    cache = ResultCache(maxsize=8, ttl=60)
+    cache.set("fp:hello", [["hello", 1.0]])
+    clock.now += 59
+    assert cache.get("fp:hello") == [["hello", 1.0]]
+    clock.now += 2
+    assert cache.get("fp:hello") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_shared_hit_keeps_the_remaining_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    backend = LocalSharedBackend()
+    ResultCache(maxsize=8, ttl=60, backend=backend).set("fp:hello", [["hello", 1.0]])
+
+    clock.now += 50
+    other_worker = ResultCache(maxsize=8, ttl=60, backend=backend)
+    assert other_worker.get("fp:hello") == [["hello", 1.0]]
+    assert other_worker.stats()["shared_hits"] == 1
+
+    # Served locally until the shared entry would have expired, not for a fresh 60 seconds
+    clock.now += 9
+    assert other_worker.get("fp:hello") == [["hello", 1.0]]
+    assert other_worker.stats()["hits"] == 1
+    clock.now += 2
+    assert other_worker.get("fp:hello") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_redis_ttl_is_set_in_milliseconds():
+    class FakeRedis:
+        def set(self, key, value, px=None):
+            self.px = px
+
+    backend = RedisBackend.__new__(RedisBackend)   # skip connecting
+    backend.client = FakeRedis()
+    backend.set("fp:hello", "[]", ttl=0.25)
+    assert backend.client.px == 250
+    backend.set("fp:hello", "[]", ttl=0.0001)
+    assert backend.client.px == 1
+    backend.set("fp:hello", "[]")
+    assert backend.client.px is None
@@ -0,0 +1,122 @@
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import sentence_video
+from sentence_video import SentenceVideoCache, concat_videos
+
+H264 = ((("codec_name", "h264"), ("codec_type", "video"), ("height", 480), ("width", 640)),)
+VP9  = ((("codec_name", "vp9"), ("codec_type", "video"), ("height", 721), ("width", 1281)),)
+
+
+class FakeFFmpeg:
+    """Stands in for subprocess.run: records each command and writes its output file."""
+
+    def __init__(self, fail=False, delay=None):
+        self.commands = []
+        self.fail = fail
+        self.delay = delay
+
+    def __call__(self, cmd, check=False, **kwargs):
+        self.commands.append(cmd)
+        if self.delay:
+            self.delay.wait(5)
+        with open(cmd[-1], "wb") as f:
+            f.write(b"partial" if self.fail else b"mp4:" + " ".join(cmd).encode())
+        if self.fail:
+            raise subprocess.CalledProcessError(1, cmd)
+        return subprocess.CompletedProcess(cmd, 0)
+
+
+@pytest.fixture
+def clips(tmp_path, monkeypatch):
+    video_dir = tmp_path / "video"
+    video_dir.mkdir()
+    for name in ("hello", "thank_you", "world"):
+        (video_dir / f"{name}.mp4").write_bytes(name.encode() * 10)
+    params = {"hello.mp4": H264, "thank_you.mp4": H264, "world.mp4": VP9}
+    monkeypatch.setattr(sentence_video, "probe", lambda path: params[os.path.basename(path)])
+    return video_dir
+
+
+def test_matching_clips_are_stream_copied(clips, tmp_path, monkeypatch):
+    ffmpeg = FakeFFmpeg()
+    monkeypatch.setattr(sentence_video.subprocess, "run", ffmpeg)
+    out = str(tmp_path / "out.mp4")
+    assert concat_videos([str(clips / "hello.mp4"), str(clips / "thank_you.mp4")], out) is True
+    (cmd,) = ffmpeg.commands
+    assert cmd[cmd.index("-c") + 1] == "copy"
+    assert os.path.exists(out) and not os.path.exists(out + ".part")
+
+
+def test_mismatched_clips_are_reencoded_to_the_first_clip_size(clips, tmp_path, monkeypatch):
+    ffmpeg = FakeFFmpeg()
+    monkeypatch.setattr(sentence_video.subprocess, "run", ffmpeg)
+    out = str(tmp_path / "out.mp4")
+    assert concat_videos([str(clips / "world.mp4"), str(clips / "hello.mp4")], out) is False
+    (cmd,) = ffmpeg.commands
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert "scale=1280:720" in graph and "concat=n=2" in graph
+    assert "libx264" in cmd
+
+
+@pytest.mark.parametrize("names", [("hello", "thank_you"), ("world", "hello")])
+def test_failed_assembly_leaves_no_partial_file(clips, tmp_path, monkeypatch, names):
+    monkeypatch.setattr(sentence_video.subprocess, "run", FakeFFmpeg(fail=True))
+    out = str(tmp_path / "out.mp4")
+    with pytest.raises(subprocess.CalledProcessError):
+        concat_videos([str(clips / f"{name}.mp4") for name in names], out)
+    assert os.listdir(tmp_path) == ["video"]
+
+
+def test_sequence_is_assembled_once_and_then_served_from_cache(clips, tmp_path, monkeypatch):
+    ffmpeg = FakeFFmpeg()
+    monkeypatch.setattr(sentence_video.subprocess, "run", ffmpeg)
+    cache = SentenceVideoCache(str(clips), str(tmp_path / "cache"))
+    sequence = ["hello.mp4", "thank_you.mp4"]
+
+    fname, f = cache.open(sequence)
+    f.close()
+    again, f = cache.open(sequence)
+    f.close()
+    assert again == fname and len(ffmpeg.commands) == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # Order matters, and a re-cut clip gives a new entry
+    assert cache.key(sequence[::-1]) != cache.key(sequence)
+    (clips / "hello.mp4").write_bytes(b"re-cut")
+    assert cache.key(sequence) != fname[:-4]
+
+
+def test_concurrent_requests_share_one_build(clips, tmp_path, monkeypatch):
+    release = threading.Event()
+    ffmpeg = FakeFFmpeg(delay=release)
+    monkeypatch.setattr(sentence_video.subprocess, "run", ffmpeg)
+    cache = SentenceVideoCache(str(clips), str(tmp_path / "cache"))
+
+    def fetch(_):
+        fname, f = cache.open(["hello.mp4", "thank_you.mp4"])
+        f.close()
+        return fname
+
+    with ThreadPoolExecutor(4) as pool:
+        results = [pool.submit(fetch, i) for i in range(4)]
+        release.set()
+        names = {future.result(5) for future in results}
+    assert len(names) == 1 and len(ffmpeg.commands) == 1
+    assert cache.stats()["misses"] == 1 and cache.stats()["hits"] == 3
+
+
+def test_least_recently_used_entries_are_evicted(clips, tmp_path, monkeypatch):
+    monkeypatch.setattr(sentence_video.subprocess, "run", FakeFFmpeg())
+    cache = SentenceVideoCache(str(clips), str(tmp_path / "cache"), max_bytes=1)
+    first, f = cache.open(["hello.mp4", "thank_you.mp4"])
+    f.close()
+    second, f = cache.open(["thank_you.mp4", "hello.mp4"])
+    # The entry just built is kept even though it alone exceeds the budget
+    assert os.listdir(cache.cache_dir) == [second]
+    assert f.read().startswith(b"mp4:")
+    f.close()
@@ -0,0 +1,92 @@
+import resources
+import synonyms
+from synonyms import SynonymTable, build_synonym_table
+
+
+class _Lemma:
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+
+class _Synset:
+    def __init__(self, *lemmas):
+        self._lemmas = [_Lemma(l) for l in lemmas]
+
+    def lemmas(self):
+        return self._lemmas
+
+
+class StubWordNet:
+    """Tiny WordNet: lemma -> synsets, with a morphy-like fallback for inflections."""
+
+    SYNSETS = {
+        "walk": [_Synset("walk", "stroll")],
+        "stroll": [_Synset("walk", "stroll")],
+        "book": [_Synset("book", "volume")],
+        "volume": [_Synset("book", "volume"), _Synset("volume", "loudness")],
+        "news": [_Synset("news", "tidings")],
+        "tidings": [_Synset("news", "tidings")],
+        "new": [_Synset("new", "fresh")],
+        "fresh": [_Synset("new", "fresh")],
+    }
+    INFLECTIONS = {"walked": "walk", "walks": "walk", "books": "book", "strolled": "stroll"}
+
+    def all_lemma_names(self):
+        return list(self.SYNSETS)
+
+    def synsets(self, word):
+        return self.SYNSETS.get(word) or self.SYNSETS.get(self.INFLECTIONS.get(word), [])
+
+
+def table_for(glosses):
+    table = SynonymTable(path="unused.json", use_wordnet=False)
+    table.build(glosses, StubWordNet())
+    return table
+
+
+def test_synonym_maps_to_gloss():
+    table = table_for(["walk", "book"])
+    assert table.lookup("stroll", {"walk", "book"}) == "walk"
+    assert table.lookup("volume", {"walk", "book"}) == "book"
+
+
+def test_inflected_gloss_resolves_to_base_form():
+    glosses = {"walk", "book"}
+    table = table_for(glosses)
+    assert table.lookup("walked", glosses) == "walk"
+    assert table.lookup("walks", glosses) == "walk"
+    assert table.lookup("books", glosses) == "book"
+    assert table.lookup("strolled", glosses) == "walk"
+
+
+def test_suffix_stripping_does_not_land_on_unrelated_gloss():
+    # "news" is a lemma of its own; stripping "s" must not turn it into the gloss "new"
+    glosses = {"new"}
+    data = build_synonym_table(glosses, StubWordNet())
+    assert data["table"]["news"] == []
+    assert table_for(glosses).lookup("news", glosses) is None
+
+
+def test_unknown_word():
+    assert table_for(["walk"]).lookup("xyzzy", {"walk"}) is None
+
+
+def test_stale_table_without_wordnet_falls_back_to_table(monkeypatch):
+    table = SynonymTable(path="unused.json", use_wordnet=True)
+    table.build(["walk"], StubWordNet())
+    checks = []
+    monkeypatch.setattr(resources, "ensure_nltk", lambda name, required=True: checks.append(name) or False)
+
+    def missing(word):
+        raise LookupError("wordnet")
+    monkeypatch.setattr(synonyms, "_live_synonyms", missing)
+
+    # "book" is new to the vocabulary, so the table is stale and the live fallback would run
+    vocabulary = {"walk", "book"}
+    assert table.lookup("stroll", vocabulary) == "walk"
+    assert table.lookup("xyzzy", vocabulary) is None
+    assert checks == ["wordnet"]
+    assert not table.use_wordnet
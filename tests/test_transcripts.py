@@ -0,0 +1,83 @@
+from transcripts import SessionStore, TranscriptSession
+
+
+def test_store_drops_least_recently_used_sessions():
+    store = SessionStore(ttl=300, max_sessions=2)
+    a = store.get("a")
+    store.get("b")
+    assert store.get("a") is a
+    store.get("c")
+    assert len(store) == 2
+    assert store.get("a") is a
+    assert store.get("b") is not None and len(store) == 2   # "b" was evicted and is new again
+
+
+def test_store_expires_idle_sessions():
+    store = SessionStore(ttl=0)
+    first = store.get("a")
+    first.touched -= 1
+    assert store.get("a") is not first
+
+
+def test_revised_words_retract_their_matches():
+    session = TranscriptSession("s")
+    assert session.settle(["good", "morning", "every"], final=False) == []
+    session.advance(2, [{"start": 0, "end": 2, "keypoint": "good_morning"}])
+    assert session.pending() == ([], 2)
+
+    retracted = session.settle(["good", "evening", "all", "of"], final=False)
+    assert [m["keypoint"] for m in retracted] == ["good_morning"]
+    assert session.pending() == (["good", "evening", "all"], 0)
+
+
+def test_out_of_order_transcripts_are_dropped():
+    session = TranscriptSession("s")
+    assert session.accept(1) and session.accept(3)
+    assert not session.accept(2) and not session.accept(3)
+    session.reset()
+    # A late interim from the finished utterance must not start a new one
+    assert not session.accept(2)
+    assert session.accept(4) and session.accept(None)
+
+
+def test_open_stream_keeps_the_session():
+    store = SessionStore(ttl=0)
+    session = store.get("a")
+    stream = session.stream(heartbeat=0.01)
+    assert next(stream) == ": keepalive\n\n"
+    session.touched -= 1
+    assert store.get("a") is session
+    stream.close()
+    assert session.streams == 0
+    session.touched -= 1
+    assert store.get("a") is not session
+
+
+def test_dropped_session_ends_its_stream():
+    store = SessionStore(ttl=300, max_sessions=1)
+    a = store.get("a")
+    stream = a.stream(heartbeat=0.01)
+    next(stream)
+    b = store.get("b")   # over the cap, and only "a" can go
+    assert a.closed and not b.closed and len(store) == 1
+    frames = list(stream)
+    assert frames[-1].startswith("event: expired\n")
+    assert a.streams == 0
+
+
+def test_sessions_without_streams_are_evicted_first():
+    store = SessionStore(ttl=300, max_sessions=2)
+    a = store.get("a")
+    stream = a.stream(heartbeat=0.01)
+    next(stream)
+    b = store.get("b")
+    store.get("c")
+    assert store.get("a") is a and not a.closed
+    assert b.closed
+    stream.close()
+
+
+def test_transcript_seq_must_be_an_integer(app_module):
+    client = app_module.app.test_client()
+    response = client.post("/transcript/s", json={"text": "hello", "final": False, "seq": "1"})
+    assert response.status_code == 400
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+
+import sentence_video
+from video_transcode import content_etag
+from test_sentence_video import H264, FakeFFmpeg
+
+CLIP = bytes(range(256)) * 4   # data/video/hello.mp4 in the app fixture
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+def test_clip_has_a_strong_content_etag_and_byte_ranges(client, app_module):
+    response = client.get("/video/hello.mp4")
+    assert response.status_code == 200
+    assert response.data == CLIP
+    etag = content_etag("data/video/hello.mp4")
+    assert response.headers["ETag"] == f'"{etag}"'
+    assert response.headers["Accept-Ranges"] == "bytes"
+    assert response.cache_control.max_age == app_module.VIDEO_MAX_AGE
+    assert not response.cache_control.immutable
+
+    partial = client.get("/video/hello.mp4", headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.headers["Content-Range"] == f"bytes 10-19/{len(CLIP)}"
+    assert partial.data == CLIP[10:20]
+
+
+def test_conditional_requests(client):
+    etag = content_etag("data/video/hello.mp4")
+    assert client.get("/video/hello.mp4", headers={"If-None-Match": f'"{etag}"'}).status_code == 304
+    assert client.get("/video/hello.mp4", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+    # A range against an outdated copy gets the whole current file instead
+    stale = client.get("/video/hello.mp4", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200 and stale.data == CLIP
+    fresh = client.get("/video/hello.mp4", headers={"Range": "bytes=0-9", "If-Range": f'"{etag}"'})
+    assert fresh.status_code == 206 and fresh.data == CLIP[:10]
+
+
+def test_versioned_url_is_immutable(client, app_module):
+    with app_module.app.test_request_context():
+        url = app_module.video_url("hello.mp4")
+    assert url.endswith("?v=" + content_etag("data/video/hello.mp4"))
+    response = client.get(url)
+    assert response.cache_control.immutable
+    assert response.cache_control.max_age == app_module.IMMUTABLE_MAX_AGE
+    # An outdated version is served, but not promised to stay the same
+    assert not client.get("/video/hello.mp4?v=old").cache_control.immutable
+
+
+def test_transcoded_copy_is_preferred(client, app_module):
+    copy = os.path.join(app_module.DELIVERY_VIDEO_DIR, "world.mp4")
+    os.makedirs(app_module.DELIVERY_VIDEO_DIR, exist_ok=True)
+    with open(copy, "wb") as f:
+        f.write(b"faststart copy")
+    try:
+        response = client.get("/video/world.mp4")
+        assert response.data == b"faststart copy"
+        assert response.headers["ETag"] == f'"{content_etag(copy)}"'
+    finally:
+        os.remove(copy)
+
+
+def test_unknown_or_escaping_paths_are_404(client):
+    assert client.get("/video/missing.mp4").status_code == 404
+    assert client.get("/video/..%2Fkey%2Fhello.json").status_code == 404
+
+
+def test_sentence_video_ranges_and_etag(client, app_module, monkeypatch):
+    monkeypatch.setattr(sentence_video, "probe", lambda path: H264)
+    ffmpeg = FakeFFmpeg()
+    monkeypatch.setattr(sentence_video.subprocess, "run", ffmpeg)
+
+    response = client.get("/sentence-video?g=hello&g=world")
+    assert response.status_code == 200
+    body, etag = response.data, response.headers["ETag"]
+    assert response.cache_control.public
+    assert client.get("/sentence-video?g=hello&g=world", headers={"If-None-Match": etag}).status_code == 304
+    partial = client.get("/sentence-video?g=hello&g=world", headers={"Range": "bytes=0-3"})
+    assert partial.status_code == 206 and partial.data == body[:4]
+    assert len(ffmpeg.commands) == 1
+
+    # One clip needs no assembly; too many glosses are refused
+    assert client.get("/sentence-video?g=hello").status_code == 302
+    too_many = "&".join(["g=hello"] * (app_module.MAX_SENTENCE_CLIPS + 1))
+    assert client.get("/sentence-video?" + too_many).status_code == 400
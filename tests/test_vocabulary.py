@@ -0,0 +1,120 @@
+import threading
+
+from vocabulary import PhraseTrie, Vocabulary
+
+
+def test_segment_prefers_the_longest_phrase():
+    trie = PhraseTrie(["good_morning", "good_morning_everyone", "how_are_you", "thank_you"])
+    tokens = "good morning everyone how are you doing thank you".split()
+    assert trie.segment(tokens) == [
+        (0, 3, "good_morning_everyone"),
+        (3, 6, "how_are_you"),
+        (6, 7, None),
+        (7, 9, "thank_you"),
+    ]
+
+
+def test_segment_falls_back_to_a_shorter_phrase_and_single_tokens():
+    trie = PhraseTrie(["good_morning", "good_morning_everyone"])
+    assert trie.segment("good morning all".split()) == [(0, 2, "good_morning"), (2, 3, None)]
+    # A prefix of a phrase that never completes is matched word by word
+    assert trie.segment("good evening".split()) == [(0, 1, None), (1, 2, None)]
+    assert trie.segment([]) == []
+
+
+def test_interim_segmentation_holds_back_a_phrase_that_may_still_grow():
+    trie = PhraseTrie(["good_morning", "good_morning_everyone", "thank_you"])
+    assert trie.segment("hello good".split(), final=False) == [(0, 1, None)]
+    assert trie.segment("hello good morning".split(), final=False) == [(0, 1, None)]
+    assert trie.segment("hello good morning".split(), final=True) == [(0, 1, None), (1, 3, "good_morning")]
+    # Nothing can extend these, so they settle before the transcript is final
+    assert trie.segment("good morning everyone thank you".split(), final=False) == [
+        (0, 3, "good_morning_everyone"), (3, 5, "thank_you")]
+
+
+def test_snapshot_phrases_match_the_keypoints(tmp_path):
+    keypoint_dir, video_dir = tmp_path / "key", tmp_path / "video"
+    keypoint_dir.mkdir()
+    video_dir.mkdir()
+    for gloss in ("hello", "thank_you"):
+        (keypoint_dir / f"{gloss}.npz").write_bytes(b"")
+    vocabulary = Vocabulary(str(keypoint_dir), str(video_dir))
+    before = vocabulary.snapshot
+
+    (keypoint_dir / "good_morning.npz").write_bytes(b"")
+    assert vocabulary.refresh(force=True)
+    after = vocabulary.snapshot
+    assert after.version == before.version + 1
+    assert after.fingerprint != before.fingerprint
+    assert sorted(after.keypoints) == ["good_morning", "hello", "thank_you"]
+    assert after.phrases.segment(["good", "morning"]) == [(0, 2, "good_morning")]
+    # The earlier snapshot is unchanged
+    assert sorted(before.keypoints) == ["hello", "thank_you"]
+    assert before.phrases.segment(["good", "morning"]) == [(0, 1, None), (1, 2, None)]
+
+
+def make_dirs(tmp_path, keypoints=(), videos=()):
+    keypoint_dir, video_dir = tmp_path / "key", tmp_path / "video"
+    keypoint_dir.mkdir()
+    video_dir.mkdir()
+    for fname in keypoints:
+        (keypoint_dir / fname).write_bytes(b"")
+    for fname in videos:
+        (video_dir / fname).write_bytes(b"")
+    return keypoint_dir, video_dir
+
+
+def test_scan_prefers_binary_keypoints(tmp_path):
+    keypoint_dir, video_dir = make_dirs(tmp_path, ["hello.json", "hello.npz", "world.json", "notes.txt"],
+                                        ["hello.mp4"])
+    vocabulary = Vocabulary(str(keypoint_dir), str(video_dir))
+    assert vocabulary.keypoints == {"hello": str(keypoint_dir / "hello.npz"),
+                                    "world": str(keypoint_dir / "world.json")}
+    assert vocabulary.video_file("hello") == "hello.mp4" and vocabulary.video_file("world") is None
+    assert not vocabulary.refresh()
+
+
+def test_polling_watcher_publishes_changes(tmp_path):
+    keypoint_dir, video_dir = make_dirs(tmp_path, ["hello.npz"])
+    vocabulary = Vocabulary(str(keypoint_dir), str(video_dir), poll_interval=0.01)
+    changed = threading.Event()
+    vocabulary.on_change(lambda vocab: changed.set())
+    vocabulary._watcher = threading.Thread(target=vocabulary._watch_poll, daemon=True)
+    vocabulary._watcher.start()
+    try:
+        (keypoint_dir / "thank_you.npz").write_bytes(b"")
+        assert changed.wait(5)
+        assert "thank_you" in vocabulary
+    finally:
+        vocabulary.stop_watching()
+    assert vocabulary._watcher is None
+
+
+class Event:
+    def __init__(self, wd, mask, name):
+        self.wd, self.mask, self.name = wd, mask, name
+
+
+class Flags:
+    CREATE, DELETE, MOVED_TO, MOVED_FROM, CLOSE_WRITE = 1, 2, 4, 8, 16
+
+
+def test_inotify_events_update_the_maps(tmp_path):
+    keypoint_dir, video_dir = make_dirs(tmp_path, ["hello.npz", "hello.json"])
+    vocabulary = Vocabulary(str(keypoint_dir), str(video_dir))
+    notified = []
+    vocabulary.on_change(lambda vocab: notified.append(vocab.version))
+    watches = {1: "keypoints", 2: "videos"}
+
+    (video_dir / "hello.mp4").write_bytes(b"")
+    vocabulary._apply_events(watches, [Event(2, Flags.CLOSE_WRITE, "hello.mp4"),
+                                       Event(1, Flags.CREATE, "ignored.txt")], Flags)
+    assert vocabulary.video_file("hello") == "hello.mp4" and len(notified) == 1
+
+    # Deleting the preferred file falls back to the one that is left
+    (keypoint_dir / "hello.npz").unlink()
+    vocabulary._apply_events(watches, [Event(1, Flags.DELETE, "hello.npz")], Flags)
+    assert vocabulary.keypoints["hello"] == str(keypoint_dir / "hello.json")
+    (keypoint_dir / "hello.json").unlink()
+    vocabulary._apply_events(watches, [Event(1, Flags.DELETE, "hello.json")], Flags)
+    assert "hello" not in vocabulary and len(notified) == 3
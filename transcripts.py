@@ -0,0 +1,165 @@
+import json
+import time
+import queue
+import threading
+from collections import OrderedDict
+
+SESSION_TTL       = 300.0   # seconds an idle transcript session is kept
+MAX_SESSIONS      = 1024    # sessions kept at once; the least recently used go first
+HEARTBEAT_SECONDS = 15.0    # SSE comment sent on idle streams to keep proxies from closing them
+
+
+def common_prefix(a, b):
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class TranscriptSession:
+    """
+    Matching state for one live voice transcript.
+
+    Interim transcripts arrive repeatedly, each a revision of the whole
+    utterance so far. Only settled tokens are matched: every token but the
+    last of an interim transcript (the recogniser may still change it), and
+    all tokens of the final one. `processed` counts the settled tokens
+    already turned into matches, so each update only matches the appended
+    suffix. If the recogniser revises words that were already matched, the
+    affected matches are retracted and that part is matched again.
+
+    Transcripts may carry a sequence number that increases with every
+    update the client sends; `accept` drops any that arrive out of order, so
+    a late interim cannot reopen an utterance after its final transcript.
+
+    Events for the client are queued and read by `stream()` as
+    Server-Sent Events.
+    """
+
+    def __init__(self, session_id):
+        self.id         = session_id
+        self.tokens     = []   # settled tokens of the current utterance
+        self.processed  = 0    # tokens[:processed] have been matched
+        self.matches    = []   # {"start", "end", "keypoint", "score", ...} in sentence order
+        self.seq        = None # sequence number of the latest transcript taken
+        self.streams    = 0    # open event streams
+        self.closed     = False
+        self.lock       = threading.Lock()
+        self._streams_lock = threading.Lock()
+        self.touched    = time.monotonic()
+        self._events    = queue.Queue()
+
+    def accept(self, seq):
+        """True if the transcript numbered `seq` is newer than any taken so far (None: not numbered)."""
+        if seq is None:
+            return True
+        if self.seq is not None and seq <= self.seq:
+            return False
+        self.seq = seq
+        return True
+
+    def settle(self, tokens, final):
+        """
+        Take the latest transcript's tokens. Returns the matches retracted
+        because the words they came from changed.
+        """
+        self.touched = time.monotonic()
+        settled = list(tokens if final else tokens[:-1])
+        common = common_prefix(self.tokens, settled)
+        retracted = []
+        if common < self.processed:
+            keep = [m for m in self.matches if m["end"] <= common]
+            retracted = self.matches[len(keep):]
+            self.matches = keep
+            self.processed = min([common] + [m["start"] for m in retracted])
+        self.tokens = settled
+        return retracted
+
+    def pending(self):
+        """Settled tokens not matched yet, and the index of the first one."""
+        return self.tokens[self.processed:], self.processed
+
+    def advance(self, consumed, matches):
+        self.processed += consumed
+        self.matches.extend(matches)
+
+    def reset(self):
+        """Start a new utterance (sequence numbers carry on across utterances)."""
+        self.tokens, self.processed, self.matches = [], 0, []
+
+    def push(self, event, data):
+        self._events.put((event, data))
+
+    def close(self):
+        """End this session's event streams with an "expired" event (it was dropped from its store)."""
+        with self._streams_lock:
+            self.closed = True
+            for _ in range(max(1, self.streams)):
+                self._events.put(None)
+
+    def stream(self, heartbeat=HEARTBEAT_SECONDS):
+        """
+        Generator of SSE frames for this session's events. Runs until the
+        client disconnects or the session is closed.
+        """
+        with self._streams_lock:
+            self.streams += 1
+        try:
+            while not self.closed:
+                try:
+                    item = self._events.get(timeout=heartbeat)
+                except queue.Empty:
+                    self.touched = time.monotonic()
+                    yield ": keepalive\n\n"
+                    continue
+                if item is None:
+                    break
+                self.touched = time.monotonic()
+                event, data = item
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+            # The client opens a new stream, which gets a new session
+            yield f"event: expired\ndata: {json.dumps({'session': self.id})}\n\n"
+        finally:
+            with self._streams_lock:
+                self.streams -= 1
+
+
+class SessionStore:
+    """
+    Transcript sessions by client-chosen id. Idle sessions expire after `ttl`
+    seconds, and beyond `max_sessions` the least recently used one is dropped.
+    Sessions with an open event stream never expire and are dropped last;
+    a dropped session's streams are ended, never left listening to nothing.
+    """
+
+    def __init__(self, ttl=SESSION_TTL, max_sessions=MAX_SESSIONS):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()   # in LRU order
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            for sid in [s for s, session in self._sessions.items()
+                        if not session.streams and now - session.touched > self.ttl]:
+                self._sessions.pop(sid).close()
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = TranscriptSession(session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._evict(keep=session_id)
+            self._sessions.move_to_end(session_id)
+            session.touched = now
+            return session
+
+    def _evict(self, keep):
+        # The least recently used session without a stream, or failing that the least recently used one
+        others = [sid for sid in self._sessions if sid != keep]
+        victim = next((sid for sid in others if not self._sessions[sid].streams), others[0])
+        self._sessions.pop(victim).close()
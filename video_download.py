@@ -1,92 +1,227 @@
 import os
-import re
+import glob
+import time
+import shutil
+import argparse
+import threading
+import subprocess
+from collections import defaultdict
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
 from tqdm import tqdm
-import yt_dlp
 
 FOLDER = "data/video"  # Save directly to the 'video' folder
+SOURCE_CACHE = "data/cache/sources"  # One full download per YouTube id, shared by all its clips
+LINKS_CSV = "Yt_links.csv"
+
+# Concurrency and retry policy
+MAX_WORKERS = 4
+RETRIES = 3
+BACKOFF_SECONDS = 2.0
+
+
+class YtDlpFetcher:
+    """Downloads a full YouTube video as `<dest_dir>/<video_id>.mp4`."""
+
+    def __call__(self, video_id, dest_dir):
+        import yt_dlp
+
+        ydl_opts = {
+            'format': 'bestvideo+bestaudio/best',
+            'outtmpl': os.path.join(dest_dir, f'{video_id}.%(ext)s'),
+            'merge_output_format': 'mp4',
+            'postprocessors': [{
+                'key': 'FFmpegVideoConvertor',
+                'preferedformat': 'mp4',
+            }],
+            'noplaylist': True,  # Download only single video
+            'quiet': True,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            ydl.download([f"https://www.youtube.com/watch?v={video_id}"])
+        path = os.path.join(dest_dir, f"{video_id}.mp4")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"yt-dlp did not produce {path}")
+        return path
+
+
+class LocalFetcher:
+    """Stand-in for yt-dlp that copies `<source_dir>/<video_id>.mp4` (offline runs and tests)."""
+
+    def __init__(self, source_dir):
+        self.source_dir = source_dir
+
+    def __call__(self, video_id, dest_dir):
+        src = os.path.join(self.source_dir, f"{video_id}.mp4")
+        path = os.path.join(dest_dir, f"{video_id}.mp4")
+        shutil.copyfile(src, path)
+        return path
+
+
+class SourceCache:
+    """
+    Content cache of full source videos keyed by YouTube id.
+
+    Each id is fetched at most once, even when several threads ask for it at
+    the same time; later runs reuse the cached file.
+    """
 
-def download_video(name, video_id, start_time, duration_time):
+    def __init__(self, fetcher, cache_dir=SOURCE_CACHE, retries=RETRIES, backoff=BACKOFF_SECONDS):
+        self.fetcher = fetcher
+        self.cache_dir = cache_dir
+        self.retries = retries
+        self.backoff = backoff
+        self._locks = defaultdict(threading.Lock)
+        self._guard = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, video_id):
+        return os.path.join(self.cache_dir, f"{video_id}.mp4")
+
+    def get(self, video_id):
+        with self._guard:
+            lock = self._locks[video_id]
+        with lock:
+            path = self.path(video_id)
+            if not os.path.exists(path):
+                retry(lambda: self._fetch(video_id), self.retries, self.backoff, f"download {video_id}")
+            return path
+
+    def _fetch(self, video_id):
+        # Fetch into a private directory so a failed attempt never leaves a partial cache entry
+        staging = os.path.join(self.cache_dir, f".{video_id}.partial")
+        shutil.rmtree(staging, ignore_errors=True)
+        os.makedirs(staging)
+        try:
+            fetched = self.fetcher(video_id, staging)
+            os.replace(fetched, self.path(video_id))
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+    def clear(self):
+        for path in glob.glob(os.path.join(self.cache_dir, "*.mp4")):
+            os.remove(path)
+
+
+def retry(fn, retries=RETRIES, backoff=BACKOFF_SECONDS, what="operation"):
+    """Call `fn`, retrying with exponential backoff; re-raises the last error."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt)
+            print(f"{what} failed ({e}); retrying in {delay:.0f}s")
+            time.sleep(delay)
+
+
+def has_segment(start_time, duration_time):
+    return not (pd.isnull(start_time) or pd.isnull(duration_time)
+                or str(start_time).strip() == "" or str(duration_time).strip() == "")
+
+
+def cut_segment(source_path, output_path, start_time, duration_time):
     """
-    Downloads a specific segment of a YouTube video directly to the video folder
-    with a lowercase filename based on the 'name' from the CSV,
-    only if it doesn't already exist.
-
-    Args:
-        name (str): The desired name for the downloaded video segment (from CSV).
-        video_id (str): The ID of the YouTube video.
-        start_time (str): The start time of the segment (hh:mm:ss).
-        duration_time (str): The duration of the segment (hh:mm:ss).
+    Cut one clip out of a source video with a stream copy (or copy the whole
+    video if the row has no segment). Writes to a temporary file first so a
+    failed cut never leaves a truncated clip behind.
     """
-    output_filename = f"{name.lower()}.mp4"
-    output_path = os.path.join(FOLDER, output_filename)
-
-    if os.path.exists(output_path):
-        print(f"Video for '{name}' (ID: {video_id}) already exists at: {output_path}")
-        return
-
-    print(f"Downloading video for '{name}' (ID: {video_id}) from YouTube...")
-
-    # Set up options for yt-dlp
-    ydl_opts = {
-        'format': 'bestvideo+bestaudio/best',
-        'outtmpl': os.path.join(FOLDER, '%(title)s.%(ext)s'),
-        'postprocessors': [{
-            'key': 'FFmpegVideoConvertor',
-            'preferedformat': 'mp4',
-        }],
-        'noplaylist': True,  # Download only single video
-    }
-
-    try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info_dict = ydl.extract_info(f"https://www.youtube.com/watch?v={video_id}", download=True)
-            temp_file_name = re.sub(r"[.;:,?!]", "", info_dict['title']) + ".mp4"
-            temp_file_path = os.path.join(FOLDER, temp_file_name)
-
-            # Check if the full video was downloaded (might happen if start/end are invalid)
-            if start_time == "" or duration_time == "":
-                os.rename(temp_file_path, output_path)
-                print(f"Successfully downloaded full video for '{name}' (ID: {video_id}) to: {output_path}")
-            else:
-                try:
-                    os.system(
-                        f'ffmpeg -hide_banner -loglevel error -ss {start_time} -i "{temp_file_path}" -to {duration_time} -c copy "{output_path}"'
-                    )
-                    print(f"Successfully downloaded video segment for '{name}' (ID: {video_id}) to: {output_path}")
-                except Exception as e:
-                    print(f"Error processing video segment for '{name}' (ID: {video_id}): {e}")
-                finally:
-                    # Clean up the temporary full video file
-                    if os.path.exists(temp_file_path):
-                        os.remove(temp_file_path)
-
-    except Exception as e:
-        print(f"Error fetching video with ID {video_id}: {e}")
-        return
-
-print("\nDownloading videos of signs from YouTube\n")
-
-# Create the dataset based on yt_links.csv
-df_links = pd.read_csv("/Users/blessykancharla/Desktop/Voice_2_sign/data/Yt_links.csv")
-
-# Print the columns to debug
-print("Columns in the CSV file:", df_links.columns)
-
-# Strip whitespace from column names
-df_links.columns = df_links.columns.str.strip()
-
-# Validate and download videos
-for idx, row in tqdm(df_links.iterrows(), total=df_links.shape[0]):
-    video_id = row['id'].strip()  # Strip whitespace from video ID
-    if pd.isnull(video_id) or len(video_id) != 11:
-        print(f"Invalid video ID: {video_id}")
-        continue
-    download_video(row['name'], video_id, row['start_time'], row['duration_time'])
-
-# Delete any remaining temporary full video files
-for file in os.listdir(FOLDER):
-    if file.endswith(".mp4") and "temp_" in file:
-        os.remove(os.path.join(FOLDER, file))
-
-print("\nVideo downloading process completed.\n")
\ No newline at end of file
+    tmp_path = output_path + ".part"
+    if not has_segment(start_time, duration_time):
+        shutil.copyfile(source_path, tmp_path)
+    else:
+        subprocess.run(
+            ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+             "-ss", str(start_time).strip(), "-i", source_path,
+             "-to", str(duration_time).strip(), "-c", "copy", "-f", "mp4", tmp_path],
+            check=True,
+        )
+    os.replace(tmp_path, output_path)
+
+
+def plan_downloads(df_links, folder=FOLDER):
+    """Group the CSV rows by video id, skipping invalid ids and clips that already exist."""
+    jobs = defaultdict(list)
+    for _, row in df_links.iterrows():
+        video_id = str(row['id']).strip()  # Strip whitespace from video ID
+        if pd.isnull(row['id']) or len(video_id) != 11:
+            print(f"Invalid video ID: {video_id}")
+            continue
+        output_path = os.path.join(folder, f"{str(row['name']).lower()}.mp4")
+        if os.path.exists(output_path):
+            continue
+        jobs[video_id].append((row['name'], output_path, row['start_time'], row['duration_time']))
+    return jobs
+
+
+def download_all(df_links, fetcher=None, folder=FOLDER, cache_dir=SOURCE_CACHE,
+                 workers=MAX_WORKERS, retries=RETRIES, backoff=BACKOFF_SECONDS):
+    """
+    Downloads every clip in `df_links`, fetching each source video once.
+
+    Sources are fetched on a bounded pool; as soon as a source is available,
+    all of its segments are cut concurrently on a second pool of the same size.
+    Returns the number of clips that failed.
+    """
+    os.makedirs(folder, exist_ok=True)
+    cache = SourceCache(fetcher or YtDlpFetcher(), cache_dir, retries, backoff)
+    jobs = plan_downloads(df_links, folder)
+    total = sum(len(segments) for segments in jobs.values())
+    failed = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as fetch_pool, \
+            ThreadPoolExecutor(max_workers=workers) as cut_pool, \
+            tqdm(total=total, desc="Clips") as progress:
+        fetches = {fetch_pool.submit(cache.get, video_id): video_id for video_id in jobs}
+        cuts = {}
+        for future in as_completed(fetches):
+            video_id = fetches[future]
+            try:
+                source_path = future.result()
+            except Exception as e:
+                print(f"Error fetching video with ID {video_id}: {e}")
+                failed += len(jobs[video_id])
+                progress.update(len(jobs[video_id]))
+                continue
+            for name, output_path, start_time, duration_time in jobs[video_id]:
+                cut = cut_pool.submit(retry, partial(cut_segment, source_path, output_path, start_time, duration_time),
+                                      retries, backoff, f"cut {name}")
+                cuts[cut] = (name, video_id)
+
+        for future in as_completed(cuts):
+            name, video_id = cuts[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"Error processing video segment for '{name}' (ID: {video_id}): {e}")
+                failed += 1
+            progress.update(1)
+
+    return failed
+
+
+def load_links(csv_path=LINKS_CSV):
+    df_links = pd.read_csv(csv_path)
+    # Strip whitespace from column names
+    df_links.columns = df_links.columns.str.strip()
+    return df_links
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Download and trim the sign videos listed in the links CSV.")
+    parser.add_argument("csv", nargs="?", default=LINKS_CSV, help="CSV with name,id,start_time,duration_time")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="concurrent downloads / cuts")
+    parser.add_argument("--retries", type=int, default=RETRIES)
+    parser.add_argument("--source-dir", help="read <id>.mp4 source videos from this directory instead of YouTube")
+    parser.add_argument("--clear-cache", action="store_true", help="delete cached source videos when done")
+    args = parser.parse_args()
+
+    print("\nDownloading videos of signs from YouTube\n")
+    fetcher = LocalFetcher(args.source_dir) if args.source_dir else YtDlpFetcher()
+    failed = download_all(load_links(args.csv), fetcher, workers=args.workers, retries=args.retries)
+    if args.clear_cache:
+        SourceCache(fetcher).clear()
+
+    print(f"\nVideo downloading process completed ({failed} failed).\n")
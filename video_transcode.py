@@ -0,0 +1,146 @@
+import os
+import json
+import hashlib
+import argparse
+import subprocess
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from tqdm import tqdm
+
+VIDEO_DIR     = "data/video"            # the cut clips (masters; also what keypoints are extracted from)
+DELIVERY_DIR  = "data/video_delivery"   # their transcoded copies, served to browsers
+MANIFEST_PATH = "data/video_transcode_manifest.json"
+MAX_WORKERS   = 2   # each ffmpeg already uses several threads
+
+# Delivery profile: small progressive H.264 at a fixed frame size. Every clip gets
+# the same codec parameters, so sentence videos can be joined with a stream copy.
+WIDTH, HEIGHT = 640, 360
+FPS           = 25
+CRF           = 28
+MAX_BITRATE   = "600k"
+GOP           = 2 * FPS   # a keyframe every 2 seconds (and on the first frame)
+PROFILE_ID    = f"h264-main-{WIDTH}x{HEIGHT}-{FPS}fps-crf{CRF}-{MAX_BITRATE}-noaudio"
+
+
+def transcode(src, out):
+    """
+    Re-encode `src` to the delivery profile at `out`: letterboxed to WIDTH x
+    HEIGHT, constant frame rate, capped bitrate, no audio (the signs carry no
+    sound) and the moov atom up front (+faststart) for progressive playback.
+    """
+    tmp_path = out + ".part"
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", src,
+         "-vf", f"scale={WIDTH}:{HEIGHT}:force_original_aspect_ratio=decrease,"
+                f"pad={WIDTH}:{HEIGHT}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={FPS},format=yuv420p",
+         "-c:v", "libx264", "-profile:v", "main", "-preset", "slow", "-crf", str(CRF),
+         "-maxrate", MAX_BITRATE, "-bufsize", "1200k", "-g", str(GOP), "-keyint_min", str(GOP),
+         "-sc_threshold", "0", "-an", "-movflags", "+faststart", "-f", "mp4", tmp_path],
+        check=True,
+    )
+    os.replace(tmp_path, out)
+
+
+def content_etag(path):
+    """Strong ETag for a file: a digest of its bytes (memoized per size and mtime)."""
+    st = os.stat(path)
+    return _content_etag(os.path.abspath(path), st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=8192)
+def _content_etag(path, mtime_ns, size):
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+def delivery_path(fname, video_dir=VIDEO_DIR, delivery_dir=DELIVERY_DIR):
+    """Path of the clip to serve: its transcoded copy if there is one, otherwise the master."""
+    path = os.path.join(delivery_dir, fname)
+    return path if os.path.exists(path) else os.path.join(video_dir, fname)
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Video file name -> {source: {size, mtime_ns}, size, mtime_ns, profile} of clips already transcoded."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest, path=MANIFEST_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def _signature(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def is_current(src_path, out_path, entry):
+    """True if `out_path` is the output recorded in `entry` for `src_path` as it is now, at the current profile."""
+    if not entry or entry.get("profile") != PROFILE_ID or not os.path.exists(out_path):
+        return False
+    out = _signature(out_path)
+    return (entry.get("source") == _signature(src_path)
+            and entry.get("size") == out["size"] and entry.get("mtime_ns") == out["mtime_ns"])
+
+
+def _transcode_copy(src_path, out_path):
+    source = _signature(src_path)
+    transcode(src_path, out_path)
+    return {"source": source, **_signature(out_path), "profile": PROFILE_ID}
+
+
+def transcode_all(video_dir=VIDEO_DIR, delivery_dir=DELIVERY_DIR, manifest_path=MANIFEST_PATH,
+                  workers=MAX_WORKERS, force=False):
+    """
+    Transcode every clip in `video_dir` to the delivery profile, into
+    `delivery_dir` under the same file name. The clips in `video_dir` are
+    left untouched, since keypoints are extracted from them.
+
+    Clips whose copy is current for the profile and the clip (per the
+    manifest) are skipped, so the stage can be re-run after each download.
+    Copies of deleted clips are removed. Returns the number of clips that
+    failed.
+    """
+    os.makedirs(delivery_dir, exist_ok=True)
+    manifest = load_manifest(manifest_path)
+    todo = [f for f in sorted(os.listdir(video_dir)) if f.endswith(".mp4")
+            and (force or not is_current(os.path.join(video_dir, f), os.path.join(delivery_dir, f), manifest.get(f)))]
+    failed = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool, tqdm(total=len(todo), desc="Transcoding") as progress:
+        futures = {pool.submit(_transcode_copy, os.path.join(video_dir, f), os.path.join(delivery_dir, f)): f
+                   for f in todo}
+        for future in as_completed(futures):
+            fname = futures[future]
+            try:
+                manifest[fname] = future.result()
+            except Exception as e:
+                print(f"Error transcoding {fname}: {e}")
+                failed += 1
+            progress.update(1)
+    # Forget clips that were deleted, and drop their copies
+    for fname in os.listdir(delivery_dir):
+        if fname.endswith(".mp4") and not os.path.exists(os.path.join(video_dir, fname)):
+            os.remove(os.path.join(delivery_dir, fname))
+    manifest = {f: e for f, e in manifest.items() if os.path.exists(os.path.join(video_dir, f))}
+    save_manifest(manifest, manifest_path)
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Transcode sign clips to the {PROFILE_ID} delivery profile.")
+    parser.add_argument("video_dir", nargs="?", default=VIDEO_DIR)
+    parser.add_argument("--delivery-dir", default=DELIVERY_DIR, help="where the transcoded copies are written")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="concurrent ffmpeg processes")
+    parser.add_argument("--force", action="store_true", help="re-transcode clips already in the manifest")
+    args = parser.parse_args()
+
+    failed = transcode_all(args.video_dir, args.delivery_dir, workers=args.workers, force=args.force)
+    print(f"\nTranscoding completed ({failed} failed).\n")
@@ -0,0 +1,286 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import namedtuple
+
+try:
+    import inotify_simple  # optional: event-driven refresh on Linux
+except ImportError:
+    inotify_simple = None
+
+# How often the polling watcher stats the vocabulary directories (seconds)
+POLL_INTERVAL = 2.0
+
+# In order of preference when a gloss has several files (binary keypoints before legacy JSON)
+KEYPOINT_EXTENSIONS = (".npz", ".json")
+VIDEO_EXTENSIONS    = (".mp4",)
+
+
+def scan_dir(directory, extensions):
+    """
+    Map gloss name -> file name for every file in `directory` with one of
+    `extensions`; if a gloss has several, the earlier extension wins.
+    """
+    entries = {}
+    if not os.path.isdir(directory):
+        return entries
+    for fname in os.listdir(directory):
+        stem, ext = os.path.splitext(fname)
+        if ext in extensions and _preferred(fname, entries.get(stem), extensions):
+            entries[stem] = fname
+    return entries
+
+
+def _preferred(fname, current, extensions):
+    """True if `fname` should replace `current` as a gloss's file."""
+    if current is None:
+        return True
+    return extensions.index(os.path.splitext(fname)[1]) <= extensions.index(os.path.splitext(current)[1])
+
+
+class PhraseTrie:
+    """
+    Token trie over multi-word gloss names (`good_morning` -> good, morning).
+
+    `segment` splits a token stream into the longest known phrases in one
+    left-to-right pass; each position is visited once plus at most the
+    length of the longest phrase, however many phrases there are.
+    """
+
+    _END = object()   # key of the gloss stored at a node
+
+    def __init__(self, glosses=()):
+        self.root = {}
+        for gloss in glosses:
+            self.add(gloss)
+
+    def add(self, gloss):
+        node = self.root
+        for token in gloss.split("_"):
+            node = node.setdefault(token, {})
+        node[self._END] = gloss
+
+    def segment(self, tokens, final=True):
+        """
+        Greedy longest-match segmentation. Returns (start, end, gloss) spans
+        in sentence order covering every token; gloss is None for a token
+        that does not start a known phrase.
+
+        With `final=False` more tokens may follow, so segmentation stops
+        before a trailing run of tokens that could still grow into a longer
+        phrase; those tokens are left uncovered.
+        """
+        spans = []
+        i = 0
+        while i < len(tokens):
+            node, match, j = self.root, None, i
+            while j < len(tokens) and tokens[j] in node:
+                node = node[tokens[j]]
+                j += 1
+                if self._END in node:
+                    match = (j, node[self._END])
+            if not final and j == len(tokens) and len(node) > (self._END in node):
+                break
+            if match:
+                spans.append((i, match[0], match[1]))
+                i = match[0]
+            else:
+                spans.append((i, i + 1, None))
+                i += 1
+        return spans
+
+
+# One published state of the vocabulary; every field belongs to the same scan
+VocabularySnapshot = namedtuple("VocabularySnapshot", "version fingerprint keypoints videos phrases")
+
+
+class Vocabulary:
+    """
+    In-memory registry of the gloss vocabulary.
+
+    Holds gloss -> keypoint path and gloss -> video file mappings so request
+    handlers never touch the filesystem. The maps are built once and then
+    refreshed incrementally, either from inotify events (if `inotify_simple`
+    is installed) or by polling the directory mtimes; a directory is only
+    re-listed when its mtime changes.
+
+    Each change publishes a new immutable VocabularySnapshot in a single
+    assignment, so readers never lock. A caller that needs several of its
+    fields reads `snapshot` once; the attributes of the same names each
+    return the latest one. `version` increases on every change and
+    listeners registered with `on_change` are called with the vocabulary.
+    `fingerprint` is a digest of both maps, identical in every process that
+    sees the same files (unlike `version`, which is per process). `phrases`
+    is a PhraseTrie over the multi-word glosses, rebuilt with the maps.
+    """
+
+    def __init__(self, keypoint_dir, video_dir, poll_interval=POLL_INTERVAL,
+                 keypoint_extensions=KEYPOINT_EXTENSIONS, video_extensions=VIDEO_EXTENSIONS):
+        self.keypoint_dir  = keypoint_dir
+        self.video_dir     = video_dir
+        self.poll_interval = poll_interval
+        self._extensions   = {"keypoints": keypoint_extensions, "videos": video_extensions}
+        self._dirs         = {"keypoints": keypoint_dir, "videos": video_dir}
+        self._files        = {"keypoints": {}, "videos": {}}
+        self._mtimes       = {}
+        self._listeners    = []
+        self._lock         = threading.Lock()
+        self._watcher      = None
+        self._stop         = threading.Event()
+        self.snapshot      = VocabularySnapshot(0, None, {}, {}, PhraseTrie())
+        self.refresh(force=True)
+
+    @property
+    def version(self):
+        return self.snapshot.version
+
+    @property
+    def fingerprint(self):
+        return self.snapshot.fingerprint
+
+    @property
+    def keypoints(self):
+        """gloss -> path of its keypoint file"""
+        return self.snapshot.keypoints
+
+    @property
+    def videos(self):
+        """gloss -> video file name (relative to video_dir)"""
+        return self.snapshot.videos
+
+    @property
+    def phrases(self):
+        return self.snapshot.phrases
+
+    def __contains__(self, gloss):
+        return gloss in self.keypoints
+
+    def __len__(self):
+        return len(self.keypoints)
+
+    def on_change(self, callback):
+        self._listeners.append(callback)
+
+    def video_file(self, gloss):
+        return self.videos.get(gloss)
+
+    def refresh(self, force=False):
+        """Re-list any directory whose mtime changed. Returns True if the vocabulary changed."""
+        changed = False
+        with self._lock:
+            for kind, directory in self._dirs.items():
+                mtime = self._dir_mtime(directory)
+                if not force and mtime == self._mtimes.get(kind):
+                    continue
+                self._mtimes[kind] = mtime
+                files = scan_dir(directory, self._extensions[kind])
+                if files != self._files[kind]:
+                    self._files[kind] = files
+                    changed = True
+            if changed:
+                self._publish()
+        if changed:
+            self._notify()
+        return changed
+
+    def start_watching(self):
+        """Keep the vocabulary current from a daemon thread."""
+        if self._watcher is not None:
+            return
+        target = self._watch_inotify if inotify_simple is not None else self._watch_poll
+        self._watcher = threading.Thread(target=target, name="vocabulary-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self._stop.clear()
+
+    def _watch_poll(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except OSError as e:
+                logging.warning(f"Vocabulary refresh failed: {e}")
+
+    def _watch_inotify(self):
+        flags = inotify_simple.flags
+        mask = flags.CREATE | flags.DELETE | flags.MOVED_TO | flags.MOVED_FROM | flags.CLOSE_WRITE
+        inotify = inotify_simple.INotify()
+        watches = {}
+        for kind, directory in self._dirs.items():
+            if os.path.isdir(directory):
+                watches[inotify.add_watch(directory, mask)] = kind
+        try:
+            while not self._stop.is_set():
+                events = inotify.read(timeout=int(self.poll_interval * 1000))
+                if events:
+                    self._apply_events(watches, events, flags)
+                elif len(watches) < len(self._dirs):
+                    # A directory did not exist at startup; fall back to polling for it
+                    self.refresh()
+        finally:
+            inotify.close()
+
+    def _apply_events(self, watches, events, flags):
+        changed = False
+        with self._lock:
+            for event in events:
+                kind = watches.get(event.wd)
+                stem, ext = os.path.splitext(event.name)
+                if kind is None or ext not in self._extensions[kind]:
+                    continue
+                files = self._files[kind]
+                extensions = self._extensions[kind]
+                if event.mask & (flags.DELETE | flags.MOVED_FROM):
+                    if files.get(stem) == event.name:
+                        # Fall back to another file for the same gloss, if one is left
+                        del files[stem]
+                        for alt in (stem + e for e in extensions):
+                            if os.path.exists(os.path.join(self._dirs[kind], alt)):
+                                files[stem] = alt
+                                break
+                        changed = True
+                elif files.get(stem) != event.name and _preferred(event.name, files.get(stem), extensions):
+                    files[stem] = event.name
+                    changed = True
+            if changed:
+                self._publish()
+        if changed:
+            self._notify()
+
+    def _publish(self):
+        # Build a fresh snapshot and swap it in; readers keep whichever snapshot they hold
+        keypoints = {
+            gloss: os.path.join(self.keypoint_dir, fname)
+            for gloss, fname in self._files["keypoints"].items()
+        }
+        digest = hashlib.sha1()
+        for kind in ("keypoints", "videos"):
+            for gloss, fname in sorted(self._files[kind].items()):
+                digest.update(f"{kind}\0{gloss}\0{fname}\n".encode())
+        self.snapshot = VocabularySnapshot(
+            version=self.snapshot.version + 1,
+            fingerprint=digest.hexdigest()[:16],
+            keypoints=keypoints,
+            videos=dict(self._files["videos"]),
+            phrases=PhraseTrie(g for g in keypoints if "_" in g),
+        )
+
+    def _notify(self):
+        for callback in self._listeners:
+            try:
+                callback(self)
+            except Exception as e:
+                logging.exception(f"Vocabulary listener failed: {e}")
+
+    @staticmethod
+    def _dir_mtime(directory):
+        try:
+            st = os.stat(directory)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_ino)